@@ -0,0 +1,192 @@
+"""End to end benchmark of PDFDownloader against the local synthetic pdf
+server, for a sweep of the number of concurrent downloads.
+
+Each run downloads the same generated input file into an empty directory
+in its own process, and reports files/s, MB/s, the p50 and p99 time per
+file from the metrics of the run and the peak RSS of the process.
+
+Usage:
+>> python src/Benchmark/bench_download.py -n 500 -t 4,16,64 --sizes fixed:200
+>> python src/Benchmark/bench_download.py --error-rate 0.05 --tls
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from openpyxl import Workbook
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from synthetic_server import SyntheticServer, CreateCertificate
+from synthetic_server import AddProfileArguments, ProfileFromArguments
+
+
+def CreateWorkbook(path: str, urls: list[str]):
+    """Writes an input file with a row per url.
+
+    Args:
+        path (str): path to xlsx file
+        urls (list[str]): urls of the rows
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["BRnum", "Pdf_URL"])
+    for i, url in enumerate(urls):
+        sheet.append([f"BR{i}", url])
+    workbook.save(path)
+
+
+def PeakRSS() -> int | None:
+    """Returns the peak resident memory of this process.
+
+    Returns:
+        int | None: bytes, None where the resource module is missing
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def Worker(params_file: str):
+    """Runs PDFDownloader with the parameters written by Run and writes
+    the measurements next to them.
+
+    Args:
+        params_file (str): json parameters of the run
+    """
+    from connection_pool import ConnectionPool
+    from pdfdownloader import Config, PDFDownloader
+
+    with open(params_file) as f:
+        params = json.load(f)
+    if params["cert_file"]:
+        # trust the self signed certificate of the server
+        ConnectionPool().context.load_verify_locations(params["cert_file"])
+    metrics_file = os.path.join(params["work_dir"], "metrics.json")
+    config = Config(_in_file=params["in_file"],
+                    _out_file=os.path.join(params["work_dir"], "out.csv"),
+                    _out_pdf_dir=os.path.join(params["work_dir"], "out"),
+                    _log_level=False,
+                    _n_tasks=params["tasks"],
+                    _engine=params["engine"],
+                    _validation=params["validation"],
+                    _retry_base_s=params["retry_base_s"],
+                    _metrics_file=metrics_file)
+    app = PDFDownloader(config)
+    begin = time.perf_counter()
+    app.Run()
+    elapsed = time.perf_counter() - begin
+    with open(metrics_file) as f:
+        metrics = json.load(f)["metrics"]
+    with open(params_file + ".result", "w") as f:
+        json.dump({"elapsed": elapsed, "metrics": metrics,
+                   "peak_rss": PeakRSS()}, f)
+
+
+def Value(metrics: dict, name: str, **labels) -> float:
+    """Returns the sum of a metric over the entries matching labels.
+    """
+    return sum(entry["value"]
+               for entry in metrics.get(f"pdfdownloader_{name}", [])
+               if labels.items() <= entry["labels"].items())
+
+
+def Run(in_file: str, tasks: int, args: argparse.Namespace,
+        cert_file: str | None, tmp_dir: str) -> dict:
+    """Runs one point of the sweep in a new process.
+
+    Args:
+        in_file (str): input file
+        tasks (int): concurrent downloads
+        args (argparse.Namespace): options of the benchmark
+        cert_file (str | None): certificate of an https server
+        tmp_dir (str): directory for the run
+
+    Returns:
+        dict: measurements of the run
+    """
+    work_dir = tempfile.mkdtemp(dir=tmp_dir)
+    params_file = os.path.join(work_dir, "params.json")
+    with open(params_file, "w") as f:
+        json.dump({"in_file": in_file, "work_dir": work_dir,
+                   "tasks": tasks, "engine": args.engine,
+                   "validation": args.validation,
+                   "retry_base_s": args.retry_base,
+                   "cert_file": cert_file}, f)
+    # the log of the run goes to the work directory
+    subprocess.run([sys.executable, os.path.abspath(__file__),
+                    "--worker", params_file],
+                   cwd=work_dir, check=True, timeout=args.timeout,
+                   stdout=subprocess.DEVNULL)
+    with open(params_file + ".result") as f:
+        return json.load(f)
+
+
+def PrintRow(tasks: int, result: dict):
+    metrics = result["metrics"]
+    elapsed = result["elapsed"]
+    files = Value(metrics, "downloads_total", status="downloaded")
+    failed = Value(metrics, "results_total", status="not_downloaded")
+    size = Value(metrics, "download_bytes_total")
+    duration = metrics.get("pdfdownloader_download_duration_ms")
+    quantiles = duration[0]["value"]["quantiles"] if duration \
+        else {"0.5": 0, "0.99": 0}
+    rss = result["peak_rss"]
+    print(f"{tasks:>6}{files / elapsed:>10.1f}{size / 1e6 / elapsed:>9.2f}"
+          f"{quantiles['0.5']:>10.0f}{quantiles['0.99']:>10.0f}"
+          + (f"{rss / 2**20:>10.1f}" if rss else f"{'n/a':>10}")
+          + f"{int(failed):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("-n", "--files", type=int, default=200,
+                        help="Rows in the input file")
+    parser.add_argument("-t", "--tasks", default="1,4,16,64",
+                        help="Comma separated concurrent downloads to run")
+    parser.add_argument("-e", "--engine", choices=["thread", "async"],
+                        default="thread", help="Download engine")
+    parser.add_argument("--validation", default="magic",
+                        choices=["none", "magic", "structure", "full"],
+                        help="PDF validation level")
+    parser.add_argument("--retry-base", type=float, default=0.2,
+                        help="Backoff before the first retry in seconds")
+    parser.add_argument("--tls", action="store_true",
+                        help="Serve https with a self signed certificate")
+    parser.add_argument("--timeout", type=float, default=600,
+                        help="Max seconds of a run")
+    AddProfileArguments(parser)
+    args = parser.parse_args()
+    if args.worker:
+        Worker(args.worker)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cert_file, key_file = CreateCertificate(tmp_dir) if args.tls \
+            else (None, None)
+        server = SyntheticServer(ProfileFromArguments(args),
+                                 cert_file=cert_file, key_file=key_file)
+        server.Start()
+        try:
+            in_file = os.path.join(tmp_dir, "metadata.xlsx")
+            CreateWorkbook(in_file, [server.URL(str(i))
+                                     for i in range(args.files)])
+            print(f"{args.files} files, sizes {args.sizes} KiB,"
+                  f" {args.engine} engine, {server.scheme}")
+            print(f"{'tasks':>6}{'files/s':>10}{'MB/s':>9}{'p50 ms':>10}"
+                  f"{'p99 ms':>10}{'RSS MiB':>10}{'failed':>8}")
+            for tasks in (int(t) for t in args.tasks.split(",")):
+                PrintRow(tasks, Run(in_file, tasks, args, cert_file,
+                                    tmp_dir))
+        finally:
+            server.Stop()
+
+
+if __name__ == "__main__":
+    main()
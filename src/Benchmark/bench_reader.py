@@ -0,0 +1,111 @@
+"""Benchmark of reading the input xlsx file, for the old
+pd.ExcelFile(...).parse() + iterrows path and the streaming openpyxl
+read only reader of FileReaderTask.
+
+A workbook with n rows shaped like the metadata sheets is generated,
+BRnum and Pdf_URL plus extra text columns. Time to the first row, total
+time and peak traced memory are reported.
+
+Usage:
+>> python src/Benchmark/bench_reader.py -n 100000 -c 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Iterator
+import pandas as pd
+from openpyxl import Workbook
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from task import FileReaderTask
+
+
+def CreateWorkbook(path: str, n: int, extra_columns: int):
+    """Writes a workbook with n rows.
+
+    Args:
+        path (str): path to xlsx file
+        n (int): data rows
+        extra_columns (int): text columns besides BRnum and Pdf_URL
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["BRnum", "Pdf_URL"]
+                 + [f"Column{i}" for i in range(extra_columns)])
+    for i in range(n):
+        sheet.append([f"BR{i}", f"http://localhost/reports/{i}.pdf"]
+                     + [f"Value {i} {j}" for j in range(extra_columns)])
+    workbook.save(path)
+
+
+def PandasRows(path: str) -> Iterator[tuple[int, object, str]]:
+    """Old reader path of FileReaderTask.
+    """
+    df = pd.ExcelFile(path).parse()
+    for index, row in df.iterrows():
+        yield index, row['BRnum'], str(row['Pdf_URL'])
+
+
+def StreamingRows(path: str) -> Iterator[tuple[int, object, str]]:
+    """Streaming reader of FileReaderTask.
+    """
+    return FileReaderTask(path, "").ReadRows()
+
+
+def Measure(read: Callable[[str], Iterator], path: str) \
+        -> tuple[float, float, int]:
+    """Reads all rows.
+
+    Returns:
+        tuple[float, float, int]: seconds to the first row,
+        total seconds and rows read
+    """
+    start = time.perf_counter()
+    first = None
+    rows = 0
+    for _ in read(path):
+        if first is None:
+            first = time.perf_counter() - start
+        rows += 1
+    return first or 0.0, time.perf_counter() - start, rows
+
+
+def PeakMemory(read: Callable[[str], Iterator], path: str) -> int:
+    """Returns the peak traced memory while reading all rows.
+    """
+    tracemalloc.start()
+    for _ in read(path):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--rows", type=int, default=100000,
+                        help="Rows in the generated workbook")
+    parser.add_argument("-c", "--columns", type=int, default=10,
+                        help="Extra text columns")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "metadata.xlsx")
+        CreateWorkbook(path, args.rows, args.columns)
+        print(f"{args.rows} rows, {args.columns + 2} columns,"
+              f" {os.path.getsize(path) / 2**20:.1f} MiB")
+        print(f"{'reader':<12}{'first row':>12}{'total':>10}"
+              f"{'peak mem':>12}")
+        for name, read in (("pandas", PandasRows),
+                           ("streaming", StreamingRows)):
+            first, total, rows = Measure(read, path)
+            assert rows == args.rows, rows
+            peak = PeakMemory(read, path)
+            print(f"{name:<12}{first:>10.3f} s{total:>8.2f} s"
+                  f"{peak / 2**20:>8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Benchmark of the idle gap between a download finishing and the next
+download starting, for the old 100 ms polling loop and the event driven
+scheduler of PDFDownloader.
+
+Downloads are simulated by tasks sleeping for a fixed duration, so only
+the scheduling overhead is measured.
+
+Usage:
+>> python src/Benchmark/bench_scheduler.py -n 200 -t 4 -d 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pdfdownloader
+from pdfdownloader import Config, PDFDownloader
+from state import Report, ReportState, ReportSyncData
+from task import FileReaderTask, ITask, TaskState
+from task_handler import ThreadPoolHandler
+
+
+class FakeDownloaderTask(ITask):
+    """Downloader task sleeping instead of downloading.
+    Records when it starts and ends.
+    """
+    duration: float = 0.005
+    starts: list[float] = []
+    ends: list[float] = []
+
+    def __init__(self, _report: Report, *args):
+        super().__init__(f"Download: {_report.name} task")
+        self.report = _report
+
+    def Start(self):
+        self.status = TaskState.RUNNING
+        self.timer.Start()
+        FakeDownloaderTask.starts.append(time.perf_counter())
+        time.sleep(self.duration)
+        self.report.status = ReportState.DOWNLOADED
+        FakeDownloaderTask.ends.append(time.perf_counter())
+
+    def Stop(self):
+        self.timer.Stop()
+        self.status = TaskState.DONE
+
+    def ReadData(self):
+        return ReportSyncData([self.report], 0)
+
+
+class FakeReaderTask(FileReaderTask):
+    """Reader task producing n rows without reading a file.
+    """
+    def __init__(self, n: int, *args, **kwargs):
+        super().__init__("unused.xlsx", *args, **kwargs)
+        self.n = n
+
+    def ReadRows(self):
+        for i in range(self.n):
+            yield i, f"BR{i}", f"http://localhost/{i}.pdf"
+
+
+def Gaps(n_tasks: int) -> list[float]:
+    """Returns the idle gaps in ms between the k'th download ending and
+    the download taking over its slot starting.
+    """
+    starts = sorted(FakeDownloaderTask.starts)[n_tasks:]
+    ends = sorted(FakeDownloaderTask.ends)
+    return [(start - end) * 1000 for start, end in zip(starts, ends)]
+
+
+def RunPolling(n: int, n_tasks: int) -> float:
+    """Runs the download phase with the old polling loop.
+    """
+    handler = ThreadPoolHandler(n_tasks + 1)
+    report_queue = [Report(f"BR{i}", i, f"http://localhost/{i}.pdf",
+                           ReportState.INIT) for i in range(n)]
+    begin = time.perf_counter()
+    while True:
+        while handler.ActiveTaskCount() < n_tasks and report_queue:
+            handler.Start(FakeDownloaderTask(report_queue.pop()))
+        if not report_queue and handler.ActiveTaskCount() == 0:
+            break
+        time.sleep(0.1)
+    elapsed = time.perf_counter() - begin
+    handler.executor.shutdown()
+    return elapsed
+
+
+def RunEventDriven(n: int, n_tasks: int, work_dir: str) -> float:
+    """Runs PDFDownloader with the event driven scheduler.
+    """
+    config = Config(_in_file="unused.xlsx",
+                    _out_file=os.path.join(work_dir, "out.csv"),
+                    _out_pdf_dir=os.path.join(work_dir, "out"),
+                    _log_level=False,
+                    _n_tasks=n_tasks)
+    with patch.object(pdfdownloader, "URLDownloaderTask",
+                      FakeDownloaderTask):
+        app = PDFDownloader(config)
+        app.read_task = FakeReaderTask(n, config.out_dir_path,
+                                       _queue=app.read_queue,
+                                       _on_rows=app.ReadRowsCB)
+        begin = time.perf_counter()
+        app.Run()
+    return time.perf_counter() - begin
+
+
+def PrintGaps(name: str, elapsed: float, n_tasks: int):
+    """Prints total duration and gap statistics of a run.
+    """
+    gaps = Gaps(n_tasks)
+    print(f"{name:>12}: total {elapsed * 1000:8.1f} ms,"
+          f" gap mean {statistics.mean(gaps):6.2f} ms,"
+          f" median {statistics.median(gaps):6.2f} ms,"
+          f" max {max(gaps):6.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--files", type=int, default=200,
+                        help="Number of simulated downloads")
+    parser.add_argument("-t", "--tasks", type=int, default=4,
+                        help="Concurrent downloads")
+    parser.add_argument("-d", "--duration", type=float, default=5,
+                        help="Duration of a download in ms")
+    args = parser.parse_args()
+    FakeDownloaderTask.duration = args.duration / 1000
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        print(f"{args.files} downloads of {args.duration} ms,"
+              f" {args.tasks} concurrent")
+        FakeDownloaderTask.starts, FakeDownloaderTask.ends = [], []
+        PrintGaps("polling", RunPolling(args.files, args.tasks), args.tasks)
+        FakeDownloaderTask.starts, FakeDownloaderTask.ends = [], []
+        PrintGaps("event driven",
+                RunEventDriven(args.files, args.tasks, work_dir), args.tasks)
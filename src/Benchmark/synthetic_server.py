@@ -0,0 +1,402 @@
+"""Local stand-in for the report servers, serving synthetic pdfs.
+
+Every path /f/<n>.pdf is a valid one page pdf padded with random bytes
+to a size drawn from a size distribution. The size and content of a path
+are the same for every request, so resumed and conditional requests
+behave like on a real server. Latency, bandwidth, error responses,
+redirects and stalled connections are set by a ServerProfile.
+
+Usage:
+>> python src/Benchmark/synthetic_server.py -p 8080 --sizes lognormal:200:1
+"""
+import argparse
+import hashlib
+import http.server
+import math
+import os
+import random
+import re
+import ssl
+import subprocess
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Callable
+
+
+def SizeDistribution(spec: str) -> Callable[[random.Random], int]:
+    """Parses a size distribution, sizes in KiB:
+    - fixed:<size>
+    - uniform:<min>:<max>
+    - lognormal:<median>:<sigma>
+
+    Args:
+        spec (str): distribution, e.g. "lognormal:200:1"
+
+    Raises:
+        ValueError: if the distribution is unknown
+
+    Returns:
+        Callable[[random.Random], int]: draws a size in bytes
+    """
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: int(values[0] * 1024)
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: int(rng.uniform(*values) * 1024)
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: int(rng.lognormvariate(math.log(values[0]),
+                                                  values[1]) * 1024)
+    raise ValueError(f"Unknown size distribution \"{spec}\"")
+
+
+@dataclass
+class ServerProfile:
+    ''' Behaviour of the synthetic server
+    '''
+    # size distribution of the files, see SizeDistribution
+    sizes: str = "lognormal:200:1"
+    # seconds before the response head, and random extra seconds
+    latency_s: float = 0.05
+    jitter_s: float = 0.0
+    # bytes per second per connection, 0 = no limit
+    bandwidth: int = 0
+    # fraction of requests answered with 503
+    error_rate: float = 0.0
+    # fraction of paths answered with 404 on every request
+    missing_rate: float = 0.0
+    # fraction of paths redirected once
+    redirect_rate: float = 0.0
+    # fraction of requests stalling halfway through the body
+    stall_rate: float = 0.0
+    stall_s: float = 30.0
+    seed: int = 0
+
+
+class SyntheticPDFs:
+    """Generates the pdf of a path.
+    Padding is sliced from one shared random block, so large files cost
+    a copy instead of random number generation.
+    """
+    block_size: int = 1 << 20
+
+    def __init__(self, profile: ServerProfile):
+        self.profile = profile
+        self.draw_size = SizeDistribution(profile.sizes)
+        self.block = random.Random(profile.seed).randbytes(self.block_size)
+
+    def Seed(self, path: str) -> int:
+        """Returns the seed of a path, the same in every process.
+
+        Args:
+            path (str): url path
+
+        Returns:
+            int: seed
+        """
+        digest = hashlib.sha256(f"{self.profile.seed}:{path}".encode())
+        return int.from_bytes(digest.digest()[:8], "big")
+
+    def Chance(self, path: str, what: str) -> float:
+        """Returns a fixed number in [0, 1) for a path and a property.
+
+        Args:
+            path (str): url path
+            what (str): property, e.g. "missing"
+
+        Returns:
+            float: number drawn for the path
+        """
+        return random.Random(f"{self.Seed(path)}:{what}").random()
+
+    def Body(self, path: str) -> bytes:
+        """Returns the pdf of a path.
+
+        Args:
+            path (str): url path
+
+        Returns:
+            bytes: pdf of about the drawn size
+        """
+        seed = self.Seed(path)
+        size = max(self.draw_size(random.Random(seed)), 0)
+        text = f"BT /F1 12 Tf 72 720 Td (Report {path}) Tj ET".encode()
+        objects = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+            (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792]"
+             b" /Contents 4 0 R /Resources << /Font << /F1 << /Type /Font"
+             b" /Subtype /Type1 /BaseFont /Helvetica >> >> >> >>"),
+            self.Stream(text),
+            # padding, not referenced by the page
+            self.Stream(self.Padding(seed, size))]
+        out = bytearray(b"%PDF-1.4\n")
+        offsets = []
+        for i, obj in enumerate(objects, 1):
+            offsets.append(len(out))
+            out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+        xref = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+        out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+        out += (b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n"
+                b"%%%%EOF\n" % (len(objects) + 1, xref))
+        return bytes(out)
+
+    def Padding(self, seed: int, size: int) -> bytes:
+        start = seed % self.block_size
+        parts = []
+        while size > 0:
+            part = self.block[start:start + size]
+            parts.append(part)
+            size -= len(part)
+            start = 0
+        return b"".join(parts)
+
+    @staticmethod
+    def Stream(data: bytes) -> bytes:
+        return b"<< /Length %d >>\nstream\n" % len(data) + data \
+            + b"\nendstream"
+
+
+class SyntheticHandler(http.server.BaseHTTPRequestHandler):
+    """Serves /f/<n>.pdf and the redirect target /r/<n>.pdf.
+    """
+    protocol_version = "HTTP/1.1"
+    pdfs: SyntheticPDFs = None
+    rng: random.Random = random.Random()
+    rng_lock = threading.Lock()
+    chunk_size: int = 16 * 1024
+    path_re = re.compile(r"^/([fr])/([\w.-]+\.pdf)$")
+    range_re = re.compile(r"^bytes=(\d+)-$")
+
+    def Random(self) -> float:
+        with self.rng_lock:
+            return self.rng.random()
+
+    def do_GET(self):
+        profile = self.pdfs.profile
+        match = self.path_re.match(self.path)
+        if not match:
+            return self.SendStatus(404)
+        kind, name = match.groups()
+        path = f"/f/{name}"
+        time.sleep(profile.latency_s + self.Random() * profile.jitter_s)
+        if self.pdfs.Chance(path, "missing") < profile.missing_rate:
+            return self.SendStatus(404)
+        if self.Random() < profile.error_rate:
+            return self.SendStatus(503)
+        if kind == "f" and \
+                self.pdfs.Chance(path, "redirect") < profile.redirect_rate:
+            self.send_response(302)
+            self.send_header("Location", f"/r/{name}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = self.pdfs.Body(path)
+        etag = f"\"{zlib.crc32(body):08x}\""
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        offset = 0
+        match = self.range_re.match(self.headers.get("Range", ""))
+        if match and self.headers.get("If-Range", etag) == etag:
+            offset = int(match.group(1))
+            if offset >= len(body):
+                return self.SendStatus(416)
+            self.send_response(206)
+            self.send_header("Content-Range",
+                             f"bytes {offset}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(body) - offset))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.end_headers()
+        stall_at = len(body) // 2 if self.Random() < profile.stall_rate \
+            else None
+        self.SendBody(memoryview(body), offset, stall_at)
+
+    def SendBody(self, body: memoryview, offset: int,
+                 stall_at: int | None):
+        """Writes the body in chunks within the bandwidth limit.
+        A stalled response stops sending halfway, waits and closes the
+        connection.
+        """
+        bandwidth = self.pdfs.profile.bandwidth
+        start = time.monotonic()
+        sent = 0
+        try:
+            while offset < len(body):
+                end = min(offset + self.chunk_size, len(body))
+                if stall_at is not None and end > stall_at:
+                    time.sleep(self.pdfs.profile.stall_s)
+                    self.close_connection = True
+                    return
+                self.wfile.write(body[offset:end])
+                sent += end - offset
+                offset = end
+                if bandwidth:
+                    ahead = sent / bandwidth - (time.monotonic() - start)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def SendStatus(self, status: int):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SyntheticServer:
+    """Synthetic pdf server running in a background thread.
+    """
+    def __init__(self, profile: ServerProfile, port: int = 0,
+                 cert_file: str | None = None,
+                 key_file: str | None = None):
+        """Constructs the server, listening on 127.0.0.1.
+
+        Args:
+            profile (ServerProfile): server behaviour
+            port (int, optional): port, 0 picks a free port.
+            Defaults to 0.
+            cert_file (str | None, optional): certificate to serve https.
+            Defaults to None.
+            key_file (str | None, optional): key of the certificate.
+            Defaults to None.
+        """
+        handler = type("Handler", (SyntheticHandler,),
+                       {"pdfs": SyntheticPDFs(profile),
+                        "rng": random.Random(profile.seed)})
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", port),
+                                                      handler)
+        self.server.daemon_threads = True
+        self.scheme = "http"
+        if cert_file:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(cert_file, key_file)
+            self.server.socket = context.wrap_socket(self.server.socket,
+                                                     server_side=True)
+            self.scheme = "https"
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+
+    def URL(self, name: str) -> str:
+        """Returns the url of a file.
+
+        Args:
+            name (str): file name without .pdf
+
+        Returns:
+            str: url
+        """
+        return (f"{self.scheme}://127.0.0.1:{self.server.server_port}"
+                f"/f/{name}.pdf")
+
+    def Start(self):
+        self.thread.start()
+
+    def Stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def CreateCertificate(dir_path: str) -> tuple[str, str]:
+    """Creates a self signed certificate for 127.0.0.1 with openssl.
+
+    Args:
+        dir_path (str): directory of the files
+
+    Raises:
+        OSError: if openssl is not installed
+        subprocess.CalledProcessError: if openssl fails
+
+    Returns:
+        tuple[str, str]: certificate and key file
+    """
+    cert_file = os.path.join(dir_path, "cert.pem")
+    key_file = os.path.join(dir_path, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048",
+                    "-nodes", "-days", "1", "-subj", "/CN=127.0.0.1",
+                    "-addext", "subjectAltName=IP:127.0.0.1",
+                    "-keyout", key_file, "-out", cert_file],
+                   check=True, capture_output=True)
+    return cert_file, key_file
+
+
+def AddProfileArguments(parser: argparse.ArgumentParser):
+    """Adds the fields of ServerProfile as options.
+
+    Args:
+        parser (argparse.ArgumentParser): parser to extend
+    """
+    defaults = ServerProfile()
+    parser.add_argument("--sizes", default=defaults.sizes,
+                        help=("File sizes in KiB, fixed:<kib>,"
+                              " uniform:<min>:<max> or"
+                              " lognormal:<median>:<sigma>"))
+    parser.add_argument("--latency", type=float, default=defaults.latency_s,
+                        help="Seconds before the response head")
+    parser.add_argument("--jitter", type=float, default=defaults.jitter_s,
+                        help="Random extra latency in seconds")
+    parser.add_argument("--bandwidth", type=float, default=0,
+                        help="KiB/s per connection, 0 = no limit")
+    parser.add_argument("--error-rate", type=float,
+                        default=defaults.error_rate,
+                        help="Fraction of requests answered with 503")
+    parser.add_argument("--missing-rate", type=float,
+                        default=defaults.missing_rate,
+                        help="Fraction of files answered with 404")
+    parser.add_argument("--redirect-rate", type=float,
+                        default=defaults.redirect_rate,
+                        help="Fraction of files redirected once")
+    parser.add_argument("--stall-rate", type=float,
+                        default=defaults.stall_rate,
+                        help="Fraction of requests stalling halfway")
+    parser.add_argument("--stall", type=float, default=defaults.stall_s,
+                        help="Seconds a stalled request waits")
+    parser.add_argument("--seed", type=int, default=defaults.seed,
+                        help="Seed of the sizes and failures")
+
+
+def ProfileFromArguments(args: argparse.Namespace) -> ServerProfile:
+    """Returns the profile of the options added by AddProfileArguments.
+    """
+    SizeDistribution(args.sizes)
+    return ServerProfile(sizes=args.sizes, latency_s=args.latency,
+                         jitter_s=args.jitter,
+                         bandwidth=int(args.bandwidth * 1024),
+                         error_rate=args.error_rate,
+                         missing_rate=args.missing_rate,
+                         redirect_rate=args.redirect_rate,
+                         stall_rate=args.stall_rate, stall_s=args.stall,
+                         seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-p", "--port", type=int, default=8080,
+                        help="Port to listen on")
+    parser.add_argument("--cert", help="Certificate file, serves https")
+    parser.add_argument("--key", help="Key file of the certificate")
+    AddProfileArguments(parser)
+    args = parser.parse_args()
+    server = SyntheticServer(ProfileFromArguments(args), args.port,
+                             args.cert, args.key)
+    print(f"Serving {server.URL('<n>')}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
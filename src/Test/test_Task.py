@@ -2,10 +2,14 @@
 from types import SimpleNamespace
 import unittest
 import os
+import queue
 import sys
+import threading
 from unittest.mock import MagicMock, patch
 
 import pandas as pd
+from openpyxl import Workbook
+from tempfile import TemporaryDirectory
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from state import ReportState
 from task import FileReaderTask, TaskState
@@ -34,8 +38,8 @@ class URLDownloaderTask_Test(unittest.TestCase):
     @patch('task.Logger')
     @patch.object(FileReaderTask, 'FileExists')
     @patch.object(FileReaderTask, 'ValidateURL')
-    @patch('task.pd.ExcelFile')
-    def test_start_Download_true(self, mock_excel_file, mock_validate_url, mock_file_exists, mock_logger):
+    @patch.object(FileReaderTask, 'ReadRows')
+    def test_start_Download_true(self, mock_read_rows, mock_validate_url, mock_file_exists, mock_logger):
         
         task = FileReaderTask('file.xlsx', '/pdfs')
         task.name = 'TestTask'
@@ -57,7 +61,9 @@ class URLDownloaderTask_Test(unittest.TestCase):
             'BRnum': '123',
             'Pdf_URL': 'http://example.com/doc.pdf'
         }])
-        mock_excel_file.return_value.parse.return_value = df
+        mock_read_rows.return_value = [
+            (index, row['BRnum'], row['Pdf_URL'])
+            for index, row in df.iterrows()]
 
         
         mock_validate_url.return_value = True
@@ -71,7 +77,9 @@ class URLDownloaderTask_Test(unittest.TestCase):
         task.timer.Start.assert_called_once()
         task.Stop.assert_called_once()
         mock_report_state.Append.assert_called_once()
-        mock_logger.return_value.Trace.assert_any_call('Read entry:\n 123 - http://example.com/doc.pdf')
+        mock_logger.return_value.Trace.assert_any_call(
+            'Read entry:\n %s - %s', '123', 'http://example.com/doc.pdf',
+            brnum='123', url='http://example.com/doc.pdf')
         mock_logger.return_value.Info.assert_called_once()
 
 
@@ -80,8 +88,8 @@ class URLDownloaderTask_Test(unittest.TestCase):
     @patch('task.Logger')
     @patch.object(FileReaderTask, 'FileExists')
     @patch.object(FileReaderTask, 'ValidateURL')
-    @patch('task.pd.ExcelFile')
-    def test_start_Download_false_URL(self, mock_excel_file, mock_validate_url, mock_file_exists, mock_logger):
+    @patch.object(FileReaderTask, 'ReadRows')
+    def test_start_Download_false_URL(self, mock_read_rows, mock_validate_url, mock_file_exists, mock_logger):
         
         task = FileReaderTask('file.xlsx', '/pdfs')
         task.name = 'TestTask'
@@ -103,7 +111,9 @@ class URLDownloaderTask_Test(unittest.TestCase):
             'BRnum': '123',
             'Pdf_URL': 'http://example.com/doc.pdf'
         }])
-        mock_excel_file.return_value.parse.return_value = df
+        mock_read_rows.return_value = [
+            (index, row['BRnum'], row['Pdf_URL'])
+            for index, row in df.iterrows()]
 
         
         mock_validate_url.return_value = False
@@ -122,7 +132,8 @@ class URLDownloaderTask_Test(unittest.TestCase):
         self.assertEqual(appended_report.url,'None')
         self.assertEqual(appended_report.status, ReportState.NOT_DOWNLOADED)
         
-        mock_logger.return_value.Trace.assert_any_call('Read entry:\n 123 - None')
+        mock_logger.return_value.Trace.assert_any_call(
+            'Read entry:\n %s - %s', '123', 'None', brnum='123', url='None')
         mock_logger.return_value.Info.assert_called_once()
 
 
@@ -131,8 +142,8 @@ class URLDownloaderTask_Test(unittest.TestCase):
     @patch('task.Logger')
     @patch.object(FileReaderTask, 'FileExists')
     @patch.object(FileReaderTask, 'ValidateURL')
-    @patch('task.pd.ExcelFile')
-    def test_start_Download_false_Internet_failure(self, mock_excel_file, mock_validate_url, mock_file_exists, mock_logger):
+    @patch.object(FileReaderTask, 'ReadRows')
+    def test_start_Download_false_Internet_failure(self, mock_read_rows, mock_validate_url, mock_file_exists, mock_logger):
         
         task = FileReaderTask('file.xlsx', '/pdfs')
         task.name = 'TestTask'
@@ -154,7 +165,7 @@ class URLDownloaderTask_Test(unittest.TestCase):
             'BRnum': '123',
             'Pdf_URL': 'http://example.com/doc.pdf'
         }])
-        mock_excel_file.return_value.parse.side_effect = Exception("Internet connection failed")
+        mock_read_rows.side_effect = Exception("Internet connection failed")
 
         
         mock_validate_url.return_value = True
@@ -169,5 +180,80 @@ class URLDownloaderTask_Test(unittest.TestCase):
         error_call_args = mock_logger.return_value.Error.call_args[0][0]
         self.assertIn("Internet connection failed", error_call_args)
 
+class FileReaderTask_ReadRows_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.in_file = os.path.join(self.tmp_dir.name, 'in.xlsx')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_read_rows_streams_the_needed_columns(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Title', 'Pdf_URL', 'BRnum'])
+        sheet.append(['a', 'http://example.com/a.pdf', 'BR1'])
+        sheet.append([None, None, None])
+        sheet.append(['c', None, 3])
+        workbook.save(self.in_file)
+
+        rows = list(FileReaderTask(self.in_file, '/pdfs').ReadRows())
+
+        self.assertEqual(rows, [(0, 'BR1', 'http://example.com/a.pdf'),
+                                (2, 3, '')])
+
+    def test_read_rows_missing_column(self):
+        workbook = Workbook()
+        workbook.active.append(['BRnum', 'URL'])
+        workbook.save(self.in_file)
+
+        with self.assertRaises(KeyError):
+            list(FileReaderTask(self.in_file, '/pdfs').ReadRows())
+
+    def test_reader_waits_for_queue_space(self):
+        workbook = Workbook()
+        workbook.active.append(['BRnum', 'Pdf_URL'])
+        for i in range(5):
+            workbook.active.append([f'BR{i}', f'http://x/{i}.pdf'])
+        workbook.save(self.in_file)
+        reports = queue.Queue(2)
+        on_rows = MagicMock()
+        task = FileReaderTask(self.in_file, self.tmp_dir.name,
+                              _queue=reports, _on_rows=on_rows)
+        thread = threading.Thread(target=task.Start)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+
+        self.assertEqual(reports.get(timeout=5).name, 'BR0')
+        names = [reports.get(timeout=5).name for _ in range(4)]
+        thread.join(5)
+
+        self.assertEqual(names, ['BR1', 'BR2', 'BR3', 'BR4'])
+        self.assertEqual(task.status, TaskState.DONE)
+        self.assertEqual(task.ReadData(), [])
+        on_rows.assert_called()
+
+    def test_stopped_reader_leaves_full_queue(self):
+        workbook = Workbook()
+        workbook.active.append(['BRnum', 'Pdf_URL'])
+        for i in range(5):
+            workbook.active.append([f'BR{i}', f'http://x/{i}.pdf'])
+        workbook.save(self.in_file)
+        reports = queue.Queue(1)
+        task = FileReaderTask(self.in_file, self.tmp_dir.name,
+                              _queue=reports)
+        thread = threading.Thread(target=task.Start)
+        thread.start()
+        while not reports.full():
+            thread.join(0.01)
+
+        task.Stop()
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(task.rows_read, 1)
+
+
 if __name__ == '__main__':
     unittest.main()
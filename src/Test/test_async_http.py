@@ -0,0 +1,56 @@
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from async_http import AsyncHTTPClient, AsyncHTTPResponse
+
+
+def make_reader(data: bytes) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+class AsyncHTTPResponse_Test(unittest.TestCase):
+
+    def test_read_content_length(self):
+        async def run():
+            response = AsyncHTTPResponse(
+                'http://x', 'HTTP/1.1', 200, 'OK', {'content-length': '5'},
+                make_reader(b'%PDF-trailing'), MagicMock())
+            return await response.Read()
+        self.assertEqual(asyncio.run(run()), b'%PDF-')
+
+    def test_read_chunked(self):
+        async def run():
+            response = AsyncHTTPResponse(
+                'http://x', 'HTTP/1.1', 200, 'OK', {'transfer-encoding': 'chunked'},
+                make_reader(b'3\r\n%PD\r\n2;ext=1\r\nF-\r\n0\r\n\r\n'),
+                MagicMock())
+            return await response.Read()
+        self.assertEqual(asyncio.run(run()), b'%PDF-')
+
+    def test_read_until_eof(self):
+        async def run():
+            response = AsyncHTTPResponse(
+                'http://x', 'HTTP/1.1', 200, 'OK', {},
+                make_reader(b'%PDF-1.7'), MagicMock())
+            return await response.Read()
+        self.assertEqual(asyncio.run(run()), b'%PDF-1.7')
+
+    def test_read_head(self):
+        async def run():
+            return await AsyncHTTPClient().ReadHead(make_reader(
+                b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n'))
+        version, status, reason, headers = asyncio.run(run())
+        self.assertEqual(version, 'HTTP/1.1')
+        self.assertEqual(status, 404)
+        self.assertEqual(reason, 'Not Found')
+        self.assertEqual(headers, {'content-length': '0'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from connection_pool import ConnectionPool
+
+
+class ConnectionPool_Test(unittest.TestCase):
+
+    def test_key(self):
+        self.assertEqual(ConnectionPool.Key('https://Example.com/a.pdf'),
+                         ('https', 'example.com', 443))
+        self.assertEqual(ConnectionPool.Key('http://example.com:8080/a'),
+                         ('http', 'example.com', 8080))
+        with self.assertRaises(ValueError):
+            ConnectionPool.Key('ftp://example.com/a.pdf')
+
+    def test_target_quotes_path(self):
+        self.assertEqual(ConnectionPool.Target('http://x/my report.pdf?a=1'),
+                         '/my%20report.pdf?a=1')
+        self.assertEqual(ConnectionPool.Target('http://x'), '/')
+
+    def test_release_and_acquire_reuses_connection(self):
+        pool = ConnectionPool()
+        key = ('http', 'pool-test.local', 80)
+        conn = MagicMock()
+        conn.key = key
+        pool.Release(conn)
+        reused, is_reused = pool.Acquire(key, timeout=5)
+        self.assertIs(reused, conn)
+        self.assertTrue(is_reused)
+        fresh, is_reused = pool.Acquire(key, timeout=5)
+        self.assertIsNot(fresh, conn)
+        self.assertFalse(is_reused)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import hashlib
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from content_store import ContentStore
+
+
+class ContentStore_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.store = ContentStore(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name: str, data: bytes) -> tuple[str, str]:
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path, hashlib.sha256(data).hexdigest()
+
+    def test_file_is_linked_to_its_object(self):
+        path, sha256 = self.write('a.pdf', b'%PDF-a')
+        self.assertFalse(self.store.Store(path, sha256))
+        obj = self.store.ObjectPath(sha256)
+        self.assertEqual(obj, os.path.join(self.tmp_dir.name, 'objects',
+                                           sha256[:2], sha256[2:]))
+        self.assertTrue(os.path.samefile(obj, path))
+        self.assertTrue(self.store.Store(path, sha256))
+
+    def test_same_content_shares_one_object(self):
+        a, sha256 = self.write('a.pdf', b'%PDF-same')
+        b, _ = self.write('b.pdf', b'%PDF-same')
+        self.store.Store(a, sha256)
+        self.assertTrue(self.store.Store(b, sha256))
+        self.assertTrue(os.path.samefile(a, b))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dir_index import DirectoryIndex
+
+
+class DirectoryIndex_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.pdf_dir = os.path.join(self.tmp_dir.name, 'out')
+        self.index_file = os.path.join(self.tmp_dir.name, 'index.json')
+        os.makedirs(os.path.join(self.pdf_dir, 'sub.pdf'))
+        self.write('a.pdf', b'12345')
+        self.write('b.pdf.part', b'12')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name: str, data: bytes):
+        with open(os.path.join(self.pdf_dir, name), 'wb') as f:
+            f.write(data)
+
+    def test_scan_indexes_pdf_files(self):
+        index = DirectoryIndex(self.pdf_dir)
+        self.assertFalse(index.Build())
+        self.assertTrue(index.Contains('a.pdf'))
+        self.assertEqual(index.Size('a.pdf'), 5)
+        self.assertFalse(index.Contains('b.pdf'))
+        self.assertEqual(len(index), 1)
+
+    def test_missing_directory_gives_empty_index(self):
+        index = DirectoryIndex(os.path.join(self.tmp_dir.name, 'none'))
+        index.Build()
+        self.assertEqual(len(index), 0)
+
+    def test_update_follows_downloads(self):
+        index = DirectoryIndex(self.pdf_dir)
+        index.Build()
+        self.write('c.pdf', b'123')
+        index.Update('c.pdf')
+        os.remove(os.path.join(self.pdf_dir, 'a.pdf'))
+        index.Update('a.pdf')
+        self.assertEqual(index.Size('c.pdf'), 3)
+        self.assertFalse(index.Contains('a.pdf'))
+
+    def test_index_file_is_used_while_directory_is_unchanged(self):
+        index = DirectoryIndex(self.pdf_dir, self.index_file)
+        index.Build()
+        self.write('c.pdf', b'123')
+        index.Update('c.pdf')
+        index.Save()
+
+        index = DirectoryIndex(self.pdf_dir, self.index_file)
+        self.assertTrue(index.Build())
+        self.assertTrue(index.Contains('c.pdf'))
+
+    def test_changed_directory_is_scanned_again(self):
+        index = DirectoryIndex(self.pdf_dir, self.index_file)
+        index.Build()
+        index.Save()
+        os.remove(os.path.join(self.pdf_dir, 'a.pdf'))
+        st = os.stat(self.pdf_dir)
+        # mtime resolution of the file system may hide the removal
+        os.utime(self.pdf_dir, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+
+        index = DirectoryIndex(self.pdf_dir, self.index_file)
+        self.assertFalse(index.Build())
+        self.assertFalse(index.Contains('a.pdf'))
+
+    def test_corrupt_index_file_is_scanned_again(self):
+        with open(self.index_file, 'w') as f:
+            f.write('{"mtime": ')
+        index = DirectoryIndex(self.pdf_dir, self.index_file)
+        self.assertFalse(index.Build())
+        self.assertTrue(index.Contains('a.pdf'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from http_cache import CacheEntry, HTTPCache
+
+URL = 'http://x/doc.pdf'
+
+
+class HTTPCache_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.cache_file = os.path.join(self.tmp_dir.name, 'cache.json')
+        self.pdf_file = os.path.join(self.tmp_dir.name, 'doc.pdf')
+        with open(self.pdf_file, 'wb') as f:
+            f.write(b'%PDF-1.7 %%EOF')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_entries_are_persisted(self):
+        cache = HTTPCache(self.cache_file)
+        cache.Store(URL, {'etag': '"v1"'}, 14, 'abc')
+        cache.Save()
+
+        loaded = HTTPCache(self.cache_file)
+        loaded.Load()
+        self.assertEqual(loaded.Get(URL),
+                         CacheEntry(URL, '"v1"', None, 14, 'abc'))
+
+    def test_corrupt_cache_file_is_empty(self):
+        with open(self.cache_file, 'w') as f:
+            f.write('{not json')
+        cache = HTTPCache(self.cache_file)
+        cache.Load()
+        self.assertIsNone(cache.Get(URL))
+
+    def test_conditional_headers(self):
+        cache = HTTPCache(self.cache_file)
+        cache.Store(URL, {'etag': '"v1"',
+                          'last-modified': 'Mon, 01 Jan 2024'}, 14, 'abc')
+        self.assertEqual(cache.Conditional(URL, self.pdf_file),
+                         {'If-None-Match': '"v1"',
+                          'If-Modified-Since': 'Mon, 01 Jan 2024'})
+
+    def test_no_conditional_headers_for_changed_file(self):
+        cache = HTTPCache(self.cache_file)
+        cache.Store(URL, {'etag': '"v1"'}, 99, 'abc')
+        self.assertIsNone(cache.Conditional(URL, self.pdf_file))
+        cache.Store(URL, {}, 14, 'abc')
+        self.assertIsNone(cache.Conditional(URL, self.pdf_file))
+        self.assertIsNone(cache.Conditional('http://x/other.pdf',
+                                            self.pdf_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import io
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from datetime import datetime
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import Logger, LogEntry, LogLevel, LogSyncState
+from task import LoggerTask
+
+
+class LoggerTask_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.state = LogSyncState()
+        self.task = LoggerTask(self.state, _flush_interval=60)
+        self.task.log_file = os.path.join(self.tmp_dir.name, 'logs', 'l.txt')
+        self.stdout = io.StringIO()
+        stdout = patch('sys.stdout', self.stdout)
+        stdout.start()
+        self.addCleanup(stdout.stop)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def log(self, msg: str):
+        self.state.Append(LogEntry(datetime.now(), LogLevel.INFO, msg))
+
+    def read(self) -> list[str]:
+        with open(self.task.log_file, encoding='utf-8') as f:
+            return [line.split(': ', 1)[1] for line in f.read().splitlines()]
+
+    def test_entries_are_written_without_polling(self):
+        thread = threading.Thread(target=self.task.Start)
+        thread.start()
+        self.log('first')
+        deadline = time.monotonic() + 5
+        while not os.path.exists(self.task.log_file) or not self.read():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        self.assertEqual(self.read(), ['first'])
+        self.task.Stop()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+    def test_stop_writes_queued_entries_in_order(self):
+        for i in range(1000):
+            self.log(f'entry {i}')
+        self.task.Stop()
+        self.assertEqual(self.read(), [f'entry {i}' for i in range(1000)])
+        self.assertEqual(self.stdout.getvalue().count('\n'), 1000)
+        self.assertIsNone(self.task.file)
+
+    def test_json_lines_hold_the_fields(self):
+        self.task.log_to_json = True
+        self.task.json_file = os.path.join(self.tmp_dir.name, 'l.jsonl')
+        self.state.Append(LogEntry(datetime.now(), LogLevel.TRACE, 'done',
+                                   {'brnum': 'BR1', 'bytes': 42}))
+        self.log('plain')
+        self.task.Stop()
+        with open(self.task.json_file, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(records[0]['level'], 'TRACE')
+        self.assertEqual(records[0]['brnum'], 'BR1')
+        self.assertEqual(records[0]['bytes'], 42)
+        self.assertEqual(records[1]['msg'], 'plain')
+        self.assertNotIn('brnum', records[1])
+        self.assertIsNone(self.task.json)
+
+
+class Logger_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = Logger()
+        self.level = self.logger.log_level
+        self.logger.log_state.PopAll()
+
+    def tearDown(self):
+        self.logger.SetLevel(self.level)
+        self.logger.log_state.PopAll()
+
+    def test_disabled_level_is_not_formatted(self):
+        class Arg:
+            def __str__(self):
+                raise AssertionError('formatted')
+        self.logger.SetLevel(LogLevel.INFO)
+        self.logger.Trace('value %s', Arg(), brnum='BR1')
+        self.assertEqual(len(self.logger.log_state.PopAll()), 0)
+
+    def test_enabled_level_formats_args_and_keeps_fields(self):
+        self.logger.SetLevel(LogLevel.TRACE)
+        self.logger.Trace('%s of %d', 'BR1', 3, brnum='BR1')
+        entries = self.logger.log_state.PopAll()
+        self.assertEqual(entries[0].msg, 'BR1 of 3')
+        self.assertEqual(entries[0].fields, {'brnum': 'BR1'})
+
+
+if __name__ == '__main__':
+    unittest.main()
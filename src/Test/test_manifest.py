@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from manifest import Manifest
+from state import Report, ReportState
+
+
+class Manifest_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp_dir.name, 'manifest.db')
+        self.in_file = os.path.join(self.tmp_dir.name, 'in.xlsx')
+        with open(self.in_file, 'wb') as f:
+            f.write(b'rows')
+        self.reports = [
+            Report('a', 0, 'http://x/a.pdf', ReportState.INIT),
+            Report('b', 1, 'http://x/b.pdf', ReportState.INIT),
+            Report('c', 2, 'None', ReportState.NOT_DOWNLOADED)]
+        self.manifest = Manifest(self.db_file, batch_size=2,
+                                 interval=3600)
+        self.manifest.Open()
+        self.manifest.Begin(self.in_file, self.reports[:1])
+        for report in self.reports[1:]:
+            self.manifest.Record(report)
+        self.manifest.ReadDone()
+
+    def tearDown(self):
+        self.manifest.Close()
+        self.tmp_dir.cleanup()
+
+    def reopen(self) -> Manifest:
+        manifest = Manifest(self.db_file)
+        manifest.Open()
+        self.addCleanup(manifest.Close)
+        return manifest
+
+    def test_transitions_are_written_in_batches(self):
+        self.reports[0].status = ReportState.DOWNLOADED
+        self.manifest.Record(self.reports[0])
+        self.assertEqual(len(self.reopen().Resume(self.in_file)), 2)
+        self.reports[1].status = ReportState.STAGED
+        self.reports[1].attempts = 1
+        self.manifest.Record(self.reports[1])
+
+        resumed = self.reopen().Resume(self.in_file)
+        self.assertEqual([(r.name, r.status) for r in resumed],
+                         [('b', ReportState.INIT)])
+        self.assertEqual(resumed[0].attempts, 1)
+
+    def test_complete_run_is_not_resumed(self):
+        self.manifest.Complete()
+        self.assertIsNone(self.reopen().Resume(self.in_file))
+
+    def test_partly_read_input_file_is_not_resumed(self):
+        self.manifest.Begin(self.in_file, self.reports)
+        self.assertIsNone(self.reopen().Resume(self.in_file))
+
+    def test_changed_input_file_is_not_resumed(self):
+        self.assertEqual(len(self.reopen().Resume(self.in_file)), 2)
+        with open(self.in_file, 'ab') as f:
+            f.write(b'more rows')
+        self.assertIsNone(self.reopen().Resume(self.in_file))
+
+    def test_reports_export(self):
+        self.reports[2].attempts = 2
+        self.manifest.Record(self.reports[2])
+        self.reports[0].status = ReportState.DOWNLOADED
+        self.reports[0].sha256, self.reports[0].size = 'ab12', 42
+        self.manifest.Record(self.reports[0])
+        self.assertEqual(list(self.manifest.Reports()), self.reports)
+        self.assertEqual([r.name for r in self.manifest.Unfinished()],
+                         ['b'])
+
+    def test_columns_are_added_to_an_old_manifest(self):
+        db_file = os.path.join(self.tmp_dir.name, 'old.db')
+        conn = sqlite3.connect(db_file)
+        conn.executescript("""
+            CREATE TABLE reports (
+                id INTEGER PRIMARY KEY, name TEXT NOT NULL,
+                url TEXT NOT NULL, status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0, updated REAL NOT NULL);
+            INSERT INTO reports VALUES (0, 'a', 'u', 'DOWNLOADED', 1, 0);
+        """)
+        conn.close()
+        manifest = Manifest(db_file)
+        manifest.Open()
+        self.addCleanup(manifest.Close)
+        self.assertEqual(list(manifest.Reports()),
+                         [Report('a', 0, 'u', ReportState.DOWNLOADED, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from metrics import Histogram, MetricsRegistry, MetricsExporter
+
+
+class Histogram_Test(unittest.TestCase):
+
+    def test_quantiles_are_within_the_bucket_error(self):
+        histogram = Histogram()
+        for value in range(1, 10001):
+            histogram.Record(value)
+        for q in (0.5, 0.9, 0.99):
+            exact = q * 10000
+            self.assertLessEqual(abs(histogram.Quantile(q) - exact),
+                                 exact / 32)
+        self.assertEqual(histogram.Quantile(1.0), 10000)
+
+    def test_small_and_empty_values(self):
+        histogram = Histogram()
+        self.assertEqual(histogram.Quantile(0.5), 0.0)
+        histogram.Record(0.25)
+        histogram.Record(-1)
+        snapshot = histogram.Snapshot()
+        self.assertEqual(snapshot['count'], 2)
+        self.assertEqual(snapshot['min'], 0)
+        self.assertEqual(histogram.Quantile(0.99), 0.25)
+
+
+class MetricsRegistry_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_labels_select_a_metric(self):
+        self.registry.Counter('downloads_total', 'Downloads',
+                              status='failed', error='http_503').Inc()
+        self.registry.Counter('downloads_total', error='http_503',
+                              status='failed').Inc()
+        self.registry.Counter('downloads_total', status='downloaded').Inc()
+        values = self.registry.Snapshot()['metrics'][
+            'pdfdownloader_downloads_total']
+        self.assertEqual(sorted(v['value'] for v in values), [1, 2])
+
+    def test_name_keeps_its_type(self):
+        self.registry.Counter('files')
+        with self.assertRaises(TypeError):
+            self.registry.Gauge('files', status='x')
+
+    def test_prometheus_format(self):
+        self.registry.Counter('downloads_total', 'Downloads',
+                              status='fai"led').Inc(2)
+        self.registry.Histogram('ttfb_ms').Record(10)
+        text = self.registry.Prometheus()
+        self.assertIn('# HELP pdfdownloader_downloads_total Downloads\n',
+                      text)
+        self.assertIn('# TYPE pdfdownloader_downloads_total counter\n',
+                      text)
+        self.assertIn('pdfdownloader_downloads_total{status="fai\\"led"} 2',
+                      text)
+        self.assertIn('pdfdownloader_ttfb_ms{quantile="0.99"} 10', text)
+        self.assertIn('pdfdownloader_ttfb_ms_count 1\n', text)
+
+
+class MetricsExporter_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.registry = MetricsRegistry()
+        self.registry.Gauge('downloads_in_flight').Set(3)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_files_are_written(self):
+        json_file = os.path.join(self.tmp_dir.name, 'm', 'metrics.json')
+        prom_file = os.path.join(self.tmp_dir.name, 'm', 'pdf.prom')
+        MetricsExporter(self.registry, json_file, prom_file).Write()
+        with open(json_file) as f:
+            data = json.load(f)
+        self.assertEqual(data['metrics'][
+            'pdfdownloader_downloads_in_flight'][0]['value'], 3)
+        with open(prom_file) as f:
+            self.assertIn('pdfdownloader_downloads_in_flight 3', f.read())
+        self.assertEqual(sorted(os.listdir(os.path.dirname(json_file))),
+                         ['metrics.json', 'pdf.prom'])
+
+    def test_write_waits_for_the_interval(self):
+        json_file = os.path.join(self.tmp_dir.name, 'metrics.json')
+        exporter = MetricsExporter(self.registry, json_file, interval=60)
+        exporter.WriteDue()
+        self.assertFalse(os.path.exists(json_file))
+        exporter.due = 0
+        exporter.WriteDue()
+        self.assertTrue(os.path.exists(json_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
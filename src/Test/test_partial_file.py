@@ -0,0 +1,85 @@
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from partial_file import PartialFile
+from pdf_validator import PDFEnds
+
+URL = 'http://x/doc.pdf'
+
+
+class PartialFile_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.pdf_file = os.path.join(self.tmp_dir.name, 'doc.pdf')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def interrupted(self, data: bytes, headers: dict[str, str]) \
+            -> PartialFile:
+        partial = PartialFile(self.pdf_file, URL)
+        partial.Load()
+        partial.Begin(200, headers)
+        with partial.Open() as f:
+            f.write(data)
+        return PartialFile(self.pdf_file, URL)
+
+    def test_resume_with_range(self):
+        partial = self.interrupted(b'%PDF-1.7 head', {'etag': '"v1"'})
+        self.assertEqual(partial.Load(), 13)
+        self.assertEqual(partial.Headers(),
+                         {'Range': 'bytes=13-', 'If-Range': '"v1"'})
+        offset = partial.Begin(206, {'etag': '"v1"',
+                                     'content-range': 'bytes 13-18/19'})
+        self.assertEqual(offset, 13)
+        ends = PDFEnds(head_size=5, tail_size=8)
+        partial.FeedEnds(ends)
+        with partial.Open() as f:
+            f.write(b' %%EOF')
+        ends.Feed(b' %%EOF')
+        partial.Finish()
+
+        with open(self.pdf_file, 'rb') as f:
+            self.assertEqual(f.read(), b'%PDF-1.7 head %%EOF')
+        self.assertEqual(bytes(ends.head), b'%PDF-')
+        self.assertEqual(bytes(ends.tail), b'ad %%EOF')
+        self.assertFalse(os.path.exists(partial.part_path))
+        self.assertFalse(os.path.exists(partial.meta_path))
+
+    def test_full_fetch_when_range_is_ignored(self):
+        partial = self.interrupted(b'old data',
+                                   {'last-modified': 'Mon, 01 Jan 2024'})
+        self.assertEqual(partial.Load(), 8)
+        self.assertEqual(partial.Begin(200, {}), 0)
+        with partial.Open() as f:
+            f.write(b'new')
+        with open(partial.part_path, 'rb') as f:
+            self.assertEqual(f.read(), b'new')
+        # Without a validator the file can not be resumed
+        self.assertEqual(PartialFile(self.pdf_file, URL).Load(), 0)
+
+    def test_partial_file_is_not_resumed_for_other_url(self):
+        self.interrupted(b'data', {'etag': '"v1"'})
+        partial = PartialFile(self.pdf_file, 'http://x/other.pdf')
+        self.assertEqual(partial.Load(), 0)
+        self.assertIsNone(partial.Headers())
+        self.assertFalse(os.path.exists(partial.part_path))
+
+    def test_weak_etag_falls_back_to_last_modified(self):
+        headers = {'etag': 'W/"v1"', 'last-modified': 'Mon, 01 Jan 2024'}
+        self.assertEqual(PartialFile.Validator(headers), 'Mon, 01 Jan 2024')
+        self.assertIsNone(PartialFile.Validator({'etag': 'W/"v1"'}))
+
+    def test_unexpected_content_range_is_rejected(self):
+        partial = self.interrupted(b'data', {'etag': '"v1"'})
+        partial.Load()
+        with self.assertRaises(ValueError):
+            partial.Begin(206, {'content-range': 'bytes 0-3/8'})
+        self.assertFalse(os.path.exists(partial.part_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
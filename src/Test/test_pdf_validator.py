@@ -0,0 +1,67 @@
+import io
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+from PyPDF2 import PdfWriter
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pdf_validator import InvalidPDFError, PDFEnds, PDFValidator
+from pdf_validator import ValidationLevel
+
+
+def make_pdf() -> bytes:
+    writer = PdfWriter()
+    writer.add_blank_page(200, 200)
+    data = io.BytesIO()
+    writer.write(data)
+    return data.getvalue()
+
+
+class PDFValidator_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.pdf_file = os.path.join(self.tmp_dir.name, 'doc.pdf')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, data: bytes):
+        with open(self.pdf_file, 'wb') as f:
+            f.write(data)
+
+    def test_ends_keep_head_and_tail(self):
+        ends = PDFEnds(head_size=4, tail_size=4)
+        for chunk in (b'%PD', b'F-1.7 body', b'%%E', b'OF'):
+            ends.Feed(chunk)
+        self.assertEqual(bytes(ends.head), b'%PDF')
+        self.assertEqual(bytes(ends.tail), b'%EOF')
+
+    def test_valid_pdf_passes_all_levels(self):
+        self.write(make_pdf())
+        for level in ValidationLevel:
+            PDFValidator(level).Validate(self.pdf_file)
+
+    def test_magic_rejects_html(self):
+        self.write(b'<html>Not found</html>')
+        PDFValidator(ValidationLevel.NONE).Validate(self.pdf_file)
+        with self.assertRaises(InvalidPDFError):
+            PDFValidator(ValidationLevel.MAGIC).Validate(self.pdf_file)
+
+    def test_magic_uses_captured_ends(self):
+        ends = PDFEnds()
+        ends.Feed(make_pdf())
+        # File is not read when the ends are given
+        PDFValidator(ValidationLevel.MAGIC).Validate('missing.pdf', ends)
+
+    def test_structure_rejects_broken_xref(self):
+        data = make_pdf()
+        offset = data.rindex(b'startxref')
+        self.write(data[:offset] + b'startxref\n9\n%%EOF\n')
+        PDFValidator(ValidationLevel.MAGIC).Validate(self.pdf_file)
+        with self.assertRaises(InvalidPDFError):
+            PDFValidator(ValidationLevel.STRUCTURE).Validate(self.pdf_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,24 @@
 from itertools import chain, repeat
+import csv
 import os
+import signal
 import sys
+import time
+from tempfile import TemporaryDirectory
 from types import SimpleNamespace
 import unittest
 from unittest.mock import patch,MagicMock
 from collections import deque
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from pdfdownloader import PDFDownloader
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                             '..', 'Benchmark')))
+from openpyxl import Workbook
+from pdfdownloader import Config, PDFDownloader
+from synthetic_server import ServerProfile, SyntheticServer
 from logger import LogLevel
+from pdf_validator import ValidationLevel
+from scheduler import HostScheduler
+from state import Report, ReportState
 
 
 class TestPdfdownloader(unittest.TestCase):
@@ -17,7 +28,47 @@ class TestPdfdownloader(unittest.TestCase):
             log_level=LogLevel.INFO,
             concurrent_tasks=5,
             in_file_path='dummy_input.csv',
-            out_dir_path='dummy_output_dir'
+            out_dir_path='dummy_output_dir',
+            engine='thread',
+            chunk_size=64 * 1024,
+            max_file_size=0,
+            max_inflight_bytes=0,
+            validation=ValidationLevel.FULL,
+            validation_workers=0,
+            validation_queue=64,
+            max_per_host=0,
+            host_rate=0,
+            host_burst=1,
+            max_attempts=3,
+            retry_base_s=1.0,
+            retry_max_s=60.0,
+            max_retry_after_s=600.0,
+            resume=True,
+            refresh=False,
+            cache_file="data/.http_cache.json",
+            manifest_file="data/.manifest.db",
+            out_file="data/output.csv",
+            dedup_output=False,
+            read_ahead=1024,
+            read_limit=65536,
+            index_file=None,
+            dedup_urls=True,
+            content_store=False,
+            json_log=False,
+            metrics_file=None,
+            prometheus_file=None,
+            metrics_interval=10.0,
+            adaptive_tasks=False,
+            min_tasks=1,
+            max_tasks=40,
+            adapt_interval_s=2.0,
+            shard_index=0,
+            shard_count=1,
+            part=None,
+            work_queue=None,
+            worker_id="worker",
+            lease_s=60.0,
+            claim_batch=16
         )
 
     @patch('pdfdownloader.ThreadPoolHandler')
@@ -43,6 +94,92 @@ class TestPdfdownloader(unittest.TestCase):
 
         self.assertFalse(obj.FilesWritten())
     
+    @patch('pdfdownloader.ThreadPoolHandler')
+    def test_stopped_downloads_are_counted_as_cancelled(self, MockHandler):
+        obj = PDFDownloader(self.dummy_conf)
+        cases = [(True, ReportState.NOT_DOWNLOADED, False, "cancelled"),
+                 (True, ReportState.STAGED, False, "cancelled"),
+                 (True, ReportState.DOWNLOADED, True, "downloaded"),
+                 (False, ReportState.DOWNLOADED, False, "not_modified")]
+        for i, (stopped, status, written, label) in enumerate(cases):
+            task = SimpleNamespace(stopped=stopped, error=None,
+                                   written=written, ttfb_ms=None, size=1,
+                                   timer=SimpleNamespace(
+                                       DurationMS=lambda: 1.0))
+            obj.RecordDownload(task, Report(f'BR{i}', i, 'http://x/a.pdf',
+                                            status))
+        counts = {label: obj.metrics.Counter("downloads_total", status=label,
+                                             error="").Snapshot()
+                  for label in ("cancelled", "downloaded", "not_modified",
+                                "failed")}
+        self.assertEqual(counts, {"cancelled": 2, "downloaded": 1,
+                                  "not_modified": 1, "failed": 0})
+
+    @patch('pdfdownloader.ThreadPoolHandler')
+    def test_reading_goes_on_past_a_blocked_host(self, MockHandler):
+        self.dummy_conf.read_ahead = 2
+        self.dummy_conf.read_limit = 100
+        obj = PDFDownloader(self.dummy_conf)
+        obj.manifest = MagicMock()
+        obj.report_queue = HostScheduler(max_per_host=1)
+        for i in range(10):
+            obj.read_queue.put(Report(f'BR{i}', i, f'http://a/{i}.pdf',
+                                      ReportState.INIT))
+        obj.read_queue.put(Report('BR10', 10, 'http://b/10.pdf',
+                                  ReportState.INIT))
+        obj.TakeReadReports()
+        self.assertEqual(len(obj.report_queue), 2)
+        obj.report_queue.Next()
+        obj.TakeReadReports()
+        self.assertEqual(len(obj.report_queue), 10)
+        self.assertEqual(obj.report_queue.Next().name, 'BR10')
+
+
+class PDFDownloaderRun_Test(unittest.TestCase):
+    """Runs the downloader against the local synthetic server."""
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.cwd = os.getcwd()
+        self.sigint = signal.getsignal(signal.SIGINT)
+        # the log files are written below the working directory
+        os.chdir(self.tmp_dir.name)
+        self.server = SyntheticServer(ServerProfile(sizes="fixed:4",
+                                                    latency_s=0.0))
+        self.server.Start()
+
+    def tearDown(self):
+        self.server.Stop()
+        signal.signal(signal.SIGINT, self.sigint)
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def run_rows(self, n: int, **kwargs) -> list[list[str]]:
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(["BRnum", "Pdf_URL"])
+        for i in range(n):
+            sheet.append([f"BR{i}", self.server.URL(str(i))])
+        workbook.save("in.xlsx")
+        config = Config(_in_file="in.xlsx", _out_file="out.csv",
+                        _out_pdf_dir="out", _log_level=False, **kwargs)
+        PDFDownloader(config).Run()
+        with open("out.csv", newline="", encoding="utf-8") as f:
+            return list(csv.reader(f))[1:]
+
+    def test_rows_are_written_after_slow_validation_callbacks(self):
+        store_content = PDFDownloader.StoreContent
+
+        def SlowStoreContent(app, report):
+            time.sleep(0.05)
+            store_content(app, report)
+        with patch.object(PDFDownloader, "StoreContent", SlowStoreContent):
+            rows = self.run_rows(40, _n_tasks=8, _validation="full",
+                                 _validation_workers=2)
+        self.assertEqual(sorted(int(row[2]) for row in rows),
+                         list(range(40)))
+        self.assertEqual({row[1] for row in rows}, {"DOWNLOADED"})
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,74 @@
+import csv
+import os
+import sys
+import threading
+import time
+import unittest
+from tempfile import TemporaryDirectory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from state import Report, ReportState
+from task import ResultWriterTask
+
+
+class ResultWriterTask_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.out_file = os.path.join(self.tmp_dir.name, 'out.csv')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read(self) -> list[list[str]]:
+        with open(self.out_file, newline='', encoding='utf-8') as f:
+            return list(csv.reader(f))
+
+    def run_writer(self, task: ResultWriterTask) -> threading.Thread:
+        thread = threading.Thread(target=task.Start)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        return thread
+
+    def test_rows_are_flushed_while_running(self):
+        task = ResultWriterTask(self.out_file, _flush_interval=0.05)
+        thread = self.run_writer(task)
+        task.Put(Report('a', 0, 'http://x/a.pdf', ReportState.DOWNLOADED,
+                        1, 'ab12', 42))
+        deadline = time.monotonic() + 5
+        while len(self.read() if os.path.exists(self.out_file) else []) < 2:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        self.assertEqual(self.read()[1],
+                         ['a', 'DOWNLOADED', '0', 'http://x/a.pdf', '1',
+                          'ab12', '42'])
+        task.Finish()
+        thread.join(5)
+        self.assertEqual(task.ReadData(), 1)
+
+    def test_rerun_appends_without_header(self):
+        for _ in range(2):
+            task = ResultWriterTask(self.out_file)
+            thread = self.run_writer(task)
+            task.Put(Report('a', 0, 'u', ReportState.NOT_DOWNLOADED))
+            task.Finish()
+            thread.join(5)
+        rows = self.read()
+        self.assertEqual(rows[0], ResultWriterTask.header)
+        self.assertEqual(len(rows), 3)
+
+    def test_final_rewrite_is_deduplicated_and_ordered(self):
+        task = ResultWriterTask(self.out_file)
+        thread = self.run_writer(task)
+        b = Report('b', 1, 'u', ReportState.DOWNLOADED)
+        a = Report('a', 0, 'u', ReportState.NOT_DOWNLOADED)
+        task.Put(b)
+        task.Put(a)
+        task.Put(b)
+        task.Finish(iter([a, b]))
+        thread.join(5)
+        self.assertEqual([row[0] for row in self.read()],
+                         ['BRnum', 'a', 'b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
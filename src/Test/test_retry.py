@@ -0,0 +1,81 @@
+import os
+import socket
+import sys
+import unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from connection_pool import HTTPStatusError
+from retry import ErrorClass, RetryPolicy, RetryQueue
+from state import Report, ReportState
+
+
+def make_report(name: str, attempts: int = 1) -> Report:
+    report = Report(name, 0, f'http://x/{name}.pdf', ReportState.INIT)
+    report.attempts = attempts
+    return report
+
+
+class RetryPolicy_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = RetryPolicy(max_attempts=3, base_delay=1.0,
+                                  max_delay=8.0)
+
+    def test_errors_are_classified(self):
+        transient = [HTTPStatusError('u', 503, 'Unavailable', {}),
+                     HTTPStatusError('u', 429, 'Too Many', {}),
+                     TimeoutError(), ConnectionResetError()]
+        permanent = [HTTPStatusError('u', 404, 'Not Found', {}),
+                     socket.gaierror(socket.EAI_NONAME, 'unknown'),
+                     ValueError('not a pdf')]
+        for error in transient:
+            self.assertEqual(self.policy.Classify(error),
+                             ErrorClass.TRANSIENT)
+        for error in permanent:
+            self.assertEqual(self.policy.Classify(error),
+                             ErrorClass.PERMANENT)
+
+    def test_retries_stop_after_max_attempts(self):
+        error = TimeoutError()
+        self.assertTrue(self.policy.ShouldRetry(make_report('a', 2), error))
+        self.assertFalse(self.policy.ShouldRetry(make_report('a', 3), error))
+
+    def test_delay_is_capped_and_honors_retry_after(self):
+        for attempt in range(1, 10):
+            delay = self.policy.Delay(attempt, TimeoutError())
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, 8.0)
+        error = HTTPStatusError('u', 503, 'Unavailable',
+                                {'retry-after': '5'})
+        self.assertGreaterEqual(self.policy.Delay(1, error), 5.0)
+        self.assertIsNone(RetryPolicy.RetryAfter('soon'))
+
+    def test_retry_after_longer_than_max_delay_is_honored(self):
+        error = HTTPStatusError('u', 429, 'Too Many Requests',
+                                {'retry-after': '30'})
+        self.assertGreaterEqual(self.policy.Delay(1, error), 30.0)
+        self.assertTrue(self.policy.ShouldRetry(make_report('a', 1), error))
+
+    def test_retry_after_longer_than_max_retry_after_gives_up(self):
+        policy = RetryPolicy(max_attempts=3, max_retry_after=20.0)
+        error = HTTPStatusError('u', 503, 'Unavailable',
+                                {'retry-after': '30'})
+        self.assertTrue(policy.RetryAfterTooLong(error))
+        self.assertFalse(policy.ShouldRetry(make_report('a', 1), error))
+
+
+class RetryQueue_Test(unittest.TestCase):
+
+    def test_reports_are_ready_in_due_order(self):
+        retries = RetryQueue()
+        a, b = make_report('a'), make_report('b')
+        retries.Push(a, 2.0, now=0.0)
+        retries.Push(b, 1.0, now=0.0)
+        self.assertEqual(retries.PopReady(now=0.5), [])
+        self.assertAlmostEqual(retries.Delay(now=0.5), 0.5)
+        self.assertEqual(retries.PopReady(now=2.0), [b, a])
+        self.assertEqual(len(retries), 0)
+        self.assertIsNone(retries.Delay())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import sys
+import unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from scheduler import HostScheduler, TokenBucket, ConcurrencyController
+from state import Report, ReportState
+
+
+def make_report(i: int, host: str) -> Report:
+    return Report(f'BR{i}', i, f'https://{host}/{i}.pdf', ReportState.INIT)
+
+
+class HostScheduler_Test(unittest.TestCase):
+
+    def test_round_robin_across_hosts(self):
+        scheduler = HostScheduler(max_per_host=0)
+        for i in range(4):
+            scheduler.Add(make_report(i, 'slow.example.com'))
+        scheduler.Add(make_report(4, 'a.example.com'))
+        scheduler.Add(make_report(5, 'b.example.com'))
+        hosts = [HostScheduler.Host(scheduler.Next()) for _ in range(4)]
+        self.assertEqual(hosts, ['slow.example.com', 'a.example.com',
+                                 'b.example.com', 'slow.example.com'])
+        self.assertEqual(len(scheduler), 2)
+
+    def test_per_host_cap(self):
+        scheduler = HostScheduler(max_per_host=1)
+        first = make_report(0, 'a.example.com')
+        scheduler.Add(first)
+        scheduler.Add(make_report(1, 'a.example.com'))
+        self.assertIs(scheduler.Next(), first)
+        self.assertIsNone(scheduler.Next())
+        scheduler.Done(first)
+        self.assertEqual(scheduler.Next().name, 'BR1')
+
+    def test_reports_of_hosts_at_the_cap_are_not_waiting(self):
+        scheduler = HostScheduler(max_per_host=1)
+        first = make_report(0, 'a.example.com')
+        scheduler.Add(first)
+        scheduler.Add(make_report(1, 'a.example.com'))
+        self.assertEqual(scheduler.Waiting(), 2)
+        scheduler.Next()
+        scheduler.Add(make_report(2, 'a.example.com'))
+        scheduler.Add(make_report(3, 'b.example.com'))
+        self.assertEqual((len(scheduler), scheduler.Waiting()), (3, 1))
+        scheduler.Done(first)
+        self.assertEqual(scheduler.Waiting(), 3)
+
+    def test_rate_limit(self):
+        scheduler = HostScheduler(max_per_host=0, rate_per_host=2)
+        scheduler.Add(make_report(0, 'a.example.com'))
+        scheduler.Add(make_report(1, 'a.example.com'))
+        self.assertIsNotNone(scheduler.Next(now=100.0))
+        self.assertIsNone(scheduler.Next(now=100.1))
+        self.assertAlmostEqual(scheduler.Delay(now=100.1), 0.4)
+        self.assertIsNotNone(scheduler.Next(now=100.6))
+
+    def test_token_bucket_burst(self):
+        bucket = TokenBucket(rate=1, burst=2)
+        now = bucket.stamp
+        for _ in range(2):
+            self.assertEqual(bucket.Delay(now), 0)
+            bucket.Take()
+        self.assertAlmostEqual(bucket.Delay(now), 1.0)
+
+
+
+class ConcurrencyController_Test(unittest.TestCase):
+
+    def window(self, controller, now, size, in_flight=None):
+        """Finishes a window of downloads, returns the reason."""
+        in_flight = controller.limit if in_flight is None else in_flight
+        controller.Record(size, in_flight, now=now - 1)
+        return controller.Record(size, in_flight, now=now)
+
+    def test_grows_while_throughput_rises(self):
+        controller = ConcurrencyController(4, 1, 6, interval=2, now=0)
+        self.assertIsNotNone(self.window(controller, 2, 1000))
+        self.assertEqual(controller.limit, 5)
+        self.window(controller, 4, 2000)
+        self.assertEqual(controller.limit, 6)
+        # max_tasks
+        self.window(controller, 6, 4000)
+        self.assertEqual(controller.limit, 6)
+
+    def test_steps_back_when_throughput_falls(self):
+        controller = ConcurrencyController(4, 1, 8, interval=2, now=0)
+        self.window(controller, 2, 1000)
+        self.window(controller, 4, 500)
+        self.assertEqual(controller.limit, 4)
+        # flat throughput holds the limit
+        self.assertIsNone(self.window(controller, 6, 500))
+        self.assertEqual(controller.limit, 4)
+
+    def test_unused_slots_hold_the_limit(self):
+        controller = ConcurrencyController(4, 1, 8, interval=2, now=0)
+        self.assertIsNone(self.window(controller, 2, 1000, in_flight=2))
+        self.assertEqual(controller.limit, 4)
+
+    def test_congestion_halves_once_per_window(self):
+        controller = ConcurrencyController(8, 3, 16, interval=2, now=0)
+        self.assertIsNotNone(controller.Record(0, 8, True, now=0.5))
+        self.assertEqual(controller.limit, 4)
+        self.assertIsNone(controller.Record(0, 8, True, now=0.6))
+        self.assertEqual(controller.limit, 4)
+        controller.Record(0, 4, now=2)
+        controller.Record(0, 4, True, now=2.5)
+        # min_tasks
+        self.assertEqual(controller.limit, 3)
+
+    def test_fixed_limit_when_not_adaptive(self):
+        controller = ConcurrencyController(4, 1, 8, adaptive=False, now=0)
+        self.assertIsNone(controller.Record(0, 4, True, now=1))
+        self.assertIsNone(self.window(controller, 4, 1000))
+        self.assertEqual(controller.limit, 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import csv
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shards import ShardOf, ShardPath, ShardPaths, MergeResults
+from shards import PartPath, WorkerPart, WorkerPaths
+
+header = ['BRnum', 'Status', 'Row', 'URL', 'Attempts', 'Hash', 'Size']
+
+
+class Shards_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.out_file = os.path.join(self.tmp_dir.name, 'output.csv')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, path: str, rows: list[list]):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows([header] + rows)
+
+    def row(self, i: int, status: str = 'DOWNLOADED') -> list:
+        return [f'BR{i}', status, i, f'http://x/{i}.pdf', 1, '', '']
+
+    def test_every_row_has_one_stable_shard(self):
+        names = [f'BR{i}' for i in range(1000)] + [123, 4.5]
+        shards = [ShardOf(name, 4) for name in names]
+        self.assertEqual(shards, [ShardOf(name, 4) for name in names])
+        self.assertEqual(set(shards), {0, 1, 2, 3})
+        self.assertEqual(ShardOf(123, 4), ShardOf('123', 4))
+
+    def test_shard_files_are_found(self):
+        for i in (1, 0):
+            self.write(ShardPath(self.out_file, i, 2), [])
+        self.assertEqual(ShardPaths(self.out_file),
+                         [ShardPath(self.out_file, 0, 2),
+                          ShardPath(self.out_file, 1, 2)])
+        self.assertTrue(ShardPath(self.out_file, 0, 2)
+                        .endswith('output.shard-0-of-2.csv'))
+
+    def test_missing_shard_is_an_error(self):
+        self.write(ShardPath(self.out_file, 0, 3), [])
+        self.write(ShardPath(self.out_file, 2, 3), [])
+        with self.assertRaises(ValueError):
+            ShardPaths(self.out_file)
+
+    def test_merge_orders_rows_and_keeps_the_last_result(self):
+        first = ShardPath(self.out_file, 0, 2)
+        second = ShardPath(self.out_file, 1, 2)
+        self.write(first, [self.row(10), self.row(2, 'NOT_DOWNLOADED'),
+                           self.row(2)])
+        self.write(second, [self.row(3), self.row(1)])
+        self.assertEqual(MergeResults([first, second], self.out_file), 4)
+        with open(self.out_file, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], header)
+        self.assertEqual([row[2] for row in rows[1:]], ['1', '2', '3', '10'])
+        self.assertEqual(rows[2][1], 'DOWNLOADED')
+
+    def test_worker_files_are_found(self):
+        paths = [PartPath(self.out_file, WorkerPart(worker_id))
+                 for worker_id in ('host-2', 'host/1')]
+        for path in paths:
+            self.write(path, [])
+        self.assertEqual(WorkerPaths(self.out_file), sorted(paths))
+        self.assertTrue(paths[1].endswith('output.worker-host_1.csv'))
+        self.assertEqual(ShardPaths(self.out_file), [])
+
+    def test_merge_keeps_the_best_result_of_workers(self):
+        first = PartPath(self.out_file, 'worker-a')
+        second = PartPath(self.out_file, 'worker-b')
+        self.write(first, [self.row(1), self.row(2, 'STAGED')])
+        self.write(second, [self.row(1, 'NOT_DOWNLOADED'),
+                            self.row(2, 'NOT_DOWNLOADED')])
+        self.assertEqual(MergeResults([first, second], self.out_file), 2)
+        with open(self.out_file, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual([row[1] for row in rows[1:]],
+                         ['DOWNLOADED', 'NOT_DOWNLOADED'])
+
+    def test_merge_rejects_other_headers(self):
+        first = ShardPath(self.out_file, 0, 2)
+        self.write(first, [])
+        other = os.path.join(self.tmp_dir.name, 'other.csv')
+        with open(other, 'w') as f:
+            f.write('a,b\n')
+        with self.assertRaises(ValueError):
+            MergeResults([first, other], self.out_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import sys
+import threading
+import unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from streaming import BufferPool, ByteBudget, FileTooLargeError
+from task import DownloadOptions
+
+
+class Streaming_Test(unittest.TestCase):
+
+    def test_buffer_pool_reuses_buffers(self):
+        pool = BufferPool(1024)
+        buffer = pool.Take()
+        self.assertEqual(len(buffer), 1024)
+        pool.Give(buffer)
+        self.assertIs(pool.Take(), buffer)
+
+    def test_byte_budget_blocks_until_released(self):
+        budget = ByteBudget(100)
+        budget.Acquire(80)
+        acquired = threading.Event()
+
+        def acquire():
+            budget.Acquire(50)
+            acquired.set()
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        self.assertFalse(acquired.wait(0.1))
+        budget.Release(80)
+        self.assertTrue(acquired.wait(1))
+        thread.join()
+        self.assertEqual(budget.in_flight, 50)
+
+    def test_byte_budget_caps_request_at_limit(self):
+        budget = ByteBudget(10)
+        budget.Acquire(64)
+        self.assertEqual(budget.in_flight, 10)
+        budget.Release(64)
+        self.assertEqual(budget.in_flight, 0)
+
+    def test_check_size(self):
+        options = DownloadOptions(max_file_size=100)
+        options.CheckSize('http://x', 100)
+        with self.assertRaises(FileTooLargeError):
+            options.CheckSize('http://x', 101)
+        DownloadOptions().CheckSize('http://x', 1 << 40)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import sys
+import threading
+import unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from task import ITask, IAsyncTask, LoggerTask, TaskState
+from task_handler import ThreadPoolHandler, AsyncioHandler
+from logger import Logger
+
+
+class BlockingTask(ITask):
+    """Runs until stopped, records the order of the stops."""
+    def __init__(self, name: str, stops: list[str]):
+        super().__init__(name, True)
+        self.stops = stops
+        self.released = threading.Event()
+
+    def Start(self):
+        self.status = TaskState.RUNNING
+        self.released.wait(10)
+
+    def Stop(self):
+        if not self.released.is_set():
+            self.stops.append(self.name)
+        self.released.set()
+        self.status = TaskState.DONE
+
+    def ReadData(self) -> None:
+        return None
+
+
+class FakeLoggerTask(LoggerTask, BlockingTask):
+    def __init__(self, stops: list[str]):
+        LoggerTask.__init__(self, Logger().GetState(), write_log=False)
+        self.stops = stops
+        self.released = threading.Event()
+
+    Start = BlockingTask.Start
+    Stop = BlockingTask.Stop
+
+
+class QuickTask(ITask):
+    def __init__(self):
+        super().__init__("Quick")
+
+    def Start(self):
+        self.status = TaskState.RUNNING
+
+    def Stop(self):
+        self.status = TaskState.DONE
+
+    def ReadData(self) -> None:
+        return None
+
+
+class SleepingTask(IAsyncTask):
+    """Sleeps on the event loop, records a cancellation."""
+    def __init__(self):
+        super().__init__("Sleeping")
+        self.result = "running"
+
+    async def StartAsync(self):
+        self.status = TaskState.RUNNING
+        try:
+            await asyncio.sleep(10)
+            self.result = "done"
+        except asyncio.CancelledError:
+            self.result = "cancelled"
+            raise
+
+    def Stop(self):
+        self.status = TaskState.DONE
+
+    def ReadData(self) -> None:
+        return None
+
+
+class ThreadPoolHandler_Test(unittest.TestCase):
+
+    def CreateHandler(self, n_tasks: int):
+        return ThreadPoolHandler(n_tasks)
+
+    def tearDown(self):
+        self.handler.StopAllTasks()
+
+    def test_many_tasks_are_tracked(self):
+        self.handler = self.CreateHandler(64)
+        done = []
+        lock = threading.Lock()
+
+        def OnDone(task):
+            with lock:
+                done.append(task)
+        tasks = [QuickTask() for _ in range(2000)]
+        for task in tasks:
+            self.assertTrue(self.handler.Start(task, on_done=OnDone))
+        self.assertTrue(self.handler.WaitForTasks(0, timeout=10))
+        self.assertEqual(self.handler.ActiveTaskCount(), 0)
+        self.assertEqual(self.handler.GetRunningTasks(), [])
+        with lock:
+            self.assertEqual(len(done), len(tasks))
+
+    def test_wait_times_out_while_tasks_run(self):
+        self.handler = self.CreateHandler(4)
+        task = BlockingTask("Blocking", [])
+        self.handler.Start(task)
+        self.assertFalse(self.handler.WaitForTasks(0, timeout=0.05))
+        self.assertEqual(self.handler.GetRunningTasks(), [task])
+        self.handler.Stop(task)
+        self.assertTrue(self.handler.WaitForTasks(0, timeout=10))
+
+    def test_logger_is_stopped_last(self):
+        self.handler = self.CreateHandler(4)
+        stops = []
+        tasks = [BlockingTask("First", stops), FakeLoggerTask(stops),
+                 BlockingTask("Last", stops)]
+        for task in tasks:
+            self.handler.Start(task)
+        self.handler.StopAllTasks()
+        self.assertEqual(self.handler.ActiveTaskCount(), 0)
+        self.assertEqual(stops[-1], "Log Task")
+        self.assertEqual(sorted(stops[:2]), ["First", "Last"])
+
+
+class AsyncioHandler_Test(ThreadPoolHandler_Test):
+
+    def CreateHandler(self, n_tasks: int):
+        return AsyncioHandler(n_tasks, n_threads=n_tasks)
+
+    def tearDown(self):
+        if self.handler.loop.is_running():
+            self.handler.StopAllTasks()
+
+    def test_done_after_cancellation_is_handled(self):
+        self.handler = self.CreateHandler(4)
+        results = []
+        task = SleepingTask()
+        self.handler.Start(task, on_done=lambda t: results.append(t.result))
+        while task.status != TaskState.RUNNING:
+            threading.Event().wait(0.01)
+        self.assertTrue(self.handler.Stop(task))
+        self.assertTrue(self.handler.WaitForTasks(0, timeout=10))
+        self.assertEqual(results, ["cancelled"])
+        self.assertTrue(task.stopped)
+
+    def test_task_stopped_before_it_starts_is_done(self):
+        self.handler = self.CreateHandler(4)
+        results = []
+        tasks = [SleepingTask() for _ in range(50)]
+        for task in tasks:
+            self.handler.Start(task, on_done=lambda t: results.append(t))
+            self.handler.Stop(task)
+        self.assertTrue(self.handler.WaitForTasks(0, timeout=10))
+        self.assertEqual(len(results), len(tasks))
+        self.assertTrue(all(t.result != "done" for t in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
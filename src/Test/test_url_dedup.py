@@ -0,0 +1,77 @@
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from state import Report, ReportState
+from url_dedup import NormalizeURL, LinkFile, URLDedup
+
+
+class NormalizeURL_Test(unittest.TestCase):
+
+    def test_spellings_of_a_url_are_equal(self):
+        self.assertEqual(NormalizeURL('HTTP://Example.COM:80/a.pdf#p2 '),
+                         'http://example.com/a.pdf')
+        self.assertEqual(NormalizeURL('https://example.com'),
+                         'https://example.com/')
+
+    def test_path_query_and_ports_are_kept(self):
+        self.assertEqual(NormalizeURL('http://example.com:8080/A.pdf?x=1'),
+                         'http://example.com:8080/A.pdf?x=1')
+
+    def test_invalid_url_is_returned(self):
+        self.assertEqual(NormalizeURL('http://example.com:port/'),
+                         'http://example.com:port/')
+
+
+class URLDedup_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.dedup = URLDedup()
+        self.a = Report('a', 0, 'http://x/r.pdf', ReportState.INIT)
+        self.b = Report('b', 1, 'http://X/r.pdf', ReportState.INIT)
+
+    def test_duplicates_wait_for_the_primary(self):
+        self.assertIs(self.dedup.Add(self.a), self.a)
+        self.assertIsNone(self.dedup.Add(self.b))
+        self.assertEqual(self.dedup.Followers(self.a), [self.b])
+        self.assertEqual(self.dedup.Followers(self.a), [])
+
+    def test_duplicates_of_a_finished_url_are_linked_right_away(self):
+        self.dedup.Add(self.a)
+        self.dedup.Followers(self.a)
+        self.assertIs(self.dedup.Add(self.b), self.a)
+
+    def test_downloaded_file_is_primary(self):
+        self.a.status = ReportState.DOWNLOADED
+        self.dedup.Add(self.a)
+        self.assertIs(self.dedup.Add(self.b), self.a)
+
+
+class LinkFile_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.src = os.path.join(self.tmp_dir.name, 'a.pdf')
+        self.dst = os.path.join(self.tmp_dir.name, 'b.pdf')
+        with open(self.src, 'wb') as f:
+            f.write(b'%PDF-1.4')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_link_replaces_existing_file(self):
+        with open(self.dst, 'wb') as f:
+            f.write(b'old')
+        LinkFile(self.src, self.dst)
+        self.assertTrue(os.path.samefile(self.src, self.dst))
+        self.assertFalse(os.path.exists(self.dst + '.link'))
+
+    def test_link_to_itself_keeps_the_file(self):
+        LinkFile(self.src, self.src)
+        with open(self.src, 'rb') as f:
+            self.assertEqual(f.read(), b'%PDF-1.4')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import io
+import os
+import sys
+import time
+import unittest
+from tempfile import TemporaryDirectory
+from PyPDF2 import PdfWriter
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pdf_validator import PDFEnds, PDFValidator, ValidationLevel
+from state import Report, ReportState
+from validation_stage import ValidationStage
+
+
+class ValidationStage_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.stage = ValidationStage(PDFValidator(ValidationLevel.FULL),
+                                     n_workers=1, queue_size=1)
+
+    def tearDown(self):
+        self.stage.Stop()
+        self.tmp_dir.cleanup()
+
+    def write(self, name: str, data: bytes) -> tuple[str, PDFEnds]:
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        ends = PDFEnds()
+        ends.Feed(data)
+        return path, ends
+
+    def test_reports_are_updated_when_validated(self):
+        writer = PdfWriter()
+        writer.add_blank_page(200, 200)
+        data = io.BytesIO()
+        writer.write(data)
+        good_file, good_ends = self.write('good.pdf', data.getvalue())
+        bad_file, bad_ends = self.write('bad.pdf', b'%PDF-1.7\n%%EOF')
+        good = Report('good', 0, 'http://x/good.pdf', ReportState.STAGED)
+        bad = Report('bad', 1, 'http://x/bad.pdf', ReportState.STAGED)
+
+        self.stage.Submit(good, good_file, good_ends)
+        self.stage.Submit(bad, bad_file, bad_ends)
+        self.assertTrue(self.stage.WaitIdle(timeout=30))
+
+        self.assertEqual(good.status, ReportState.DOWNLOADED)
+        self.assertEqual(bad.status, ReportState.NOT_DOWNLOADED)
+        self.assertTrue(os.path.exists(good_file))
+        self.assertFalse(os.path.exists(bad_file))
+
+    def test_report_is_pending_until_handled(self):
+        handled = []
+
+        def OnDone(report):
+            time.sleep(0.05)
+            handled.append((report.status, self.stage.Pending()))
+        self.stage.on_done = OnDone
+        bad_file, bad_ends = self.write('bad.pdf', b'%PDF-1.7\n%%EOF')
+        bad = Report('bad', 1, 'http://x/bad.pdf', ReportState.STAGED)
+
+        self.stage.Submit(bad, bad_file, bad_ends)
+        self.assertTrue(self.stage.WaitIdle(timeout=30))
+
+        self.assertEqual(handled, [(ReportState.NOT_DOWNLOADED, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import multiprocessing
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from work_queue import WorkQueue
+from state import Report, ReportState
+
+
+def ClaimAll(path: str, worker_id: str, results) -> None:
+    """Claims and completes rows until the queue is empty, in a worker
+    process.
+    """
+    work_queue = WorkQueue(path, worker_id)
+    work_queue.Open()
+    claimed = []
+    while True:
+        reports = work_queue.Claim(3)
+        if not reports:
+            break
+        for report in reports:
+            report.status = ReportState.DOWNLOADED
+            work_queue.Complete(report)
+            claimed.append(report.id)
+    work_queue.Close()
+    results.put(claimed)
+
+
+class WorkQueue_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'queue.db')
+        self.in_file = os.path.join(self.tmp_dir.name, 'in.xlsx')
+        with open(self.in_file, 'wb') as f:
+            f.write(b'rows')
+        self.queues = []
+
+    def tearDown(self):
+        for work_queue in self.queues:
+            work_queue.Close()
+        self.tmp_dir.cleanup()
+
+    def worker(self, worker_id: str, lease_s: float = 60.0) -> WorkQueue:
+        work_queue = WorkQueue(self.path, worker_id, lease_s)
+        work_queue.Open()
+        self.queues.append(work_queue)
+        return work_queue
+
+    def load(self, work_queue: WorkQueue, n: int):
+        self.assertTrue(work_queue.Join(self.in_file))
+        work_queue.Add([Report(f'BR{i}', i, f'http://x/{i}.pdf',
+                               ReportState.INIT) for i in range(n)])
+        work_queue.LoadDone()
+
+    def test_first_worker_loads(self):
+        first, second = self.worker('a'), self.worker('b')
+        self.assertTrue(first.Join(self.in_file))
+        self.assertFalse(second.Join(self.in_file))
+        self.assertFalse(second.Loaded())
+        first.LoadDone()
+        self.assertTrue(second.Loaded())
+
+    def test_other_input_file_is_rejected(self):
+        self.load(self.worker('a'), 1)
+        with open(self.in_file, 'ab') as f:
+            f.write(b'more')
+        with self.assertRaises(ValueError):
+            self.worker('b').Join(self.in_file)
+
+    def test_claims_do_not_overlap(self):
+        first, second = self.worker('a'), self.worker('b')
+        self.load(first, 5)
+        self.assertEqual([r.id for r in first.Claim(2)], [0, 1])
+        self.assertEqual([r.id for r in second.Claim(2)], [2, 3])
+        self.assertEqual([r.id for r in first.Claim(2)], [4])
+        self.assertEqual(second.Claim(2), [])
+        self.assertEqual(first.Counts(), {'LEASED': 5})
+
+    def test_completed_rows_finish_the_run(self):
+        work_queue = self.worker('a')
+        self.load(work_queue, 2)
+        reports = work_queue.Claim(2)
+        self.assertFalse(work_queue.Finished())
+        for report in reports:
+            report.status = ReportState.DOWNLOADED
+            work_queue.Complete(report)
+        self.assertTrue(work_queue.Finished())
+
+    def test_results_are_kept_in_row_order(self):
+        work_queue = self.worker('a')
+        self.load(work_queue, 3)
+        report = work_queue.Claim(3)[2]
+        report.status = ReportState.DOWNLOADED
+        report.attempts, report.sha256, report.size = 2, 'ab', 10
+        work_queue.Complete(report)
+        self.assertEqual(list(work_queue.Results()), [])
+        work_queue.Flush()
+        self.assertEqual(list(work_queue.Results(batch_size=1)),
+                         [Report('BR2', 2, 'http://x/2.pdf',
+                                 ReportState.DOWNLOADED, 2, 'ab', 10)])
+
+    def test_rows_needing_no_download_are_done(self):
+        work_queue = self.worker('a')
+        self.assertTrue(work_queue.Join(self.in_file))
+        work_queue.Add([Report('BR0', 0, 'http://x/0.pdf',
+                               ReportState.DOWNLOADED),
+                        Report('BR1', 1, 'None',
+                               ReportState.NOT_DOWNLOADED)])
+        work_queue.LoadDone()
+        self.assertEqual(work_queue.Claim(2), [])
+        self.assertTrue(work_queue.Finished())
+
+    @patch('work_queue.time')
+    def test_expired_lease_is_claimed_again(self, mock_time):
+        mock_time.time.return_value = 1000.0
+        crashed, other = self.worker('a', 10), self.worker('b', 10)
+        self.load(crashed, 2)
+        self.assertEqual(len(crashed.Claim(2)), 2)
+        mock_time.time.return_value = 1005.0
+        self.assertEqual(other.Claim(2), [])
+        mock_time.time.return_value = 1011.0
+        self.assertEqual([r.id for r in other.Claim(2)], [0, 1])
+
+    @patch('work_queue.time')
+    def test_renewed_lease_is_kept(self, mock_time):
+        mock_time.time.return_value = 1000.0
+        owner, other = self.worker('a', 10), self.worker('b', 10)
+        self.load(owner, 2)
+        owner.Claim(2)
+        mock_time.time.return_value = 1008.0
+        owner.Renew()
+        mock_time.time.return_value = 1015.0
+        self.assertEqual(other.Claim(2), [])
+
+    def test_released_rows_are_claimed_again(self):
+        owner, other = self.worker('a'), self.worker('b')
+        self.load(owner, 3)
+        reports = owner.Claim(3)
+        reports[0].status = ReportState.DOWNLOADED
+        owner.Complete(reports[0])
+        owner.Release()
+        self.assertEqual([r.id for r in other.Claim(3)], [1, 2])
+
+    @patch('work_queue.time')
+    def test_load_is_taken_over_when_the_loader_stops(self, mock_time):
+        mock_time.time.return_value = 1000.0
+        loader, other = self.worker('a', 10), self.worker('b', 10)
+        self.assertTrue(loader.Join(self.in_file))
+        self.assertFalse(other.Join(self.in_file))
+        mock_time.time.return_value = 1011.0
+        self.assertTrue(other.TakeLoad())
+        self.assertFalse(other.TakeLoad())
+
+    def test_processes_claim_every_row_once(self):
+        self.load(self.worker('loader'), 60)
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(
+                        target=ClaimAll,
+                        args=(self.path, f'p{i}', results))
+                     for i in range(3)]
+        for process in processes:
+            process.start()
+        claimed = sum((results.get(timeout=60) for _ in processes), [])
+        for process in processes:
+            process.join()
+        self.assertEqual(sorted(claimed), list(range(60)))
+        self.assertTrue(self.queues[0].Finished())
+
+
+if __name__ == '__main__':
+    unittest.main()
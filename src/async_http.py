@@ -0,0 +1,254 @@
+import asyncio
+import urllib.parse
+from connection_pool import ConnectionPool, HTTPStatusError
+
+
+class AsyncHTTPResponse:
+    """Response of an AsyncHTTPClient request.
+    The body is read from the stream on demand with Read.
+    """
+    def __init__(self, url: str, version: str, status: int, reason: str,
+                 headers: dict[str, str],
+                 reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.reader = reader
+        self.writer = writer
+        self.done = False
+        self.keep_alive = version == "HTTP/1.1" and \
+            headers.get("connection", "").lower() != "close"
+        self.chunked = \
+            "chunked" in headers.get("transfer-encoding", "").lower()
+        self.chunk_left = 0
+        self.length: int | None = None
+        if status in (204, 304):
+            # No body whatever the headers announce
+            self.chunked = False
+            self.length = 0
+        elif not self.chunked and "content-length" in headers:
+            self.length = int(headers["content-length"])
+        elif not self.chunked:
+            # Body is delimited by the connection closing
+            self.keep_alive = False
+        if self.length == 0:
+            self.done = True
+
+    async def Read(self, size: int = -1) -> bytes:
+        """Reads up to size bytes of the body, or the whole
+        remaining body if size is negative.
+
+        Args:
+            size (int, optional): max bytes to read. Defaults to -1.
+
+        Returns:
+            bytes: body data, empty when the body is exhausted
+        """
+        if size >= 0:
+            return await self.ReadChunk(size)
+        parts: list[bytes] = []
+        while True:
+            data = await self.ReadChunk(1 << 16)
+            if not data:
+                return b"".join(parts)
+            parts.append(data)
+
+    async def ReadChunk(self, size: int) -> bytes:
+        """Reads at most size bytes of the body.
+
+        Args:
+            size (int): max bytes to read
+
+        Returns:
+            bytes: body data, empty when the body is exhausted
+        """
+        if self.done or size == 0:
+            return b""
+        if self.chunked:
+            return await self.ReadChunked(size)
+        if self.length is None:
+            data = await self.reader.read(size)
+            if not data:
+                self.done = True
+            return data
+        data = await self.reader.read(min(size, self.length))
+        if not data:
+            raise ConnectionError(
+                f"Connection closed with {self.length} bytes left")
+        self.length -= len(data)
+        if self.length == 0:
+            self.done = True
+        return data
+
+    async def ReadChunked(self, size: int) -> bytes:
+        """Reads from a body with chunked transfer encoding.
+
+        Args:
+            size (int): max bytes to read
+
+        Returns:
+            bytes: body data, empty when the last chunk is read
+        """
+        if self.chunk_left == 0:
+            line = await self.reader.readline()
+            if not line:
+                raise ConnectionError("Connection closed in chunk header")
+            self.chunk_left = int(line.split(b";")[0].strip(), 16)
+            if self.chunk_left == 0:
+                # Skip trailers
+                while (await self.reader.readline()) not in \
+                        (b"\r\n", b"\n", b""):
+                    pass
+                self.done = True
+                return b""
+        data = await self.reader.read(min(size, self.chunk_left))
+        if not data:
+            raise ConnectionError("Connection closed in chunk")
+        self.chunk_left -= len(data)
+        if self.chunk_left == 0:
+            await self.reader.readexactly(2)
+        return data
+
+    def Close(self):
+        """Closes the underlying connection.
+        """
+        self.writer.close()
+
+    def Release(self):
+        """Returns the connection to the pool if the body has been
+        read completely and the server allows keep-alive,
+        otherwise the connection is closed.
+        """
+        if self.done and self.keep_alive:
+            ConnectionPool().ReleaseAsync(ConnectionPool.Key(self.url),
+                                          self.reader, self.writer)
+        else:
+            self.writer.close()
+
+
+class AsyncHTTPClient:
+    """Minimal HTTP/1.1 client on top of asyncio streams.
+    Only supports GET requests over http and https.
+    Connections and the TLS context are shared through the ConnectionPool.
+    """
+    async def Get(self, url: str,
+                  headers: dict[str, str] | None = None) \
+            -> AsyncHTTPResponse:
+        """Sends a GET request and follows redirects.
+
+        Args:
+            url (str): http or https url
+            headers (dict[str, str] | None, optional): extra headers
+
+        Raises:
+            HTTPStatusError: on 4xx/5xx responses or too many redirects
+
+        Returns:
+            AsyncHTTPResponse: response with the body unread
+        """
+        for _ in range(ConnectionPool.max_redirects + 1):
+            response = await self.Request(url, headers)
+            location = response.headers.get("location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                response.Close()
+                url = urllib.parse.urljoin(url, location)
+                continue
+            if response.status >= 400:
+                response.Close()
+                raise HTTPStatusError(url, response.status,
+                                      response.reason, response.headers)
+            return response
+        raise HTTPStatusError(url, response.status, "Too many redirects",
+                              response.headers)
+
+    async def Request(self, url: str,
+                      headers: dict[str, str] | None = None) \
+            -> AsyncHTTPResponse:
+        """Sends a single GET request on a pooled connection.
+        A request failing on a reused connection, closed by the server
+        while idle, is retried on a new connection.
+
+        Args:
+            url (str): http or https url
+            headers (dict[str, str] | None, optional): extra headers
+
+        Raises:
+            ValueError: on unsupported url scheme
+
+        Returns:
+            AsyncHTTPResponse: response with the body unread
+        """
+        key = ConnectionPool.Key(url)
+        request = self.BuildRequest(url, key, headers)
+        while True:
+            reader, writer, reused = await ConnectionPool().AcquireAsync(key)
+            try:
+                writer.write(request)
+                await writer.drain()
+                version, status, reason, response_headers = \
+                    await self.ReadHead(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            return AsyncHTTPResponse(url, version, status, reason,
+                                     response_headers, reader, writer)
+
+    def BuildRequest(self, url: str, key: tuple,
+                     headers: dict[str, str] | None = None) -> bytes:
+        """Builds the request head for a GET request.
+
+        Args:
+            url (str): http or https url
+            key (tuple): pool key of the url
+            headers (dict[str, str] | None, optional): extra headers
+
+        Returns:
+            bytes: encoded request
+        """
+        host = key[1].encode("idna").decode("ascii")
+        if urllib.parse.urlsplit(url).port:
+            host = f"{host}:{key[2]}"
+        lines = [f"GET {ConnectionPool.Target(url)} HTTP/1.1",
+                 f"Host: {host}"]
+        for name, value in ConnectionPool().Headers(headers).items():
+            lines.append(f"{name}: {value}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def ReadHead(self, reader: asyncio.StreamReader) \
+            -> tuple[str, int, str, dict[str, str]]:
+        """Reads the status line and headers of a response.
+
+        Args:
+            reader (asyncio.StreamReader): connection stream
+
+        Raises:
+            ConnectionError: on closed connection or malformed status line
+
+        Returns:
+            tuple[str, int, str, dict[str, str]]: version, status, reason
+            and headers with lower case names
+        """
+        line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+        if not line:
+            raise ConnectionError("Connection closed before response")
+        fields = line.split(" ", 2)
+        if len(fields) < 2 or not fields[0].startswith("HTTP/"):
+            raise ConnectionError(f"Malformed status line: {line!r}")
+        status = int(fields[1])
+        reason = fields[2] if len(fields) > 2 else ""
+        headers: dict[str, str] = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            line = line.rstrip("\r\n")
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return fields[0], status, reason, headers
@@ -0,0 +1,371 @@
+import asyncio
+import http.client
+import ssl
+import sys
+import threading
+import time
+import urllib.parse
+from collections import deque
+import certifi
+from logger import Singleton
+
+
+class HTTPStatusError(Exception):
+    """Raised when a server answers with an error status code.
+    """
+    def __init__(self, url: str, status: int, reason: str,
+                 headers: dict[str, str] | None = None):
+        super().__init__(f"HTTP Error {status}: {reason}")
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers if headers else {}
+
+
+class PooledHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection which can be kept alive in the ConnectionPool.
+    """
+    def __init__(self, pool: "ConnectionPool", key: tuple,
+                 timeout: float):
+        super().__init__(key[1], key[2], timeout=timeout)
+        self.pool = pool
+        self.key = key
+
+
+class PooledHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPS connection sharing the TLS context of the ConnectionPool
+    and resuming the last TLS session to the same host.
+    """
+    def __init__(self, pool: "ConnectionPool", key: tuple,
+                 timeout: float):
+        super().__init__(key[1], key[2], timeout=timeout,
+                         context=pool.context)
+        self.pool = pool
+        self.key = key
+
+    def connect(self):
+        """Connects and performs the TLS handshake with session resumption.
+        """
+        http.client.HTTPConnection.connect(self)
+        self.sock = self.pool.context.wrap_socket(
+            self.sock, server_hostname=self.host,
+            session=self.pool.GetSession(self.key))
+        self.pool.SaveSession(self.key, self.sock)
+
+
+class PooledResponse:
+    """Response of a ConnectionPool request.
+    The connection is handed back to the pool when released.
+    """
+    def __init__(self, pool: "ConnectionPool", url: str,
+                 conn: http.client.HTTPConnection,
+                 response: http.client.HTTPResponse):
+        self.pool = pool
+        self.url = url
+        self.conn = conn
+        self.response = response
+        self.status: int = response.status
+        self.reason: str = response.reason
+        self.headers: dict[str, str] = \
+            {k.lower(): v for k, v in response.getheaders()}
+
+    def Read(self, size: int = -1) -> bytes:
+        """Reads up to size bytes of the body, or the whole
+        remaining body if size is negative.
+
+        Args:
+            size (int, optional): max bytes to read. Defaults to -1.
+
+        Returns:
+            bytes: body data, empty when the body is exhausted
+        """
+        return self.response.read() if size < 0 \
+            else self.response.read(size)
+
+    def ReadInto(self, buffer: memoryview) -> int:
+        """Reads body data into a buffer.
+
+        Args:
+            buffer (memoryview): writable buffer
+
+        Returns:
+            int: bytes read, 0 when the body is exhausted
+        """
+        return self.response.readinto(buffer)
+
+    def Release(self):
+        """Returns the connection to the pool if the body has been
+        read completely and the server allows keep-alive,
+        otherwise the connection is closed.
+        """
+        if self.conn is None:
+            return
+        if self.response.isclosed() and not self.response.will_close:
+            self.pool.Release(self.conn)
+        else:
+            self.response.close()
+            self.conn.close()
+        self.conn = None
+
+
+class ConnectionPool(metaclass=Singleton):
+    """Process wide pool of keep-alive connections per host.
+    One TLS context is loaded for the process and TLS sessions are reused
+    for new connections to a host already connected to.
+    Used by both the threaded and the asyncio download engine.
+    """
+    user_agent: str = \
+        f"Python-urllib/{sys.version_info[0]}.{sys.version_info[1]}"
+    max_redirects: int = 5
+
+    def __init__(self, max_idle_per_host: int = 8,
+                 idle_timeout: float = 15.0):
+        self.context = ssl.create_default_context(cafile=certifi.where())
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.idle: dict[tuple, deque] = {}
+        self.async_idle: dict[tuple, deque] = {}
+        self.sessions: dict[tuple, ssl.SSLSession] = {}
+
+    @staticmethod
+    def Key(url: str) -> tuple[str, str, int]:
+        """Returns the pool key of a url.
+
+        Args:
+            url (str): http or https url
+
+        Raises:
+            ValueError: on unsupported url scheme
+
+        Returns:
+            tuple[str, str, int]: scheme, host and port
+        """
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported url: {url}")
+        port = parts.port if parts.port \
+            else (443 if parts.scheme == "https" else 80)
+        return (parts.scheme, parts.hostname, port)
+
+    @staticmethod
+    def Target(url: str) -> str:
+        """Returns the quoted request target of a url.
+
+        Args:
+            url (str): http or https url
+
+        Returns:
+            str: path and query
+        """
+        parts = urllib.parse.urlsplit(url)
+        target = urllib.parse.quote(parts.path or "/",
+                                    safe="/%:@!$&'()*+,;=-._~")
+        if parts.query:
+            target += "?" + urllib.parse.quote(parts.query,
+                                               safe="/%:@!$&'()*+,;=-._~?")
+        return target
+
+    def Headers(self, headers: dict[str, str] | None = None) \
+            -> dict[str, str]:
+        """Returns the default request headers merged with headers.
+
+        Args:
+            headers (dict[str, str] | None, optional): extra headers
+
+        Returns:
+            dict[str, str]: request headers
+        """
+        result = {"User-Agent": self.user_agent,
+                  "Accept-Encoding": "identity"}
+        if headers:
+            result.update(headers)
+        return result
+
+    def Get(self, url: str, timeout: float,
+            headers: dict[str, str] | None = None) -> PooledResponse:
+        """Sends a GET request on a pooled connection
+        and follows redirects.
+
+        Args:
+            url (str): http or https url
+            timeout (float): socket timeout in seconds
+            headers (dict[str, str] | None, optional): extra headers
+
+        Raises:
+            HTTPStatusError: on 4xx/5xx responses or too many redirects
+
+        Returns:
+            PooledResponse: response with the body unread
+        """
+        for _ in range(self.max_redirects + 1):
+            response = self.Request(url, timeout, headers)
+            location = response.headers.get("location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                response.Read()
+                response.Release()
+                url = urllib.parse.urljoin(url, location)
+                continue
+            if response.status >= 400:
+                response.Release()
+                raise HTTPStatusError(url, response.status,
+                                      response.reason, response.headers)
+            return response
+        raise HTTPStatusError(url, response.status, "Too many redirects",
+                              response.headers)
+
+    def Request(self, url: str, timeout: float,
+                headers: dict[str, str] | None = None) -> PooledResponse:
+        """Sends a single GET request on a pooled connection.
+        A request failing on a reused connection, closed by the server
+        while idle, is retried once on a new connection.
+
+        Args:
+            url (str): http or https url
+            timeout (float): socket timeout in seconds
+            headers (dict[str, str] | None, optional): extra headers
+
+        Returns:
+            PooledResponse: response with the body unread
+        """
+        key = self.Key(url)
+        target = self.Target(url)
+        while True:
+            conn, reused = self.Acquire(key, timeout)
+            try:
+                conn.request("GET", target, headers=self.Headers(headers))
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected,
+                    ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            return PooledResponse(self, url, conn, response)
+
+    def Acquire(self, key: tuple, timeout: float) \
+            -> tuple[http.client.HTTPConnection, bool]:
+        """Takes an idle connection to the host or creates a new one.
+
+        Args:
+            key (tuple): pool key
+            timeout (float): socket timeout in seconds
+
+        Returns:
+            tuple[http.client.HTTPConnection, bool]: connection and
+            whether it is reused
+        """
+        now = time.monotonic()
+        with self.lock:
+            idle = self.idle.get(key)
+            while idle:
+                conn, stamp = idle.pop()
+                if now - stamp < self.idle_timeout:
+                    conn.timeout = timeout
+                    if conn.sock:
+                        conn.sock.settimeout(timeout)
+                    return conn, True
+                conn.close()
+        if key[0] == "https":
+            return PooledHTTPSConnection(self, key, timeout), False
+        return PooledHTTPConnection(self, key, timeout), False
+
+    def Release(self, conn: http.client.HTTPConnection):
+        """Puts a connection back in the pool.
+
+        Args:
+            conn (http.client.HTTPConnection): pooled connection
+        """
+        if isinstance(conn, PooledHTTPSConnection) and conn.sock:
+            self.SaveSession(conn.key, conn.sock)
+        with self.lock:
+            idle = self.idle.setdefault(conn.key, deque())
+            if len(idle) < self.max_idle_per_host:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def GetSession(self, key: tuple) -> ssl.SSLSession | None:
+        """Returns the last TLS session to the host.
+
+        Args:
+            key (tuple): pool key
+
+        Returns:
+            ssl.SSLSession | None: session to resume
+        """
+        with self.lock:
+            return self.sessions.get(key)
+
+    def SaveSession(self, key: tuple, sock: ssl.SSLSocket):
+        """Stores the TLS session of the socket for resumption.
+
+        Args:
+            key (tuple): pool key
+            sock (ssl.SSLSocket): connected socket
+        """
+        session = sock.session
+        if session is not None:
+            with self.lock:
+                self.sessions[key] = session
+
+    async def AcquireAsync(self, key: tuple) \
+            -> tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        """Takes an idle stream pair to the host or opens a new one.
+
+        Args:
+            key (tuple): pool key
+
+        Returns:
+            tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+            streams and whether they are reused
+        """
+        now = time.monotonic()
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            idle = self.async_idle.get(key)
+            while idle:
+                reader, writer, stamp, owner = idle.pop()
+                if owner is loop and now - stamp < self.idle_timeout \
+                        and not reader.at_eof() \
+                        and not writer.is_closing():
+                    return reader, writer, True
+                if owner is loop:
+                    writer.close()
+        https = key[0] == "https"
+        reader, writer = await asyncio.open_connection(
+            key[1], key[2],
+            ssl=self.context if https else None,
+            server_hostname=key[1] if https else None)
+        return reader, writer, False
+
+    def ReleaseAsync(self, key: tuple, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter):
+        """Puts a stream pair back in the pool.
+        Must be called from the event loop owning the streams.
+
+        Args:
+            key (tuple): pool key
+            reader (asyncio.StreamReader): connection reader
+            writer (asyncio.StreamWriter): connection writer
+        """
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            idle = self.async_idle.setdefault(key, deque())
+            if len(idle) < self.max_idle_per_host:
+                idle.append((reader, writer, time.monotonic(), loop))
+                return
+        writer.close()
+
+    def Clear(self):
+        """Closes all idle connections.
+        """
+        with self.lock:
+            for idle in self.idle.values():
+                for conn, _ in idle:
+                    conn.close()
+            self.idle.clear()
+            self.async_idle.clear()
@@ -0,0 +1,56 @@
+import os
+import threading
+from url_dedup import LinkFile
+
+
+class ContentStore:
+    """Content addressed store of the downloaded files. Every distinct
+    content is kept once as <root>/objects/ab/cdef..., named by its
+    sha256, and the downloaded files are hardlinks to the objects.
+    Files with the same content from different urls share one object.
+    Thread safe.
+    """
+    def __init__(self, root: str):
+        """Constructs the store.
+
+        Args:
+            root (str): directory holding the objects directory
+        """
+        self.objects_dir = os.path.join(root, "objects")
+        self.lock = threading.Lock()
+
+    def ObjectPath(self, sha256: str) -> str:
+        """Returns the path of the object of a content.
+
+        Args:
+            sha256 (str): hex digest of the content
+
+        Returns:
+            str: path to the object
+        """
+        return os.path.join(self.objects_dir, sha256[:2], sha256[2:])
+
+    def Store(self, path: str, sha256: str) -> bool:
+        """Adds a downloaded file to the store and links it to its object.
+        A file with content already stored is replaced by a link to the
+        existing object.
+
+        Args:
+            path (str): path to the downloaded file
+            sha256 (str): hex digest of the file
+
+        Raises:
+            OSError: if the file can not be stored
+
+        Returns:
+            bool: true if the content was already stored
+        """
+        obj = self.ObjectPath(sha256)
+        with self.lock:
+            if os.path.exists(obj):
+                if not os.path.samefile(obj, path):
+                    LinkFile(obj, path)
+                return True
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            LinkFile(path, obj)
+            return False
@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+
+
+class DirectoryIndex:
+    """Names and sizes of the pdf files in the output directory, built by
+    a single os.scandir pass instead of a stat call per input row.
+    Finished downloads are added as they complete.
+    With an index file the index is kept between runs and loaded instead
+    of scanning, as long as the directory has not been modified since.
+    The modification time is taken when the index is constructed, before
+    the run creates its own files in the directory.
+    Thread safe.
+    """
+    suffix: str = ".pdf"
+
+    def __init__(self, dir_path: str, index_file: str | None = None):
+        """Constructs an empty index, filled by Build.
+
+        Args:
+            dir_path (str): directory of the downloaded files
+            index_file (str | None, optional): path to keep the index
+            between runs. Defaults to None.
+        """
+        self.dir_path = dir_path
+        self.index_file = index_file
+        self.files: dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.built = False
+        self.dirty = False
+        self.mtime = self.ModificationTime()
+
+    def Build(self) -> bool:
+        """Loads the index file if it is up to date, otherwise scans
+        the directory.
+
+        Returns:
+            bool: true if the index was loaded from the index file
+        """
+        if self.index_file and self.Load():
+            return True
+        self.Scan()
+        return False
+
+    def Scan(self):
+        """Indexes the pdf files of the directory.
+        A missing directory gives an empty index.
+        """
+        files = {}
+        try:
+            with os.scandir(self.dir_path) as entries:
+                for entry in entries:
+                    if entry.name.endswith(self.suffix) \
+                            and entry.is_file():
+                        files[os.path.normcase(entry.name)] = \
+                            entry.stat().st_size
+        except FileNotFoundError:
+            pass
+        with self.lock:
+            self.files = files
+            self.built = True
+            self.dirty = True
+
+    def Load(self) -> bool:
+        """Loads the index file.
+
+        Returns:
+            bool: false if the file is missing or corrupt, or the
+            directory was modified after the file was written
+        """
+        try:
+            with open(self.index_file, encoding="utf-8") as f:
+                data = json.load(f)
+            if self.mtime is None or data["mtime"] != self.mtime:
+                return False
+            files = {str(name): int(size)
+                     for name, size in data["files"].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return False
+        with self.lock:
+            self.files = files
+            self.built = True
+            self.dirty = False
+        return True
+
+    def Save(self):
+        """Writes the index file if the index or the directory has changed.
+        The file is written in place, replacing it would modify the
+        directory it describes. A torn write fails to load and the next
+        run scans the directory again.
+        """
+        if not self.index_file:
+            return
+        dir_path = os.path.dirname(self.index_file)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        # create the file before taking the modification time
+        open(self.index_file, "a").close()
+        mtime = self.ModificationTime()
+        with self.lock:
+            if not self.built or mtime is None \
+                    or not (self.dirty or mtime != self.mtime):
+                return
+            files = dict(self.files)
+            self.dirty = False
+        with open(self.index_file, "w", encoding="utf-8") as f:
+            json.dump({"mtime": mtime, "files": files}, f)
+
+    def Contains(self, name: str) -> bool:
+        """Returns true if the file is in the directory.
+
+        Args:
+            name (str): file name, e.g. "BR1.pdf"
+
+        Returns:
+            bool: true if indexed
+        """
+        with self.lock:
+            return os.path.normcase(name) in self.files
+
+    def Size(self, name: str) -> int | None:
+        """Returns the size of a file.
+
+        Args:
+            name (str): file name
+
+        Returns:
+            int | None: None if the file is not indexed
+        """
+        with self.lock:
+            return self.files.get(os.path.normcase(name))
+
+    def Update(self, name: str):
+        """Indexes a file written or removed by a download.
+
+        Args:
+            name (str): file name
+        """
+        try:
+            size = os.path.getsize(os.path.join(self.dir_path, name))
+        except OSError:
+            size = None
+        key = os.path.normcase(name)
+        with self.lock:
+            if self.files.get(key) == size:
+                return
+            if size is None:
+                del self.files[key]
+            else:
+                self.files[key] = size
+            self.dirty = True
+
+    def ModificationTime(self) -> int | None:
+        """Returns the modification time of the directory.
+
+        Returns:
+            int | None: nanoseconds, None if the directory is missing
+        """
+        try:
+            return os.stat(self.dir_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.files)
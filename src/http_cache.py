@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+from dataclasses import dataclass, asdict
+
+
+@dataclass
+class CacheEntry:
+    """HTTP metadata of a downloaded file.
+    """
+    url: str
+    etag: str | None = None
+    last_modified: str | None = None
+    size: int = 0
+    sha256: str = ""
+
+
+class HTTPCache:
+    """Persistent map from url to the HTTP metadata of its download,
+    stored as json. Lets a refresh of an existing file send a conditional
+    request, which the server answers with 304 and no body if the file
+    has not changed.
+    Thread safe.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: dict[str, CacheEntry] = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+
+    def Load(self):
+        """Loads the cache file, a missing or corrupt file gives
+        an empty cache.
+        """
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = {url: CacheEntry(**entry)
+                           for url, entry in json.load(f).items()}
+        except (OSError, ValueError, TypeError):
+            entries = {}
+        with self.lock:
+            self.entries = entries
+            self.dirty = False
+
+    def Save(self):
+        """Writes the cache file if it has changed.
+        The file is replaced atomically.
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {url: asdict(entry)
+                    for url, entry in self.entries.items()}
+            self.dirty = False
+        dir_path = os.path.dirname(self.path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def Get(self, url: str) -> CacheEntry | None:
+        """Returns the metadata of the url.
+
+        Args:
+            url (str): url of the file
+
+        Returns:
+            CacheEntry | None: None if the url is not cached
+        """
+        with self.lock:
+            return self.entries.get(url)
+
+    def Put(self, entry: CacheEntry):
+        """Adds or replaces the metadata of a url.
+
+        Args:
+            entry (CacheEntry): metadata of a completed download
+        """
+        with self.lock:
+            self.entries[entry.url] = entry
+            self.dirty = True
+
+    def Store(self, url: str, headers: dict[str, str], size: int,
+              sha256: str):
+        """Records a completed download.
+
+        Args:
+            url (str): url of the file
+            headers (dict[str, str]): lower case response headers
+            size (int): size of the file
+            sha256 (str): hex digest of the file
+        """
+        self.Put(CacheEntry(url, headers.get("etag"),
+                            headers.get("last-modified"), size, sha256))
+
+    def Conditional(self, url: str, pdf_file: str) \
+            -> dict[str, str] | None:
+        """Returns the headers asking the server to send the url
+        only if it has changed since the cached download.
+
+        Args:
+            url (str): url of the file
+            pdf_file (str): path to the downloaded file
+
+        Returns:
+            dict[str, str] | None: None if the file is missing, differs
+            from the cached size, or the server sent no validators
+        """
+        entry = self.Get(url)
+        if entry is None or not (entry.etag or entry.last_modified):
+            return None
+        try:
+            if os.path.getsize(pdf_file) != entry.size:
+                return None
+        except OSError:
+            return None
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
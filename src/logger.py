@@ -1,3 +1,4 @@
+import threading
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
@@ -12,10 +13,12 @@ class Singleton(type):
     _instances = {}
 
     def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            cls._instances[cls] = super(Singleton, cls).__call__(*args,
-                                                                 **kwargs)
-        return cls._instances[cls]
+        # one lookup on the common path
+        instance = cls._instances.get(cls)
+        if instance is None:
+            instance = super(Singleton, cls).__call__(*args, **kwargs)
+            cls._instances[cls] = instance
+        return instance
 
 
 class LogLevel(Enum):
@@ -31,6 +34,7 @@ class LogEntry:
     stamp: datetime
     severity: LogLevel
     msg: str
+    fields: dict | None = None
 
     def __repr__(self) -> str:
         formatted = (f"{self.stamp.strftime('%Y-%m-%dT%H:%M:%S')}."
@@ -61,6 +65,8 @@ class LogSyncState(ISyncState):
     def __init__(self):
         super().__init__()
         self.data = LogSyncData(deque(), 0.0)
+        # signalled when an entry is appended
+        self.cond = threading.Condition(self.lock)
 
     def Read(self) -> LogSyncData:
         """Returns a copy of the message queue.
@@ -83,6 +89,8 @@ class LogSyncState(ISyncState):
     def Append(self, entry: LogEntry):
         with self.lock:
             self.data.msgs.append(entry)
+            if len(self.data.msgs) == 1:
+                self.cond.notify()
 
     def Count(self):
         with self.lock:
@@ -92,8 +100,47 @@ class LogSyncState(ISyncState):
         with self.lock:
             return self.data.msgs.popleft()
 
+    def PopAll(self) -> deque[LogEntry]:
+        """Takes all queued entries with a single lock acquisition.
+
+        Returns:
+            deque[LogEntry]: entries in the order they were logged
+        """
+        with self.lock:
+            msgs = self.data.msgs
+            self.data.msgs = deque()
+            return msgs
+
+    def Wait(self, timeout: float | None = None) -> bool:
+        """Blocks until an entry is queued, Wake is called or the
+        timeout expires.
+
+        Args:
+            timeout (float | None, optional): max seconds to wait.
+            Defaults to None.
+
+        Returns:
+            bool: true if entries are queued
+        """
+        with self.lock:
+            if not self.data.msgs:
+                self.cond.wait(timeout)
+            return len(self.data.msgs) > 0
+
+    def Wake(self):
+        """Wakes a thread blocked in Wait.
+        """
+        with self.lock:
+            self.cond.notify_all()
+
 
 class Logger(metaclass=Singleton):
+    """Logger queueing entries for the logger task.
+    Messages are formatted with msg % args only if the level is enabled,
+    so disabled levels cost a comparison. Keyword fields are kept with
+    the entry for the json log.
+    Hot loops can keep the handle returned by Logger() in a local.
+    """
     def __init__(self, _log_level=LogLevel.INFO):
         self.log_level: LogLevel = _log_level
         self.log_state = LogSyncState()
@@ -106,57 +153,87 @@ class Logger(metaclass=Singleton):
         """
         self.log_level = _log_level
 
-    def Trace(self, msg: str):
+    def IsEnabled(self, level: LogLevel) -> bool:
+        """Returns true if messages of the level are logged.
+
+        Args:
+            level (LogLevel): severity
+
+        Returns:
+            bool: true if enabled
+        """
+        return self.log_level.value <= level.value
+
+    def Log(self, level: LogLevel, msg: str, args: tuple,
+            fields: dict) -> LogEntry:
+        """Formats and queues an entry.
+
+        Args:
+            level (LogLevel): severity
+            msg (str): message, a % format string if args are given
+            args (tuple): values of the format string
+            fields (dict): structured fields of the entry
+
+        Returns:
+            LogEntry: queued entry
+        """
+        if args:
+            msg = msg % args
+        entry = LogEntry(datetime.now(), level, msg, fields or None)
+        self.log_state.Append(entry)
+        return entry
+
+    def Trace(self, msg: str, /, *args, **fields):
         """Log a message at the current state.
 
         Args:
-            msg (str): message to log
+            msg (str): message to log, formatted with msg % args
+            fields: structured fields, e.g. brnum, url, bytes and ms
         """
         if self.log_level.value <= LogLevel.TRACE.value:
-            entry = LogEntry(datetime.now(), LogLevel.TRACE, msg)
-            self.log_state.Append(entry)
+            self.Log(LogLevel.TRACE, msg, args, fields)
 
-    def Info(self, msg: str):
+    def Info(self, msg: str, /, *args, **fields):
         """Log an info message.
 
         Args:
-            msg (str): message to log
+            msg (str): message to log, formatted with msg % args
+            fields: structured fields, e.g. brnum, url, bytes and ms
         """
         if self.log_level.value <= LogLevel.INFO.value:
-            entry = LogEntry(datetime.now(), LogLevel.INFO, msg)
-            self.log_state.Append(entry)
+            self.Log(LogLevel.INFO, msg, args, fields)
 
-    def Warn(self, msg: str):
+    def Warn(self, msg: str, /, *args, **fields):
         """Log a warning message.
 
         Args:
-            msg (str): message to log
+            msg (str): message to log, formatted with msg % args
+            fields: structured fields, e.g. brnum, url, bytes and ms
         """
         if self.log_level.value <= LogLevel.WARN.value:
-            entry = LogEntry(datetime.now(), LogLevel.WARN, msg)
-            self.log_state.Append(entry)
+            self.Log(LogLevel.WARN, msg, args, fields)
 
-    def Error(self, msg: str):
+    def Error(self, msg: str, /, *args, **fields):
         """Log an error message.
 
         Args:
-            msg (str): message to log
+            msg (str): message to log, formatted with msg % args
+            fields: structured fields, e.g. brnum, url, bytes and ms
         """
         if self.log_level.value <= LogLevel.ERROR.value:
-            entry = LogEntry(datetime.now(), LogLevel.ERROR, msg)
-            self.log_state.Append(entry)
+            self.Log(LogLevel.ERROR, msg, args, fields)
 
-    def Fatal(self, msg: str):
+    def Fatal(self, msg: str, /, *args, **fields):
         """Log a fatal error message.
 
         Args:
-            msg (str): message to log
+            msg (str): message to log, formatted with msg % args
+            fields: structured fields, e.g. brnum, url, bytes and ms
 
         Raises:
             Exception: message to log
         """
-        entry = LogEntry(datetime.now(), LogLevel.FATAL, msg)
-        self.log_state.Append(entry)
+        entry = self.Log(LogLevel.FATAL, msg, args, fields)
         raise Exception(entry)
 
     def GetState(self) -> LogSyncState:
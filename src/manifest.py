@@ -0,0 +1,278 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Iterator
+from state import Report, ReportState
+
+
+class Manifest:
+    """Durable record of a run in a SQLite database in WAL mode.
+    Every report state transition is recorded and written in batched
+    transactions, so a crashed or killed run can be resumed from the
+    manifest without reading the input file again.
+    Thread safe.
+    """
+    schema: str = """
+        CREATE TABLE IF NOT EXISTS reports (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            url TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            updated REAL NOT NULL,
+            sha256 TEXT NOT NULL DEFAULT '',
+            size INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+    # columns added after the first version of the schema
+    added_columns: dict[str, str] = {
+        "sha256": "TEXT NOT NULL DEFAULT ''",
+        "size": "INTEGER NOT NULL DEFAULT 0"}
+    columns: str = "name, id, url, status, attempts, sha256, size"
+    # states of reports still waiting for a download
+    unfinished: tuple[str, ...] = (ReportState.INIT.name,
+                                   ReportState.STAGED.name,
+                                   ReportState.VALIDATING.name)
+
+    def __init__(self, path: str, batch_size: int = 256,
+                 interval: float = 1.0):
+        """Constructs the manifest, the database is opened by Open.
+
+        Args:
+            path (str): path to the database file
+            batch_size (int, optional): transitions per transaction.
+            Defaults to 256.
+            interval (float, optional): max seconds a transition waits
+            to be written. Defaults to 1.0.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.conn: sqlite3.Connection | None = None
+        self.lock = threading.Lock()
+        self.pending: dict[int, tuple] = {}
+        self.oldest = 0.0
+
+    def Open(self):
+        """Opens or creates the database.
+        """
+        dir_path = os.path.dirname(self.path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        with self.lock:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False,
+                                        isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            # WAL commits survive a crash of the process
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(self.schema)
+            existing = {row[1] for row in self.conn.execute(
+                "PRAGMA table_info(reports)")}
+            for name, definition in self.added_columns.items():
+                if name not in existing:
+                    self.conn.execute(
+                        f"ALTER TABLE reports ADD COLUMN {name} {definition}")
+
+    def Close(self):
+        """Writes pending transitions and closes the database.
+        """
+        self.Flush()
+        with self.lock:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
+
+    def Resume(self, in_file: str) -> list[Report] | None:
+        """Loads the reports of an unfinished run of the input file which
+        still need a download. Downloads in flight when the run stopped
+        are queued again.
+
+        Args:
+            in_file (str): path to the input file of the run
+
+        Returns:
+            list[Report] | None: reports to download, None if the last
+            run is complete, stopped before the whole input file was read
+            or was made from another or a changed input file
+        """
+        with self.lock:
+            meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+            if meta.get("in_file") != in_file \
+                    or meta.get("signature") != self.Signature(in_file) \
+                    or meta.get("complete") != "0" \
+                    or meta.get("read_done") != "1":
+                return None
+            rows = self.conn.execute(
+                f"SELECT {self.columns} FROM reports"
+                " WHERE status IN (?, ?, ?) ORDER BY id",
+                self.unfinished).fetchall()
+        return [Report(name, id, url, ReportState.INIT, attempts)
+                for name, id, url, _, attempts, _, _ in rows]
+
+    def Begin(self, in_file: str, reports: Iterable[Report] = ()):
+        """Starts a new run, replacing the manifest of the last run.
+        Reports read later are added with Record.
+
+        Args:
+            in_file (str): path to the input file of the run
+            reports (Iterable[Report], optional): reports read from the
+            input file. Defaults to none.
+        """
+        now = time.time()
+        with self.lock:
+            self.pending.clear()
+            with self.Transaction():
+                self.conn.execute("DELETE FROM reports")
+                self.conn.executemany(
+                    "INSERT INTO reports VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self.Row(report, now) for report in reports))
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                    [("in_file", in_file),
+                     ("signature", self.Signature(in_file)),
+                     ("complete", "0"),
+                     ("read_done", "0")])
+
+    def ReadDone(self):
+        """Marks the input file as read, every report of the run is
+        recorded and the run can be resumed from the manifest.
+        """
+        with self.lock:
+            self.WritePending()
+            with self.Transaction():
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('read_done', '1')")
+
+    def Record(self, report: Report):
+        """Records the current state of a report.
+        Written with the next batch.
+
+        Args:
+            report (Report): report which changed state
+        """
+        now = time.time()
+        with self.lock:
+            if not self.pending:
+                self.oldest = now
+            self.pending[report.id] = self.Row(report, now)
+            if len(self.pending) >= self.batch_size \
+                    or now - self.oldest >= self.interval:
+                self.WritePending()
+
+    def Flush(self):
+        """Writes all recorded transitions.
+        """
+        with self.lock:
+            self.WritePending()
+
+    def Complete(self):
+        """Marks the run as complete, the next run starts over.
+        """
+        with self.lock:
+            self.WritePending()
+            with self.Transaction():
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('complete', '1')")
+
+    def Reports(self) -> Iterator[Report]:
+        """Streams the reports of the run for export.
+
+        Yields:
+            Report: reports ordered by row
+        """
+        yield from self.Query(f"SELECT {self.columns} FROM reports"
+                              " ORDER BY id")
+
+    def Unfinished(self) -> Iterator[Report]:
+        """Streams the reports which have not been downloaded or failed.
+
+        Yields:
+            Report: reports ordered by row
+        """
+        yield from self.Query(f"SELECT {self.columns} FROM reports"
+                              " WHERE status IN (?, ?, ?) ORDER BY id",
+                              self.unfinished)
+
+    def Query(self, sql: str, params: tuple = ()) -> Iterator[Report]:
+        """Runs a query of reports after writing the recorded transitions.
+        Rows are fetched in batches, so the result is never held in
+        memory.
+
+        Args:
+            sql (str): query selecting the columns of a report
+            params (tuple, optional): query parameters. Defaults to ().
+
+        Yields:
+            Report: report of each row
+        """
+        with self.lock:
+            self.WritePending()
+            cursor = self.conn.execute(sql, params)
+        while True:
+            with self.lock:
+                rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                return
+            for name, id, url, status, attempts, sha256, size in rows:
+                yield Report(name, id, url, ReportState[status], attempts,
+                             sha256, size)
+
+    def WritePending(self):
+        """Writes the recorded transitions in one transaction.
+        The lock must be held.
+        """
+        if not self.pending or self.conn is None:
+            return
+        with self.Transaction():
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO reports"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                self.pending.values())
+        self.pending.clear()
+
+    def Transaction(self) -> sqlite3.Connection:
+        """Returns a context manager running a transaction.
+        The lock must be held.
+
+        Returns:
+            sqlite3.Connection: commits on exit, rolls back on errors
+        """
+        self.conn.execute("BEGIN")
+        return self.conn
+
+    @staticmethod
+    def Row(report: Report, now: float) -> tuple:
+        """Returns the database row of a report.
+
+        Args:
+            report (Report): report to store
+            now (float): time of the transition
+
+        Returns:
+            tuple: values of the reports table
+        """
+        return (int(report.id), str(report.name), str(report.url),
+                report.status.name, report.attempts, now, report.sha256,
+                report.size)
+
+    @staticmethod
+    def Signature(in_file: str) -> str:
+        """Returns the size and modification time of the input file,
+        to detect an input file changed since the manifest was made.
+
+        Args:
+            in_file (str): path to the input file
+
+        Returns:
+            str: signature, empty if the file does not exist
+        """
+        try:
+            stat = os.stat(in_file)
+        except OSError:
+            return ""
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
@@ -0,0 +1,369 @@
+import json
+import math
+import os
+import threading
+import time
+
+
+class Counter:
+    """Monotonic count, e.g. of downloads or bytes.
+    Thread safe.
+    """
+    kind: str = "counter"
+
+    def __init__(self):
+        self.value: float = 0
+        self.lock = threading.Lock()
+
+    def Inc(self, n: float = 1):
+        """Adds to the count.
+
+        Args:
+            n (float, optional): amount to add. Defaults to 1.
+        """
+        with self.lock:
+            self.value += n
+
+    def Snapshot(self) -> float:
+        with self.lock:
+            return self.value
+
+
+class Gauge:
+    """Value which goes up and down, e.g. downloads in flight.
+    Thread safe.
+    """
+    kind: str = "gauge"
+
+    def __init__(self):
+        self.value: float = 0
+        self.lock = threading.Lock()
+
+    def Set(self, value: float):
+        with self.lock:
+            self.value = value
+
+    def Snapshot(self) -> float:
+        with self.lock:
+            return self.value
+
+
+class Histogram:
+    """Distribution of values with a bounded relative error, in the
+    manner of HDR histograms. Each power of 2 is split into sub_buckets
+    linear buckets, so a quantile is within 1/sub_buckets of the
+    recorded value at any magnitude and memory does not grow with the
+    number of values.
+    Thread safe.
+    """
+    kind: str = "summary"
+    quantiles: tuple[float, ...] = (0.5, 0.9, 0.99, 0.999)
+
+    def __init__(self, sub_buckets: int = 32):
+        """Constructs an empty histogram.
+
+        Args:
+            sub_buckets (int, optional): buckets per power of 2.
+            Defaults to 32.
+        """
+        self.sub_buckets = sub_buckets
+        self.buckets: dict[int, int] = {}
+        self.count: int = 0
+        self.sum: float = 0
+        self.min: float = math.inf
+        self.max: float = 0
+        self.lock = threading.Lock()
+
+    def Bucket(self, value: float) -> int:
+        """Returns the index of the bucket of a value.
+        Values below 1 share bucket 0.
+
+        Args:
+            value (float): recorded value
+
+        Returns:
+            int: bucket index, increasing with the value
+        """
+        if value < 1:
+            return 0
+        mantissa, exponent = math.frexp(value)
+        # mantissa is in [0.5, 1)
+        return exponent * self.sub_buckets \
+            + int((mantissa * 2 - 1) * self.sub_buckets)
+
+    def Upper(self, bucket: int) -> float:
+        """Returns the upper bound of a bucket.
+
+        Args:
+            bucket (int): bucket index
+
+        Returns:
+            float: largest value of the bucket
+        """
+        if bucket == 0:
+            return 1.0
+        exponent, sub = divmod(bucket, self.sub_buckets)
+        return math.ldexp((1 + (sub + 1) / self.sub_buckets) / 2, exponent)
+
+    def Record(self, value: float):
+        """Records a value.
+
+        Args:
+            value (float): value, negative values are recorded as 0
+        """
+        value = max(value, 0)
+        bucket = self.Bucket(value)
+        with self.lock:
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+            self.count += 1
+            self.sum += value
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+
+    def Quantile(self, q: float) -> float:
+        """Returns the value below which a fraction of the values lie.
+
+        Args:
+            q (float): fraction between 0 and 1
+
+        Returns:
+            float: upper bound of the bucket holding the quantile,
+            capped by the largest value, 0 if empty
+        """
+        with self.lock:
+            return self.QuantileLocked(q)
+
+    def QuantileLocked(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.Upper(bucket), self.max)
+        return self.max
+
+    def Snapshot(self) -> dict:
+        """Returns the count, sum, min, max and quantiles.
+
+        Returns:
+            dict: summary of the recorded values
+        """
+        with self.lock:
+            return {"count": self.count,
+                    "sum": self.sum,
+                    "min": self.min if self.count else 0.0,
+                    "max": self.max,
+                    "quantiles": {str(q): self.QuantileLocked(q)
+                                  for q in self.quantiles}}
+
+
+class MetricsRegistry:
+    """Named metrics of a run, each name with an optional set of labels,
+    exported as json or in the Prometheus text format.
+    Metrics are created on first use.
+    Thread safe.
+    """
+    def __init__(self, prefix: str = "pdfdownloader_"):
+        self.prefix = prefix
+        self.metrics: dict[str, dict[tuple, object]] = {}
+        self.help: dict[str, str] = {}
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+
+    def Get(self, cls: type, name: str, help: str, labels: dict) -> object:
+        """Returns the metric of a name and labels, created on first use.
+
+        Raises:
+            TypeError: if the name is used by a metric of another type
+        """
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            family = self.metrics.setdefault(name, {})
+            metric = family.get(key)
+            if metric is None:
+                if family and not isinstance(next(iter(family.values())),
+                                             cls):
+                    raise TypeError(f"Metric {name} is not a {cls.kind}")
+                metric = family[key] = cls()
+            if help and not self.help.get(name):
+                self.help[name] = help
+            return metric
+
+    def Counter(self, name: str, help: str = "", **labels) -> Counter:
+        """Returns the counter of a name and labels.
+
+        Args:
+            name (str): metric name without the prefix
+            help (str, optional): description. Defaults to "".
+            labels: label values, e.g. status="downloaded"
+
+        Returns:
+            Counter: counter, created on first use
+        """
+        return self.Get(Counter, name, help, labels)
+
+    def Gauge(self, name: str, help: str = "", **labels) -> Gauge:
+        """Returns the gauge of a name and labels.
+
+        Args:
+            name (str): metric name without the prefix
+            help (str, optional): description. Defaults to "".
+            labels: label values
+
+        Returns:
+            Gauge: gauge, created on first use
+        """
+        return self.Get(Gauge, name, help, labels)
+
+    def Histogram(self, name: str, help: str = "", **labels) -> Histogram:
+        """Returns the histogram of a name and labels.
+
+        Args:
+            name (str): metric name without the prefix
+            help (str, optional): description. Defaults to "".
+            labels: label values
+
+        Returns:
+            Histogram: histogram, created on first use
+        """
+        return self.Get(Histogram, name, help, labels)
+
+    def Uptime(self) -> float:
+        """Returns the seconds since the registry was created.
+
+        Returns:
+            float: seconds
+        """
+        return time.monotonic() - self.start
+
+    def Families(self) -> list[tuple[str, list[tuple[dict, object]]]]:
+        with self.lock:
+            return [(name, [(dict(key), metric)
+                            for key, metric in family.items()])
+                    for name, family in sorted(self.metrics.items())]
+
+    def Snapshot(self) -> dict:
+        """Returns the values of all metrics.
+
+        Returns:
+            dict: metric name to a list of labels and values
+        """
+        return {"uptime_s": self.Uptime(),
+                "metrics": {
+                    self.prefix + name: [
+                        {"labels": labels, "value": metric.Snapshot()}
+                        for labels, metric in family]
+                    for name, family in self.Families()}}
+
+    def Prometheus(self) -> str:
+        """Formats all metrics in the Prometheus text exposition format.
+        Histograms are exported as summaries with quantiles.
+
+        Returns:
+            str: exposition text
+        """
+        lines = []
+        for name, family in self.Families():
+            kind = family[0][1].kind
+            if self.help.get(name):
+                lines.append(f"# HELP {self.prefix}{name} {self.help[name]}")
+            name = self.prefix + name
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in family:
+                value = metric.Snapshot()
+                if kind != "summary":
+                    lines.append(f"{name}{Labels(labels)} {value}")
+                    continue
+                for q, v in value["quantiles"].items():
+                    lines.append(f"{name}{Labels(labels, quantile=q)} {v}")
+                lines.append(f"{name}_sum{Labels(labels)} {value['sum']}")
+                lines.append(
+                    f"{name}_count{Labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def Labels(labels: dict, **extra) -> str:
+    """Formats labels as {name="value",...} for the Prometheus format.
+
+    Args:
+        labels (dict): label values
+        extra: labels added after them
+
+    Returns:
+        str: formatted labels, "" without labels
+    """
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n")
+               .replace('"', '\\"') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"'
+                          for k, v in zip(labels, escaped)) + "}"
+
+
+class MetricsExporter:
+    """Writes the metrics of a registry to a json file and a Prometheus
+    textfile collector file, at the end of a run and on an interval.
+    Files are replaced atomically, so readers never see a partial file.
+    """
+    def __init__(self, registry: MetricsRegistry,
+                 json_file: str | None = None,
+                 prometheus_file: str | None = None,
+                 interval: float = 10.0):
+        """Constructs the exporter.
+
+        Args:
+            registry (MetricsRegistry): metrics to export
+            json_file (str | None, optional): json output. Defaults to None.
+            prometheus_file (str | None, optional): Prometheus output,
+            should end with .prom. Defaults to None.
+            interval (float, optional): seconds between writes.
+            Defaults to 10.0.
+        """
+        self.registry = registry
+        self.json_file = json_file
+        self.prometheus_file = prometheus_file
+        self.interval = interval
+        self.due = time.monotonic() + interval
+
+    def Enabled(self) -> bool:
+        return bool(self.json_file or self.prometheus_file)
+
+    def WriteDue(self):
+        """Writes the files if the interval has passed since the last
+        write.
+        """
+        if not self.Enabled() or time.monotonic() < self.due:
+            return
+        self.Write()
+
+    def Write(self):
+        """Writes the files.
+
+        Raises:
+            OSError: if a file can not be written
+        """
+        self.due = time.monotonic() + self.interval
+        if self.json_file:
+            self.Replace(self.json_file,
+                         json.dumps(self.registry.Snapshot(), indent=2))
+        if self.prometheus_file:
+            self.Replace(self.prometheus_file, self.registry.Prometheus())
+
+    @staticmethod
+    def Replace(path: str, text: str):
+        """Writes a file through a temporary file and a rename.
+
+        Args:
+            path (str): file to write
+            text (str): content
+        """
+        dir_path = os.path.dirname(path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
@@ -0,0 +1,168 @@
+import json
+import os
+import re
+from pdf_validator import PDFEnds
+
+
+class PartialFile:
+    """Download in progress, kept next to its target as <file>.part with
+    the url and the validator (ETag or Last-Modified) of the response
+    in <file>.part.json.
+    An interrupted download is resumed with a Range request guarded by
+    If-Range, so a changed file on the server is fetched in full again.
+    """
+    suffix: str = ".part"
+    content_range = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+    def __init__(self, path: str, url: str):
+        self.path = path
+        self.url = url
+        self.part_path = path + self.suffix
+        self.meta_path = self.part_path + ".json"
+        self.offset = 0
+        self.validator: str | None = None
+
+    def Load(self) -> int:
+        """Loads a partial download of the url left by an earlier attempt.
+        Partial files of another url or without a validator are removed.
+
+        Returns:
+            int: bytes already downloaded
+        """
+        self.offset = 0
+        self.validator = None
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            size = os.path.getsize(self.part_path)
+        except (OSError, ValueError):
+            self.Discard()
+            return 0
+        if meta.get("url") != self.url or not meta.get("validator") \
+                or size == 0:
+            self.Discard()
+            return 0
+        self.offset = size
+        self.validator = meta["validator"]
+        return self.offset
+
+    def Headers(self) -> dict[str, str] | None:
+        """Returns the request headers resuming the download.
+
+        Returns:
+            dict[str, str] | None: None if there is nothing to resume
+        """
+        if self.offset == 0:
+            return None
+        return {"Range": f"bytes={self.offset}-",
+                "If-Range": self.validator}
+
+    def Begin(self, status: int, headers: dict[str, str]) -> int:
+        """Decides from the response head whether the download resumes
+        and saves the validator of the response.
+
+        Args:
+            status (int): response status code
+            headers (dict[str, str]): lower case response headers
+
+        Raises:
+            ValueError: if a partial response does not start at the offset
+
+        Returns:
+            int: offset the body is written from, 0 for a full fetch
+        """
+        if status == 206:
+            start = self.RangeStart(headers.get("content-range", ""))
+            if self.offset == 0 or start != self.offset:
+                self.Discard()
+                raise ValueError("Unexpected Content-Range: "
+                                 f"{headers.get('content-range')}")
+        else:
+            # Range ignored or file changed on the server
+            self.offset = 0
+        self.validator = self.Validator(headers)
+        if self.validator:
+            with open(self.meta_path, "w", encoding="utf-8") as f:
+                json.dump({"url": self.url, "validator": self.validator}, f)
+        elif os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+        return self.offset
+
+    def Open(self):
+        """Opens the partial file for writing from the offset.
+
+        Returns:
+            BufferedWriter: binary file object
+        """
+        return open(self.part_path, "ab" if self.offset else "wb")
+
+    def FeedEnds(self, ends: PDFEnds):
+        """Feeds the first and last bytes already downloaded.
+
+        Args:
+            ends (PDFEnds): ends of the complete file
+        """
+        if self.offset == 0:
+            return
+        with open(self.part_path, "rb") as f:
+            head = f.read(min(self.offset, ends.head_size))
+            ends.Feed(head)
+            f.seek(max(len(head), self.offset - ends.tail_size))
+            ends.Feed(f.read())
+
+    def FeedHash(self, digest):
+        """Feeds the bytes already downloaded to a hash.
+
+        Args:
+            digest (hashlib._Hash): hash of the complete file
+        """
+        if self.offset == 0:
+            return
+        with open(self.part_path, "rb") as f:
+            while chunk := f.read(1 << 16):
+                digest.update(chunk)
+
+    def Finish(self):
+        """Moves the completed download to its target path.
+        """
+        os.replace(self.part_path, self.path)
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+
+    def Discard(self):
+        """Removes the partial file and its metadata.
+        """
+        for path in (self.part_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.offset = 0
+        self.validator = None
+
+    @staticmethod
+    def Validator(headers: dict[str, str]) -> str | None:
+        """Returns the validator to resume a download with.
+        Weak ETags may not be used with If-Range.
+
+        Args:
+            headers (dict[str, str]): lower case response headers
+
+        Returns:
+            str | None: strong ETag or Last-Modified, None if neither
+        """
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            return etag
+        return headers.get("last-modified")
+
+    @classmethod
+    def RangeStart(cls, value: str) -> int | None:
+        """Parses the first byte position of a Content-Range header.
+
+        Args:
+            value (str): header value, e.g. "bytes 100-199/200"
+
+        Returns:
+            int | None: None if the header is invalid
+        """
+        match = cls.content_range.fullmatch(value.strip())
+        return int(match.group(1)) if match else None
@@ -0,0 +1,142 @@
+import os
+import re
+from enum import Enum
+from PyPDF2 import PdfReader
+
+
+class ValidationLevel(Enum):
+    ''' PDF validation levels, from cheapest to most expensive
+    '''
+    NONE = 0,
+    MAGIC = 1,
+    STRUCTURE = 2,
+    FULL = 3
+
+
+class InvalidPDFError(Exception):
+    """Raised when a downloaded file fails pdf validation.
+    """
+    pass
+
+
+class PDFEnds:
+    """Keeps the first and last bytes of a file while it is streamed,
+    so the cheap validation levels do not read the file again.
+    """
+    def __init__(self, head_size: int = 1024, tail_size: int = 2048):
+        self.head_size = head_size
+        self.tail_size = tail_size
+        self.head = bytearray()
+        self.tail = bytearray()
+
+    def Feed(self, data: bytes | memoryview):
+        """Feeds the next chunk of the file.
+
+        Args:
+            data (bytes | memoryview): chunk in file order
+        """
+        if len(self.head) < self.head_size:
+            self.head += data[:self.head_size - len(self.head)]
+        if len(data) >= self.tail_size:
+            self.tail = bytearray(data[-self.tail_size:])
+        else:
+            self.tail += data
+            del self.tail[:-self.tail_size]
+
+
+class PDFValidator:
+    """Validates pdf files at a configured level:
+    - NONE: no validation
+    - MAGIC: %PDF- header and %%EOF trailer marker
+    - STRUCTURE: MAGIC and the last cross reference section and trailer
+    - FULL: MAGIC and extracting the text of the first page
+    """
+    xref_table = re.compile(rb"xref\s+\d+\s+\d+\s+\d{10}\s\d{5}\s[fn]")
+    xref_stream = re.compile(rb"\d+\s+\d+\s+obj\s*<<")
+    start_xref = re.compile(rb"startxref\s+(\d+)\s+%%EOF")
+
+    def __init__(self, level: ValidationLevel = ValidationLevel.FULL):
+        self.level = level
+
+    def Validate(self, pdf_file: str,
+                 ends: PDFEnds | None = None):
+        """Validates the pdf file.
+
+        Args:
+            pdf_file (str): path to pdf file
+            ends (PDFEnds | None, optional): bytes captured while the file
+            was written, read from the file if not given
+
+        Raises:
+            InvalidPDFError: if the file is not a valid pdf
+        """
+        if self.level == ValidationLevel.NONE:
+            return
+        if ends is None:
+            ends = self.ReadEnds(pdf_file)
+        self.CheckMagic(ends)
+        if self.level == ValidationLevel.STRUCTURE:
+            self.CheckStructure(pdf_file, ends)
+        elif self.level == ValidationLevel.FULL:
+            reader = PdfReader(pdf_file)
+            _ = reader.pages[0].extract_text()
+
+    def ReadEnds(self, pdf_file: str) -> PDFEnds:
+        """Reads the first and last bytes of a file with a seek.
+
+        Args:
+            pdf_file (str): path to pdf file
+
+        Returns:
+            PDFEnds: head and tail of the file
+        """
+        ends = PDFEnds()
+        with open(pdf_file, "rb") as f:
+            ends.head += f.read(ends.head_size)
+            f.seek(max(0, os.fstat(f.fileno()).st_size - ends.tail_size))
+            ends.tail += f.read(ends.tail_size)
+        return ends
+
+    def CheckMagic(self, ends: PDFEnds):
+        """Checks the %PDF- header and %%EOF marker.
+
+        Args:
+            ends (PDFEnds): head and tail of the file
+
+        Raises:
+            InvalidPDFError: if a marker is missing
+        """
+        if b"%PDF-" not in ends.head:
+            raise InvalidPDFError("PDF header not found")
+        if b"%%EOF" not in ends.tail:
+            raise InvalidPDFError("EOF marker not found")
+
+    def CheckStructure(self, pdf_file: str, ends: PDFEnds):
+        """Checks that startxref points at a cross reference table with a
+        trailer or at a cross reference stream.
+        Only the bytes at the startxref offset are read from the file.
+
+        Args:
+            pdf_file (str): path to pdf file
+            ends (PDFEnds): head and tail of the file
+
+        Raises:
+            InvalidPDFError: if the cross reference section is broken
+        """
+        matches = self.start_xref.findall(bytes(ends.tail))
+        if not matches:
+            raise InvalidPDFError("startxref not found")
+        offset = int(matches[-1])
+        with open(pdf_file, "rb") as f:
+            if offset >= os.fstat(f.fileno()).st_size:
+                raise InvalidPDFError("startxref offset beyond end of file")
+            f.seek(offset)
+            section = f.read(4096).lstrip()
+        if self.xref_table.match(section):
+            if b"trailer" not in ends.tail or b"/Root" not in ends.tail:
+                raise InvalidPDFError("Trailer not found")
+        elif self.xref_stream.match(section):
+            if b"/XRef" not in section or b"/Root" not in section:
+                raise InvalidPDFError("Invalid cross reference stream")
+        else:
+            raise InvalidPDFError("Cross reference section not found")
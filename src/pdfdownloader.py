@@ -1,12 +1,35 @@
 from enum import Enum
+import os
 import signal
-import time
+import socket
+import sqlite3
+import sys
 import argparse
+import queue
+import threading
+import time
 import yaml
 from collections import deque
 from logger import Logger, LogLevel
-from task_handler import ThreadPoolHandler
-from task import FileReaderTask, FileWriterTask, URLDownloaderTask, LoggerTask
+from task_handler import ITaskHandler, ThreadPoolHandler, AsyncioHandler
+from task import FileReaderTask, URLDownloaderTask, LoggerTask, TaskState
+from task import ResultWriterTask
+from task import AsyncURLDownloaderTask, DownloadOptions
+from streaming import ByteBudget, AsyncByteBudget
+from pdf_validator import ValidationLevel, PDFValidator
+from validation_stage import ValidationStage
+from scheduler import HostScheduler, ConcurrencyController
+from retry import RetryPolicy, RetryQueue
+from http_cache import HTTPCache
+from manifest import Manifest
+from dir_index import DirectoryIndex
+from url_dedup import URLDedup, LinkFile
+from content_store import ContentStore
+from connection_pool import HTTPStatusError
+from metrics import MetricsRegistry, MetricsExporter
+from shards import ShardPaths, MergeResults
+from shards import PartPath, ShardPart, WorkerPart, WorkerPaths
+from work_queue import WorkQueue
 from state import Report, ReportState
 
 
@@ -17,7 +40,20 @@ class ApplicationState(Enum):
     READ = 1,
     DOWNLOAD = 2,
     WRITE = 3,
-    SHUTDOWN = 4
+    SHUTDOWN = 4,
+    STOPPING = 5
+
+
+class AppEvent(Enum):
+    ''' Events moving the application between states
+    '''
+    READ_DONE = 0,
+    DOWNLOAD_DONE = 1,
+    VALIDATION_DONE = 2,
+    WRITE_DONE = 3,
+    SIGINT = 4,
+    WAKEUP = 5,
+    READ_ROWS = 6
 
 
 class Config:
@@ -29,13 +65,111 @@ class Config:
                  _out_file: str,
                  _out_pdf_dir: str,
                  _log_level: bool,
-                 _n_tasks: int):
+                 _n_tasks: int,
+                 _engine: str = "thread",
+                 _chunk_kb: int = 64,
+                 _max_file_mb: int = 0,
+                 _inflight_mb: int = 0,
+                 _validation: str = "full",
+                 _validation_workers: int = 0,
+                 _validation_queue: int = 64,
+                 _max_per_host: int = 0,
+                 _host_rate: float = 0,
+                 _host_burst: int = 1,
+                 _max_attempts: int = 3,
+                 _retry_base_s: float = 1.0,
+                 _retry_max_s: float = 60.0,
+                 _max_retry_after_s: float = 600.0,
+                 _resume: bool = True,
+                 _refresh: bool = False,
+                 _cache_file: str | None = None,
+                 _manifest_file: str | None = None,
+                 _dedup_output: bool = False,
+                 _read_ahead: int = 1024,
+                 _read_limit: int = 65536,
+                 _persist_index: bool = False,
+                 _dedup_urls: bool = True,
+                 _content_store: bool = False,
+                 _json_log: bool = False,
+                 _metrics_file: str | None = None,
+                 _prometheus_file: str | None = None,
+                 _metrics_interval: float = 10.0,
+                 _adaptive_tasks: bool = False,
+                 _min_tasks: int = 1,
+                 _max_tasks: int = 0,
+                 _adapt_interval_s: float = 2.0,
+                 _shard_index: int = 0,
+                 _shard_count: int = 1,
+                 _work_queue: str | None = None,
+                 _worker_id: str | None = None,
+                 _lease_s: float = 60.0,
+                 _claim_batch: int = 16):
         self.in_file_path = _in_file
         self.out_file = _out_file
         self.out_dir_path = _out_pdf_dir
         self.log_level = LogLevel.TRACE if _log_level\
             else LogLevel.INFO
         self.concurrent_tasks = _n_tasks
+        self.engine = _engine
+        self.chunk_size = _chunk_kb * 1024
+        self.max_file_size = _max_file_mb * 1024 * 1024
+        self.max_inflight_bytes = _inflight_mb * 1024 * 1024
+        self.validation = ValidationLevel[_validation.upper()]
+        self.validation_workers = _validation_workers
+        self.validation_queue = _validation_queue
+        self.max_per_host = _max_per_host
+        self.host_rate = _host_rate
+        self.host_burst = _host_burst
+        self.max_attempts = _max_attempts
+        self.retry_base_s = _retry_base_s
+        self.retry_max_s = _retry_max_s
+        self.max_retry_after_s = _max_retry_after_s
+        self.resume = _resume
+        self.refresh = _refresh
+        self.cache_file = _cache_file if _cache_file \
+            else os.path.join(_out_pdf_dir, ".http_cache.json")
+        self.manifest_file = _manifest_file if _manifest_file \
+            else os.path.join(_out_pdf_dir, ".manifest.db")
+        self.dedup_output = _dedup_output
+        self.read_ahead = _read_ahead
+        self.read_limit = max(_read_limit, _read_ahead)
+        self.index_file = os.path.join(_out_pdf_dir, ".dir_index.json") \
+            if _persist_index else None
+        self.dedup_urls = _dedup_urls
+        self.content_store = _content_store
+        self.json_log = _json_log
+        self.metrics_file = _metrics_file or None
+        self.prometheus_file = _prometheus_file or None
+        self.metrics_interval = _metrics_interval
+        self.adaptive_tasks = _adaptive_tasks
+        self.min_tasks = _min_tasks
+        self.max_tasks = _max_tasks if _max_tasks else 4 * _n_tasks
+        self.adapt_interval_s = _adapt_interval_s
+        if _shard_count < 1 or not 0 <= _shard_index < _shard_count:
+            raise ValueError(f"Invalid shard {_shard_index}"
+                             f" of {_shard_count}")
+        if _work_queue and _shard_count > 1:
+            raise ValueError("Use either shards or a work queue")
+        self.shard_index = _shard_index
+        self.shard_count = _shard_count
+        self.work_queue = _work_queue or None
+        self.worker_id = _worker_id or \
+            f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_s = _lease_s
+        self.claim_batch = _claim_batch
+        # name of the files of this process in a run of several processes
+        self.part: str | None = None
+        if _shard_count > 1:
+            self.part = ShardPart(_shard_index, _shard_count)
+        elif self.work_queue:
+            self.part = WorkerPart(self.worker_id)
+        if self.part:
+            # files of the run are kept apart from the other processes
+            self.out_file = PartPath(self.out_file, self.part)
+            self.manifest_file = PartPath(self.manifest_file, self.part)
+            self.cache_file = PartPath(self.cache_file, self.part)
+            if self.index_file:
+                self.index_file = PartPath(self.index_file, self.part)
 
     @classmethod
     def Create(cls,  *args, **kwargs) -> object | None:
@@ -45,6 +179,12 @@ class Config:
         Returns:
             Config:
         """
+        # shard and work queue options apply to the config file and the
+        # other arguments
+        shard_index = args[0].shard_index
+        shard_count = args[0].shard_count
+        work_queue = args[0].work_queue
+        worker_id = args[0].worker_id
         if args[0].config:
             yml = Config.LoadYMLFile(args[0].config)
             if not yml:
@@ -54,7 +194,47 @@ class Config:
                 _out_file=yml['out_file'],
                 _out_pdf_dir=yml['out_pdf_dir'],
                 _log_level=yml['verbose'],
-                _n_tasks=yml['tasks'])
+                _n_tasks=yml['tasks'],
+                _engine=yml.get('engine', "thread"),
+                _chunk_kb=yml.get('chunk_kb', 64),
+                _max_file_mb=yml.get('max_file_mb', 0),
+                _inflight_mb=yml.get('inflight_mb', 0),
+                _validation=yml.get('validation', "full"),
+                _validation_workers=yml.get('validation_workers', 0),
+                _validation_queue=yml.get('validation_queue', 64),
+                _max_per_host=yml.get('max_per_host', 0),
+                _host_rate=yml.get('host_rate', 0),
+                _host_burst=yml.get('host_burst', 1),
+                _max_attempts=yml.get('max_attempts', 3),
+                _retry_base_s=yml.get('retry_base_s', 1.0),
+                _retry_max_s=yml.get('retry_max_s', 60.0),
+                _max_retry_after_s=yml.get('max_retry_after_s', 600.0),
+                _resume=yml.get('resume', True),
+                _refresh=yml.get('refresh', False),
+                _cache_file=yml.get('cache_file'),
+                _manifest_file=yml.get('manifest_file'),
+                _dedup_output=yml.get('dedup_output', False),
+                _read_ahead=yml.get('read_ahead', 1024),
+                _read_limit=yml.get('read_limit', 65536),
+                _persist_index=yml.get('persist_index', False),
+                _dedup_urls=yml.get('dedup_urls', True),
+                _content_store=yml.get('content_store', False),
+                _json_log=yml.get('json_log', False),
+                _metrics_file=yml.get('metrics_file'),
+                _prometheus_file=yml.get('prometheus_file'),
+                _metrics_interval=yml.get('metrics_interval', 10.0),
+                _adaptive_tasks=yml.get('adaptive_tasks', False),
+                _min_tasks=yml.get('min_tasks', 1),
+                _max_tasks=yml.get('max_tasks', 0),
+                _adapt_interval_s=yml.get('adapt_interval_s', 2.0),
+                _shard_index=shard_index if shard_index is not None
+                else yml.get('shard_index', 0),
+                _shard_count=shard_count if shard_count is not None
+                else yml.get('shard_count', 1),
+                _work_queue=work_queue or yml.get('work_queue'),
+                _worker_id=worker_id or yml.get('worker_id'),
+                _lease_s=yml.get('lease_s', 60.0),
+                _claim_batch=yml.get('claim_batch', 16))
         if args[0].in_file:
 
             # Default params if optional args is None
@@ -67,13 +247,24 @@ class Config:
                 else False
             tasks = args[0].tasks\
                 if args[0].tasks else 10
+            engine = args[0].engine\
+                if args[0].engine else "thread"
+            refresh = True\
+                if args[0].refresh\
+                else False
 
             return cls(
                 _in_file=args[0].in_file,
                 _out_file=out_file,
                 _out_pdf_dir=out_dir_path,
                 _log_level=log_level,
-                _n_tasks=tasks)
+                _n_tasks=tasks,
+                _engine=engine,
+                _refresh=refresh,
+                _shard_index=shard_index or 0,
+                _shard_count=shard_count or 1,
+                _work_queue=work_queue,
+                _worker_id=worker_id)
         return None
 
     @staticmethod
@@ -109,101 +300,851 @@ class PDFDownloader:
 
         self.config = conf
 
+        # Events from task callbacks and the signal handler.
+        # SimpleQueue.put is reentrant and safe in signal handlers
+        self.events: queue.SimpleQueue[AppEvent] = queue.SimpleQueue()
+        self.schedule_lock = threading.RLock()
+        self.downloads_in_flight: int = 0
+        self.files_to_download: int = 0
+
         Logger().SetLevel(self.config.log_level)
         signal.signal(signal.SIGINT, self.HandleSigint)
-        self.task_handler = ThreadPoolHandler(self.config.concurrent_tasks)
+        self.task_handler = self.CreateTaskHandler()
+        self.http_cache = HTTPCache(self.config.cache_file)
+        self.http_cache.Load()
+        self.download_options = self.CreateDownloadOptions()
 
-        # Read file task
+        # Read file task, reports are downloaded while the file is read.
+        # The bounded queue holds the reader back when it gets ahead
+        self.read_queue: queue.Queue[Report] = queue.Queue(
+            self.config.read_ahead)
+        self.dir_index = DirectoryIndex(self.config.out_dir_path,
+                                        self.config.index_file)
         self.read_task = FileReaderTask(
             self.config.in_file_path,
-            self.config.out_dir_path)
-        self.reports: list[Report] = []
+            self.config.out_dir_path,
+            _refresh=self.config.refresh,
+            _queue=self.read_queue,
+            _on_rows=self.ReadRowsCB,
+            _index=self.dir_index,
+            _shard_index=self.config.shard_index,
+            _shard_count=self.config.shard_count)
+        self.read_done: bool = False
+        self.input_pending: bool = True
+        self.reports_read: int = 0
+        self.manifest = Manifest(self.config.manifest_file)
+
+        # Result writer task
+        self.result_writer = ResultWriterTask(self.config.out_file)
 
         # Download task
         self.download_task_queue: deque[URLDownloaderTask] = deque()
-        self.report_queue: deque[Report] = deque()
+        self.report_queue = HostScheduler(self.config.max_per_host,
+                                          self.config.host_rate,
+                                          self.config.host_burst)
+        self.wakeup_timer: threading.Timer | None = None
+        self.wakeup_due = 0.0
+        self.retry_policy = RetryPolicy(self.config.max_attempts,
+                                        self.config.retry_base_s,
+                                        self.config.retry_max_s,
+                                        self.config.max_retry_after_s)
+        self.retry_queue = RetryQueue()
+        self.concurrency = ConcurrencyController(
+            self.config.concurrent_tasks, self.config.min_tasks,
+            self.config.max_tasks, self.config.adapt_interval_s,
+            self.config.adaptive_tasks)
+        self.url_dedup = URLDedup()
+        self.content_store = ContentStore(self.config.out_dir_path) \
+            if self.config.content_store else None
+
+        # Metrics of the run, written on an interval and when done
+        self.metrics = MetricsRegistry()
+        self.metrics_exporter = MetricsExporter(
+            self.metrics, self.config.metrics_file,
+            self.config.prometheus_file, self.config.metrics_interval)
+        # start of the wait in the scheduler by report id
+        self.queued_at: dict[int, float] = {}
+
+        # Rows shared with other workers, claimed while downloading
+        self.work_queue = WorkQueue(self.config.work_queue,
+                                    self.config.worker_id,
+                                    self.config.lease_s) \
+            if self.config.work_queue else None
+        self.claim_due = 0.0
+        self.renew_due = 0.0
 
         # Setup logger task
-        self.logger_task = LoggerTask(Logger().GetState(), write_log=True)
+        self.logger_task = LoggerTask(Logger().GetState(), write_log=True,
+                                      write_json=self.config.json_log)
+        if self.config.part:
+            # processes started together would share the log files
+            self.logger_task.log_file = PartPath(
+                self.logger_task.log_file, self.config.part)
+            self.logger_task.json_file = PartPath(
+                self.logger_task.json_file, self.config.part)
         self.task_handler.Start(self.logger_task)
 
         Logger().Info("----- PDF-Downloader -----")
         Logger().Info("Configuration:")
         Logger().Info(f"* Input file: \"{self.config.in_file_path}\"")
         Logger().Info(f"* Output dir: \"{self.config.out_dir_path}\"")
+        if self.config.shard_count > 1:
+            Logger().Info((f"* Shard {self.config.shard_index} of"
+                           f" {self.config.shard_count}, results in"
+                           f" \"{self.config.out_file}\""))
+        if self.config.work_queue:
+            Logger().Info((f"* Work queue: \"{self.config.work_queue}\","
+                           f" worker {self.config.worker_id}, results in"
+                           f" \"{self.config.out_file}\""))
         Logger().Info(
             f"* Number of concurrent tasks: {self.config.concurrent_tasks}")
+        if self.config.adaptive_tasks:
+            Logger().Info((f"* Adaptive concurrency: {self.config.min_tasks}"
+                           f" to {self.config.max_tasks} tasks"))
+        Logger().Info(f"* Download engine: {self.config.engine}")
+        Logger().Info(f"* PDF validation: {self.config.validation.name}")
+        Logger().Info(("* Validation workers: "
+                       f"{self.config.validation_workers}"))
+        Logger().Info((f"* Per host limits: {self.config.max_per_host}"
+                       f" downloads, {self.config.host_rate} requests/s"))
+        Logger().Info(f"* Max attempts: {self.config.max_attempts}")
+        if self.config.refresh:
+            Logger().Info("* Refreshing downloaded files")
 
-    def Run(self):
-        """Continuously run the application .
+    def CreateTaskHandler(self) -> ITaskHandler:
+        """Creates the task handler for the configured engine.
+
+        Returns:
+            ITaskHandler: thread pool or asyncio based handler
+        """
+        if self.config.engine == "async":
+            return AsyncioHandler(self.config.concurrent_tasks)
+        # Extra threads for the logger, reader and result writer tasks
+        tasks = self.config.max_tasks if self.config.adaptive_tasks \
+            else self.config.concurrent_tasks
+        return ThreadPoolHandler(tasks + 3)
+
+    def CreateDownloadOptions(self) -> DownloadOptions:
+        """Creates the download options shared by all downloader tasks.
+        Structure and full validation are run in a separate process pool
+        stage when validation workers are configured.
+
+        Returns:
+            DownloadOptions: options with the in-flight byte budget
+            for the configured engine
+        """
+        if self.config.engine == "async":
+            budget = AsyncByteBudget(self.config.max_inflight_bytes)
+        else:
+            budget = ByteBudget(self.config.max_inflight_bytes)
+        stage = None
+        if self.config.validation_workers > 0 and self.config.validation in \
+                (ValidationLevel.STRUCTURE, ValidationLevel.FULL):
+            stage = ValidationStage(PDFValidator(self.config.validation),
+                                    self.config.validation_workers,
+                                    self.config.validation_queue,
+                                    self.ValidationDoneCB)
+        return DownloadOptions(chunk_size=self.config.chunk_size,
+                               max_file_size=self.config.max_file_size,
+                               byte_budget=budget,
+                               validation=self.config.validation,
+                               validation_stage=stage,
+                               resume=self.config.resume,
+                               cache=self.http_cache)
+
+    def ValidationsPending(self) -> int:
+        """Returns the number of files waiting in the validation stage.
+
+        Returns:
+            int: pending validations, 0 without a validation stage
         """
+        stage = self.download_options.validation_stage
+        return stage.Pending() if stage else 0
 
+    def StopValidationStage(self):
+        """Stops the validation stage if one is running.
+        """
+        if self.download_options.validation_stage:
+            self.download_options.validation_stage.Stop()
+
+    def Run(self):
+        """Runs the application until shutdown.
+        Blocks on events posted by task callbacks and moves through the
+        application states on them, downloads are started directly from
+        the completion callbacks.
+        """
         self.status = ApplicationState.READ
-        self.task_handler.Start(self.read_task)
+        self.manifest.Open()
+        load = True
+        if self.work_queue is not None:
+            try:
+                self.work_queue.Open()
+                load = self.work_queue.Join(self.config.in_file_path)
+            except (sqlite3.Error, ValueError) as e:
+                Logger().Error(f"Exception: {e}, on work queue"
+                               f" \"{self.config.work_queue}\"")
+                self.Shutdown()
+                return
+        # rows of a work queue are resumed from the queue
+        resumed = None if self.work_queue is not None \
+            else self.manifest.Resume(self.config.in_file_path)
+        self.task_handler.Start(self.result_writer,
+                                on_done=self.WriteDoneCB)
+        self.status = ApplicationState.DOWNLOAD
+        if resumed is not None:
+            Logger().Info(("Resuming unfinished run from"
+                           f" \"{self.config.manifest_file}\""))
+            # results of the interrupted run are already written
+            self.read_done = True
+            self.input_pending = False
+            with self.schedule_lock:
+                for report in resumed:
+                    self.QueueReport(report)
+            Logger().Info((
+                f"{self.files_to_download}"
+                " documents to download"))
+            self.events.put(AppEvent.WAKEUP)
+        else:
+            self.manifest.Begin(self.config.in_file_path)
+            if load:
+                self.task_handler.Start(self.read_task,
+                                        on_done=self.ReadDoneCB)
+            else:
+                Logger().Info("Downloading rows of the work queue")
+                self.events.put(AppEvent.WAKEUP)
 
         while self.is_running:
-            match self.status:
-                case ApplicationState.READ:
-                    if self.task_handler.IsDone(self.read_task):
-                        Logger().Info(f"{self.read_task.name} task completed")
-
-                        # Get reports and queue them for download
-                        self.reports = self.read_task.ReadData()
-                        self.report_queue = \
-                            [item for item in self.reports
-                             if item.status == ReportState.INIT]
-                        self.files_to_download = len(self.report_queue)
-                        if self.files_to_download == 0:
-                            self.status = ApplicationState.SHUTDOWN
-                        else:
-                            Logger().Info((
-                                f"{self.files_to_download}"
-                                " documents to download"))
-                            self.status = ApplicationState.DOWNLOAD
-                case ApplicationState.DOWNLOAD:
-                    if self.RefillDownloadQueue():
-                        Logger().Info(
-                            (" All files have been downloaded to dir"
-                             f"{self.config.out_dir_path}"))
-                        Logger().Info((f"Writing {len(self.reports)}"
-                                       f" entries to {self.config.out_file}"))
-
-                        # Wrrite the results to output file
-                        task = FileWriterTask(self.reports,
-                                              self.config.out_file)
-                        self.task_handler.Start(task)
-                        self.status = ApplicationState.WRITE
-                case ApplicationState.WRITE:
-                    if self.FilesWritten():
-                        Logger().Info("All files have been written")
-                        self.status = ApplicationState.SHUTDOWN
-                case ApplicationState.SHUTDOWN:
-                    Logger().Info("Shutting down program")
-                    self.task_handler.StopAllTasks()
-                    self.is_running = False
-            time.sleep(0.1)
+            try:
+                event = self.events.get(timeout=self.manifest.interval)
+            except queue.Empty:
+                # write transitions waiting for a batch
+                self.manifest.Flush()
+                self.ExportMetrics()
+                if self.work_queue is not None:
+                    # claim rows added or released by other workers
+                    self.PollWorkQueue()
+                    self.HandleEvent(AppEvent.WAKEUP)
+                continue
+            self.HandleEvent(event)
+            if self.is_running:
+                self.PollWorkQueue()
+                self.ExportMetrics()
+
+    def HandleEvent(self, event: AppEvent):
+        """Moves the application to the next state on an event.
+
+        Args:
+            event (AppEvent): event posted by a callback
+        """
+        match (self.status, event):
+            case (_, AppEvent.SIGINT):
+                self.Interrupt()
+            case (ApplicationState.DOWNLOAD, AppEvent.READ_ROWS) | \
+                 (ApplicationState.DOWNLOAD, AppEvent.READ_DONE) | \
+                 (ApplicationState.DOWNLOAD, AppEvent.DOWNLOAD_DONE) | \
+                 (ApplicationState.DOWNLOAD, AppEvent.VALIDATION_DONE) | \
+                 (ApplicationState.DOWNLOAD, AppEvent.WAKEUP):
+                if self.RefillDownloadQueue():
+                    Logger().Info(
+                        (" All files have been downloaded to dir"
+                         f"{self.config.out_dir_path}"))
+                    self.manifest.Complete()
+                    self.WriteResults()
+            case (ApplicationState.STOPPING, AppEvent.DOWNLOAD_DONE):
+                if self.downloads_in_flight == 0:
+                    Logger().Info("All download tasks has stopped")
+                    # cancel files waiting for validation
+                    self.StopValidationStage()
+                    self.WriteResults()
+            case (ApplicationState.WRITE, AppEvent.WRITE_DONE) | \
+                 (ApplicationState.WRITE, AppEvent.READ_DONE):
+                if self.FilesWritten():
+                    Logger().Info("All files have been written")
+                    self.Shutdown()
+
+    def TakeReadReports(self):
+        """Moves reports from the reader queue to the scheduler, up to
+        read_ahead reports waiting for a download. Reports of hosts at
+        their max_per_host limit are not counted, so reading goes on past
+        a run of rows on one host, up to read_limit reports in the
+        scheduler.
+        Reports which need no download are written right away.
+        The schedule lock must be held.
+        """
+        if self.work_queue is not None:
+            self.TakeQueuedReports()
+            return
+        while self.input_pending \
+                and self.report_queue.Waiting() < self.config.read_ahead \
+                and len(self.report_queue) < self.config.read_limit:
+            try:
+                report = self.read_queue.get_nowait()
+            except queue.Empty:
+                if self.read_done:
+                    self.input_pending = False
+                    if self.read_task.status != TaskState.ERROR:
+                        # every row of the input file is in the manifest
+                        self.manifest.ReadDone()
+                    Logger().Info((
+                        f"{self.files_to_download} of {self.reports_read}"
+                        " documents to download"))
+                return
+            self.reports_read += 1
+            self.manifest.Record(report)
+            if report.status == ReportState.INIT:
+                self.QueueReport(report)
+                continue
+            if report.status == ReportState.DOWNLOADED:
+                self.CachedContent(report)
+                if self.config.dedup_urls:
+                    # later rows of the url link to the existing file
+                    self.url_dedup.Add(report)
+            self.WriteResult(report)
+
+    def TakeQueuedReports(self):
+        """Moves the reports read into the work queue, and claims reports
+        of the work queue while fewer than the download limit wait in the
+        scheduler. The work queue is polled again later if it has no
+        reports to claim while downloads are running.
+        The schedule lock must be held.
+        """
+        read_done = self.read_done
+        reports = []
+        while True:
+            try:
+                reports.append(self.read_queue.get_nowait())
+            except queue.Empty:
+                break
+        if reports:
+            self.reports_read += len(reports)
+            self.work_queue.Add(reports)
+            for report in reports:
+                if report.status == ReportState.INIT:
+                    continue
+                self.manifest.Record(report)
+                if report.status == ReportState.DOWNLOADED:
+                    self.CachedContent(report)
+                self.WriteResult(report)
+        if read_done and self.work_queue.loading:
+            if self.read_task.status == TaskState.ERROR:
+                # another worker tries again
+                self.work_queue.LoadFailed()
+            else:
+                self.work_queue.LoadDone()
+                Logger().Info((f"{self.reports_read} rows loaded into"
+                               " the work queue"))
+        now = time.monotonic()
+        idle = len(self.report_queue) == 0 \
+            and len(self.retry_queue) == 0 \
+            and self.downloads_in_flight == 0
+        if len(self.report_queue) >= self.concurrency.limit \
+                or (now < self.claim_due and not idle):
+            return
+        claimed = self.work_queue.Claim(self.config.claim_batch)
+        for report in claimed:
+            self.manifest.Record(report)
+            self.QueueReport(report)
+        if not claimed:
+            self.claim_due = now + self.manifest.interval
+            self.input_pending = not self.work_queue.Finished()
+
+    def PollWorkQueue(self):
+        """Renews the leases of the work queue on an interval of a third
+        of the lease, and takes over loading the input file if the
+        loading worker has stopped.
+        """
+        if self.work_queue is None \
+                or self.status != ApplicationState.DOWNLOAD:
+            return
+        now = time.monotonic()
+        if now < self.renew_due:
+            return
+        self.renew_due = now + self.config.lease_s / 3
+        with self.schedule_lock:
+            self.work_queue.Renew()
+            if self.read_task.status == TaskState.IDLE \
+                    and self.work_queue.TakeLoad():
+                Logger().Info("Taking over loading the input file")
+                self.task_handler.Start(self.read_task,
+                                        on_done=self.ReadDoneCB)
+
+    def CachedContent(self, report: Report):
+        """Sets the hash of a file downloaded by an earlier run from the
+        HTTP cache, if the cached size matches the file.
+
+        Args:
+            report (Report): report of an existing file
+        """
+        entry = self.http_cache.Get(report.url)
+        if entry and report.size and entry.size == report.size:
+            report.sha256 = entry.sha256
+
+    def QueueReport(self, report: Report):
+        """Queues a report for download.
+        A report of a url already downloaded, or being downloaded by
+        another report, gets a link to that file instead.
+        The schedule lock must be held.
+
+        Args:
+            report (Report): report to download
+        """
+        if self.config.dedup_urls:
+            primary = self.url_dedup.Add(report)
+            if primary is None:
+                # linked when the download of the url finishes
+                return
+            if primary is not report:
+                self.LinkDuplicate(primary, report)
+                return
+        self.report_queue.Add(report)
+        self.queued_at[report.id] = time.monotonic()
+        self.files_to_download += 1
+
+    def LinkDuplicates(self, primary: Report):
+        """Resolves the reports waiting for a finished download of their
+        url. Reports of an interrupted download are left unfinished.
+
+        Args:
+            primary (Report): report which changed state
+        """
+        if self.status != ApplicationState.DOWNLOAD \
+                or primary.status not in (ReportState.DOWNLOADED,
+                                          ReportState.NOT_DOWNLOADED):
+            return
+        for report in self.url_dedup.Followers(primary):
+            self.LinkDuplicate(primary, report)
+
+    def LinkDuplicate(self, primary: Report, report: Report):
+        """Gives a report the result of the download of the same url,
+        a hardlink to the downloaded file.
+
+        Args:
+            primary (Report): finished report of the url
+            report (Report): report of the same url
+        """
+        if primary.status == ReportState.DOWNLOADED:
+            try:
+                LinkFile(f"{self.config.out_dir_path}/{primary.name}.pdf",
+                         f"{self.config.out_dir_path}/{report.name}.pdf")
+                report.status = ReportState.DOWNLOADED
+                report.sha256, report.size = primary.sha256, primary.size
+                Logger().Trace("Linked %s.pdf to %s.pdf", report.name,
+                               primary.name)
+            except OSError as e:
+                Logger().Warn((f"Exception: {e}, when linking"
+                               f" {report.name}.pdf to {primary.name}.pdf"))
+                report.status = ReportState.NOT_DOWNLOADED
+        else:
+            report.status = ReportState.NOT_DOWNLOADED
+        self.manifest.Record(report)
+        self.IndexResult(report)
+        self.WriteResult(report)
 
     def RefillDownloadQueue(self) -> bool:
         """Refill the queue of files to download .
+        Called from the main thread and from download completion
+        callbacks. Hosts are served round-robin within their limits.
 
         Returns:
             bool: true if all files are downloaded
         """
-        while self.task_handler.ActiveTaskCount()\
-                < self.config.concurrent_tasks + 1:
-            if len(self.report_queue) == 0:
-                break
-            report = self.report_queue.pop()
-            report.status = ReportState.STAGED
-            task = URLDownloaderTask(report, self.config.out_dir_path)
-            downloaded_files = self.files_to_download - len(self.report_queue)
-            Logger().Info((f"Downloading: {report.name}.pdf"
-                           f" ({downloaded_files}/{self.files_to_download})"))
-            self.task_handler.Start(task)
-        if len(self.report_queue) == 0 \
-           and self.task_handler.ActiveTaskCount() == 1:
-            return True
-        return False
+        with self.schedule_lock:
+            for report in self.retry_queue.PopReady():
+                self.report_queue.Add(report)
+                self.queued_at[report.id] = time.monotonic()
+            if self.status == ApplicationState.DOWNLOAD:
+                self.TakeReadReports()
+            while self.status == ApplicationState.DOWNLOAD \
+                    and self.downloads_in_flight \
+                    < self.concurrency.limit:
+                report = self.report_queue.Next()
+                if report is None:
+                    self.ScheduleWakeup()
+                    break
+                # a download slot is free, read further ahead
+                self.TakeReadReports()
+                report.status = ReportState.STAGED
+                report.attempts += 1
+                self.RecordQueueWait(report)
+                self.manifest.Record(report)
+                if self.config.engine == "async":
+                    task = AsyncURLDownloaderTask(report,
+                                                  self.config.out_dir_path,
+                                                  self.download_options)
+                else:
+                    task = URLDownloaderTask(report,
+                                             self.config.out_dir_path,
+                                             self.download_options)
+                downloaded_files = self.files_to_download \
+                    - len(self.report_queue) - len(self.retry_queue)
+                Logger().Info((f"Downloading: {report.name}.pdf"
+                               f" ({downloaded_files}/"
+                               f"{self.files_to_download})"
+                               + (f" attempt {report.attempts}"
+                                  if report.attempts > 1 else "")))
+                self.downloads_in_flight += 1
+                if not self.task_handler.Start(task,
+                                               on_done=self.DownloadDoneCB):
+                    self.downloads_in_flight -= 1
+                    self.report_queue.Done(report)
+                    report.status = ReportState.NOT_DOWNLOADED
+                    self.manifest.Record(report)
+            return not self.input_pending \
+                and len(self.report_queue) == 0 \
+                and len(self.retry_queue) == 0 \
+                and self.downloads_in_flight == 0 \
+                and self.ValidationsPending() == 0
+
+    def RecordQueueWait(self, report: Report):
+        """Records the time a report waited in the scheduler before its
+        download started.
+        The schedule lock must be held.
+
+        Args:
+            report (Report): report being staged
+        """
+        queued = self.queued_at.pop(report.id, None)
+        if queued is not None:
+            self.metrics.Histogram(
+                "queue_wait_ms", "Time from queued to download start"
+            ).Record((time.monotonic() - queued) * 1000)
+
+    def RecordDownload(self, task: URLDownloaderTask, report: Report):
+        """Records the duration, time to first byte, size and result of
+        a finished download attempt.
+
+        Args:
+            task (URLDownloaderTask): completed downloader task
+            report (Report): report of the task
+        """
+        error = getattr(task, "error", None)
+        if error is not None:
+            status = "failed"
+        elif report.status in (ReportState.DOWNLOADED,
+                               ReportState.VALIDATING):
+            status = "downloaded" if getattr(task, "written", False) \
+                else "not_modified"
+        elif task.stopped:
+            # stopped by an interrupt
+            status = "cancelled"
+        else:
+            status = "failed"
+        self.metrics.Counter(
+            "downloads_total", "Download attempts by result",
+            status=status, error=self.ErrorLabel(error)).Inc()
+        ttfb_ms = getattr(task, "ttfb_ms", None)
+        if ttfb_ms is not None:
+            self.metrics.Histogram(
+                "ttfb_ms", "Time to the response head").Record(ttfb_ms)
+        if status != "downloaded":
+            return
+        duration_ms = task.timer.DurationMS()
+        size = getattr(task, "size", 0)
+        self.metrics.Histogram(
+            "download_duration_ms", "Time to download a file"
+        ).Record(duration_ms)
+        self.metrics.Histogram(
+            "file_size_bytes", "Size of the downloaded files").Record(size)
+        self.metrics.Counter(
+            "download_bytes_total", "Bytes of the downloaded files"
+        ).Inc(size)
+        if duration_ms > 0:
+            self.metrics.Histogram(
+                "download_throughput_bytes_per_second",
+                "Bytes per second of each download"
+            ).Record(size * 1000 / duration_ms)
+
+    @staticmethod
+    def ErrorLabel(error: Exception | None) -> str:
+        """Returns the error class label of a failed download.
+
+        Args:
+            error (Exception | None): exception raised by the download
+
+        Returns:
+            str: http_<status> for error responses, the exception type
+            otherwise, "" without an error
+        """
+        if error is None:
+            return ""
+        if isinstance(error, HTTPStatusError):
+            return f"http_{error.status}"
+        return type(error).__name__
+
+    def ExportMetrics(self, final: bool = False):
+        """Updates the gauges and writes the metrics files when the
+        interval has passed. The final export also logs a summary.
+
+        Args:
+            final (bool, optional): write regardless of the interval.
+            Defaults to False.
+        """
+        exporter = self.metrics_exporter
+        if not final and (not exporter.Enabled()
+                          or time.monotonic() < exporter.due):
+            return
+        with self.schedule_lock:
+            self.metrics.Gauge("downloads_in_flight",
+                               "Downloads running").Set(
+                self.downloads_in_flight)
+            self.metrics.Gauge("reports_queued",
+                               "Reports waiting for a download").Set(
+                len(self.report_queue) + len(self.retry_queue))
+            self.metrics.Gauge("concurrency_limit",
+                               "Concurrent downloads allowed").Set(
+                self.concurrency.limit)
+        total = self.metrics.Counter("download_bytes_total").Snapshot()
+        uptime = self.metrics.Uptime()
+        self.metrics.Gauge("throughput_bytes_per_second",
+                           "Bytes downloaded per second of the run").Set(
+            total / uptime if uptime > 0 else 0)
+        if final:
+            self.LogMetrics(total, uptime)
+        if not exporter.Enabled():
+            return
+        try:
+            exporter.Write()
+        except OSError as e:
+            Logger().Warn(f"Exception: {e}, when writing metrics")
+
+    def LogMetrics(self, total: float, uptime: float):
+        """Logs the throughput and latency of the run.
+
+        Args:
+            total (float): bytes downloaded
+            uptime (float): seconds of the run
+        """
+        duration = self.metrics.Histogram("download_duration_ms")
+        if duration.count == 0:
+            return
+        Logger().Info((f"Downloaded {duration.count} files,"
+                       f" {total / 1e6:.1f} MB in {uptime:.1f} s"
+                       f" ({total / 1e6 / uptime:.2f} MB/s),"
+                       f" p50 {duration.Quantile(0.5):.0f} ms,"
+                       f" p99 {duration.Quantile(0.99):.0f} ms per file"))
+
+    def ReadRowsCB(self):
+        """Called by the reader task when it puts reports in the empty
+        reader queue.
+        """
+        self.events.put(AppEvent.READ_ROWS)
+
+    def ReadDoneCB(self, task: FileReaderTask):
+        """Called by the task handler when the input file is read.
+        Reports may still be waiting in the reader queue.
+
+        Args:
+            task (FileReaderTask): completed reader task
+        """
+        Logger().Info(f"{task.name} task completed")
+        with self.schedule_lock:
+            self.read_done = True
+        self.events.put(AppEvent.READ_DONE)
+
+    def DownloadDoneCB(self, task: URLDownloaderTask):
+        """Called by the task handler when a download is done.
+        Starts the next download right away.
+
+        Args:
+            task (URLDownloaderTask): completed downloader task
+        """
+        with self.schedule_lock:
+            report = task.ReadData().reports[0]
+            self.AdaptConcurrency(task)
+            self.downloads_in_flight -= 1
+            self.report_queue.Done(report)
+            self.RecordDownload(task, report)
+            self.RetryDownload(task, report)
+            self.StoreContent(report)
+            self.manifest.Record(report)
+            self.IndexResult(report)
+            if not getattr(task, "validating", False):
+                self.WriteResult(report)
+            self.LinkDuplicates(report)
+            self.RefillDownloadQueue()
+        self.events.put(AppEvent.DOWNLOAD_DONE)
+
+    def AdaptConcurrency(self, task: URLDownloaderTask):
+        """Feeds a finished download to the concurrency controller and
+        logs changes of the number of concurrent downloads.
+        The schedule lock must be held.
+
+        Args:
+            task (URLDownloaderTask): completed downloader task
+        """
+        if self.status != ApplicationState.DOWNLOAD:
+            return
+        size = getattr(task, "size", 0) \
+            if getattr(task, "written", False) else 0
+        old = self.concurrency.limit
+        reason = self.concurrency.Record(
+            size, self.downloads_in_flight,
+            RetryPolicy.IsCongestion(getattr(task, "error", None)))
+        if reason is None:
+            return
+        Logger().Info((f"Concurrent downloads {old} -> "
+                       f"{self.concurrency.limit}: {reason}"))
+
+    def RetryDownload(self, task: URLDownloaderTask, report: Report):
+        """Queues a report failed by a transient error for a new attempt
+        after a backoff delay.
+
+        Args:
+            task (URLDownloaderTask): completed downloader task
+            report (Report): report of the task
+        """
+        error = getattr(task, "error", None)
+        if self.status != ApplicationState.DOWNLOAD \
+                or report.status != ReportState.NOT_DOWNLOADED \
+                or error is None:
+            return
+        if self.retry_policy.RetryAfterTooLong(error):
+            Logger().Warn((f"Giving up {report.name}.pdf, the server asks"
+                           " to retry after"
+                           f" {RetryPolicy.RetryAfterOf(error):.0f} s:"
+                           f" {error}"))
+            return
+        if not self.retry_policy.ShouldRetry(report, error):
+            return
+        delay = self.retry_policy.Delay(report.attempts, error)
+        Logger().Info((f"Retrying {report.name}.pdf in {delay:.1f} s"
+                       f" after attempt {report.attempts}: {error}"))
+        report.status = ReportState.INIT
+        self.retry_queue.Push(report, delay)
+
+    def ScheduleWakeup(self):
+        """Posts a wakeup event when a host waiting for its request
+        rate limit can start a download or a retry is due.
+        """
+        delays = [delay for delay in (self.report_queue.Delay(),
+                                      self.retry_queue.Delay())
+                  if delay is not None]
+        if not delays:
+            return
+        delay = min(delays)
+        due = time.monotonic() + delay
+        if self.wakeup_timer is not None:
+            if self.wakeup_due <= due:
+                return
+            # a retry is due before the pending wakeup
+            self.wakeup_timer.cancel()
+
+        def Wakeup():
+            with self.schedule_lock:
+                if self.wakeup_timer is timer:
+                    self.wakeup_timer = None
+            self.events.put(AppEvent.WAKEUP)
+        timer = threading.Timer(delay, Wakeup)
+        self.wakeup_timer = timer
+        self.wakeup_due = due
+        self.wakeup_timer.daemon = True
+        self.wakeup_timer.start()
+
+    def ValidationDoneCB(self, report: Report):
+        """Called by the validation stage when a file is validated.
+
+        Args:
+            report (Report): validated report
+        """
+        with self.schedule_lock:
+            self.StoreContent(report)
+            self.manifest.Record(report)
+            self.IndexResult(report)
+            self.WriteResult(report)
+            self.LinkDuplicates(report)
+        self.events.put(AppEvent.VALIDATION_DONE)
+
+    def WriteDoneCB(self, task: ResultWriterTask):
+        """Called by the task handler when the results are written.
+
+        Args:
+            task (ResultWriterTask): completed writer task
+        """
+        self.events.put(AppEvent.WRITE_DONE)
+
+    def WriteResult(self, report: Report):
+        """Queues a completed report for the output file.
+        Reports waiting for a download or validation are skipped.
+
+        Args:
+            report (Report): report which changed state
+        """
+        if report.status not in (ReportState.DOWNLOADED,
+                                 ReportState.NOT_DOWNLOADED):
+            return
+        self.metrics.Counter("results_total", "Rows written to the output",
+                             status=report.status.name.lower()).Inc()
+        if self.work_queue is not None:
+            self.work_queue.Complete(report)
+        self.result_writer.Put(report)
+
+    def StoreContent(self, report: Report):
+        """Moves a downloaded file into the content store, a file with
+        content already stored is replaced by a link to it.
+
+        Args:
+            report (Report): report which changed state
+        """
+        if self.content_store is None \
+                or report.status != ReportState.DOWNLOADED \
+                or not report.sha256:
+            return
+        try:
+            if self.content_store.Store(
+                    f"{self.config.out_dir_path}/{report.name}.pdf",
+                    report.sha256):
+                Logger().Trace("%s.pdf has the content of a stored file",
+                               report.name)
+        except OSError as e:
+            Logger().Warn((f"Exception: {e}, when storing"
+                           f" {report.name}.pdf"))
+
+    def IndexResult(self, report: Report):
+        """Updates the directory index with the file of a finished
+        download.
+
+        Args:
+            report (Report): report which changed state
+        """
+        if report.status in (ReportState.DOWNLOADED,
+                             ReportState.NOT_DOWNLOADED):
+            self.dir_index.Update(f"{report.name}.pdf")
+
+    def WriteResults(self):
+        """Writes the reports not written yet and ends the result writer.
+        With dedup_output the output file is then replaced by an export
+        of the manifest, one row per input row.
+        Rows of the input file not read when the run was interrupted are
+        not written.
+        """
+        self.http_cache.Save()
+        self.status = ApplicationState.WRITE
+        if self.work_queue is not None:
+            # rows of an interrupted run go to the other workers
+            self.work_queue.Release()
+        for report in self.manifest.Unfinished():
+            # downloads stopped by an interrupt
+            self.result_writer.Put(report)
+        Logger().Info(f"Writing results to {self.config.out_file}")
+        self.result_writer.Finish(self.manifest.Reports()
+                                  if self.config.dedup_output else None)
+
+    def Shutdown(self):
+        """Stops all tasks and ends the run.
+        """
+        Logger().Info("Shutting down program")
+        self.status = ApplicationState.SHUTDOWN
+        if self.wakeup_timer:
+            self.wakeup_timer.cancel()
+        self.StopValidationStage()
+        self.manifest.Close()
+        if self.work_queue is not None:
+            self.work_queue.Close()
+        self.ExportMetrics(final=True)
+        # last, the directory is not modified after the index is saved
+        self.dir_index.Save()
+        self.task_handler.StopAllTasks()
+        self.is_running = False
 
     def FilesWritten(self) -> bool:
         """Checks running tasks.
@@ -216,8 +1157,32 @@ class PDFDownloader:
             return True
         return False
 
+    def Interrupt(self):
+        """Stops the downloads and writes the results,
+        or shuts down if no downloads are running.
+        """
+        Logger().Info("Shutting down signal received")
+        if self.status == ApplicationState.DOWNLOAD:
+            # Cancel all downloads and write result
+            with self.schedule_lock:
+                self.status = ApplicationState.STOPPING
+                Logger().Info(f"Stopping running tasks: "
+                              f"{self.downloads_in_flight}")
+                # stop the reader and all running download tasks
+                running_tasks = list(self.task_handler.GetRunningTasks())
+                for task in running_tasks:
+                    if isinstance(task, (FileReaderTask,
+                                         URLDownloaderTask,
+                                         AsyncURLDownloaderTask)):
+                        self.task_handler.Stop(task)
+            # Results are written when the last download has stopped
+            self.events.put(AppEvent.DOWNLOAD_DONE)
+        elif self.status != ApplicationState.WRITE:
+            self.Shutdown()
+
     def HandleSigint(self, signum, frame):
         """Handle the SIGINT signal .
+        Only posts an event, the main loop stops the tasks.
 
         Args:
             signum (int): unused
@@ -226,34 +1191,8 @@ class PDFDownloader:
         # Only process first sig int
         if self.sig_int_received:
             return
-
-        Logger().Info("Shutting down signal received")
-        if self.status == ApplicationState.DOWNLOAD:
-            # Cancel all downloads and write result
-            Logger().Info(f"Stopping running tasks: "
-                          f"{self.task_handler.ActiveTaskCount()-1}")
-            # stop all running download tasks
-            running_tasks = self.task_handler.GetRunningTasks()
-            for task in running_tasks:
-                if not task.name == self.logger_task.name:
-                    self.task_handler.Stop(task)
-
-            # wait for tasks to stop/
-            # blocking is fine under shutdown sequence
-            while self.task_handler.ActiveTaskCount() > 1:
-                time.sleep(0.1)
-
-            Logger().Info("All download tasks has stopped")
-            Logger().Info((f"Writing {len(self.reports)}"
-                           f" entries to {self.config.out_file}"))
-            # Write results before stopping application
-            task = FileWriterTask(self.reports,
-                                  self.config.out_file)
-            self.task_handler.Start(task)
-            self.status = ApplicationState.WRITE
-        else:
-            self.status = ApplicationState.SHUTDOWN
         self.sig_int_received = True
+        self.events.put(AppEvent.SIGINT)
 
     def ParseArgs() -> Config:
         """Parses command line arguments.
@@ -286,23 +1225,133 @@ class PDFDownloader:
         parser.add_argument("-n", "--tasks",
                             nargs='?', type=int,
                             help="Number of tasks to run in parallel")
+        parser.add_argument("-e", "--engine",
+                            type=str, choices=["thread", "async"],
+                            help="Download engine, defaults to thread")
+        parser.add_argument("-r", "--refresh",
+                            action='store_true',
+                            help=("Download already downloaded files again"
+                                  " if changed on the server"))
         parser.add_argument("-v", "--verbose",
                             action='store_true',
                             help="Verbose output for program")
+        parser.add_argument("--shard-index",
+                            type=int,
+                            help=("Shard of the input rows to download,"
+                                  " 0 to shard count - 1"))
+        parser.add_argument("--shard-count",
+                            type=int,
+                            help=("Number of shards the input rows are"
+                                  " split into by BRnum"))
+        parser.add_argument("--work-queue",
+                            type=str,
+                            help=("Path to a SQLite work queue shared by"
+                                  " several workers on the same input"))
+        parser.add_argument("--worker-id",
+                            type=str,
+                            help=("Unique id of this worker of the work"
+                                  " queue, defaults to <host>-<pid>"))
         args = parser.parse_args()
         if args.config and (args.in_file or
            args.out_pdf_dir or
            args.out_file or
            args.tasks or
+           args.engine or
+           args.refresh or
            args.verbose):
             parser.error(
                     "Cannot use config file "
                     "together with the other arguments")
             return None
-        return Config.Create(args)
+        try:
+            return Config.Create(args)
+        except ValueError as e:
+            parser.error(str(e))
+
+    @staticmethod
+    def Merge(argv: list[str]) -> bool:
+        """Runs the merge command, which combines the output files of the
+        shards or the workers of a run into one file.
+
+        Args:
+            argv (list[str]): arguments after "merge"
+
+        Returns:
+            bool: true if the files are merged
+        """
+        parser = argparse.ArgumentParser(
+            prog="pdfdownloader.py merge",
+            description=("Merges the output files of the shards or the"
+                         " workers of a run into one file, ordered by"
+                         " input row"))
+        parser.add_argument("-o", "--out_file",
+                            type=str, required=True,
+                            help=("Merged output file, the shard files"
+                                  " <name>.shard-<i>-of-<n>.csv or the"
+                                  " worker files <name>.worker-<id>.csv"
+                                  " next to it are merged if none are"
+                                  " given"))
+        parser.add_argument("shard_files",
+                            nargs="*",
+                            help="Output files of the shards or workers")
+        parser.add_argument("--work-queue",
+                            type=str,
+                            help=("Writes the results held by the work"
+                                  " queue of a run instead, every row"
+                                  " finished by any worker"))
+        args = parser.parse_args(argv)
+        if args.work_queue:
+            return PDFDownloader.ExportWorkQueue(args.work_queue,
+                                                 args.out_file)
+        try:
+            paths = args.shard_files or ShardPaths(args.out_file) \
+                or WorkerPaths(args.out_file)
+            if not paths:
+                print(f"No shard or worker files of \"{args.out_file}\""
+                      " found")
+                return False
+            rows = MergeResults(paths, args.out_file)
+        except (OSError, ValueError) as e:
+            print(f"Merge failed: {e}")
+            return False
+        print(f"Merged {rows} rows of {len(paths)} files"
+              f" into \"{args.out_file}\"")
+        return True
+
+    @staticmethod
+    def ExportWorkQueue(path: str, out_file: str) -> bool:
+        """Writes the finished rows of a work queue to an output file,
+        ordered by input row.
+
+        Args:
+            path (str): path to the work queue database
+            out_file (str): output file
+
+        Returns:
+            bool: true if the rows are written
+        """
+        if not os.path.isfile(path):
+            print(f"No work queue \"{path}\" found")
+            return False
+        work_queue = WorkQueue(path, "merge")
+        try:
+            work_queue.Open()
+            counts = work_queue.Counts()
+            ResultWriterTask(out_file).Rewrite(work_queue.Results())
+        except (OSError, sqlite3.Error) as e:
+            print(f"Merge failed: {e}")
+            return False
+        finally:
+            work_queue.Close()
+        done = counts.get("DONE", 0)
+        print(f"Wrote {done} of {sum(counts.values())} rows of the work"
+              f" queue into \"{out_file}\"")
+        return True
 
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["merge"]:
+        sys.exit(0 if PDFDownloader.Merge(sys.argv[2:]) else 1)
     config = PDFDownloader.ParseArgs()
     if config:
         app = PDFDownloader(config)
@@ -0,0 +1,218 @@
+import asyncio
+import heapq
+import http.client
+import itertools
+import random
+import socket
+import ssl
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from enum import Enum
+from connection_pool import HTTPStatusError
+from state import Report
+
+
+class ErrorClass(Enum):
+    ''' Classification of download failures
+    '''
+    TRANSIENT = 0,
+    PERMANENT = 1
+
+
+class RetryPolicy:
+    """Decides whether a failed download is retried and when.
+    Transient failures are retried with jittered exponential backoff,
+    honoring Retry-After, until max_attempts downloads are made.
+    A server asking to wait longer than max_retry_after is not retried.
+    """
+    transient_status: tuple[int, ...] = (408, 425, 429, 500, 502, 503, 504)
+    transient_errors: tuple[type, ...] = (
+        ConnectionError, TimeoutError, asyncio.TimeoutError,
+        asyncio.IncompleteReadError, http.client.IncompleteRead,
+        ssl.SSLEOFError)
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0,
+                 max_delay: float = 60.0, max_retry_after: float = 600.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def Classify(self, error: Exception) -> ErrorClass:
+        """Classifies a download error.
+
+        Args:
+            error (Exception): exception raised by the download
+
+        Returns:
+            ErrorClass: TRANSIENT if a new attempt may succeed
+        """
+        if isinstance(error, HTTPStatusError):
+            if error.status in self.transient_status:
+                return ErrorClass.TRANSIENT
+            return ErrorClass.PERMANENT
+        if isinstance(error, socket.gaierror):
+            if error.errno == socket.EAI_AGAIN:
+                return ErrorClass.TRANSIENT
+            return ErrorClass.PERMANENT
+        if isinstance(error, self.transient_errors):
+            return ErrorClass.TRANSIENT
+        return ErrorClass.PERMANENT
+
+    @staticmethod
+    def IsCongestion(error: Exception | None) -> bool:
+        """Checks whether an error signals an overloaded server or
+        network: timeouts, 429 and 5xx responses.
+
+        Args:
+            error (Exception | None): exception raised by the download
+
+        Returns:
+            bool: true if fewer concurrent downloads may help
+        """
+        if isinstance(error, HTTPStatusError):
+            return error.status == 429 or error.status >= 500
+        return isinstance(error, (TimeoutError, asyncio.TimeoutError))
+
+    def ShouldRetry(self, report: Report, error: Exception) -> bool:
+        """Checks whether the report should be downloaded again.
+
+        Args:
+            report (Report): failed report
+            error (Exception): exception raised by the download
+
+        Returns:
+            bool: true for transient errors with attempts left, unless
+            the server asks to wait longer than max_retry_after
+        """
+        if self.RetryAfterTooLong(error):
+            return False
+        return report.attempts < self.max_attempts \
+            and self.Classify(error) == ErrorClass.TRANSIENT
+
+    def RetryAfterTooLong(self, error: Exception) -> bool:
+        """Checks whether the server asks to wait longer than
+        max_retry_after before the next attempt.
+
+        Args:
+            error (Exception): exception raised by the download
+
+        Returns:
+            bool: true if the Retry-After is too long
+        """
+        retry_after = self.RetryAfterOf(error)
+        return retry_after is not None and retry_after > self.max_retry_after
+
+    def Delay(self, attempt: int, error: Exception) -> float:
+        """Returns the seconds to wait before the next attempt.
+        Full jitter exponential backoff capped at max_delay, at least
+        the Retry-After the server asked for, which is not capped.
+
+        Args:
+            attempt (int): attempts made so far
+            error (Exception): exception raised by the download
+
+        Returns:
+            float: delay in seconds
+        """
+        backoff = min(self.max_delay,
+                      self.base_delay * 2 ** max(0, attempt - 1))
+        delay = random.uniform(0, backoff)
+        retry_after = self.RetryAfterOf(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    @staticmethod
+    def RetryAfterOf(error: Exception) -> float | None:
+        """Returns the Retry-After of an HTTP error response.
+
+        Args:
+            error (Exception): exception raised by the download
+
+        Returns:
+            float | None: seconds to wait, None if not given
+        """
+        if not isinstance(error, HTTPStatusError):
+            return None
+        return RetryPolicy.RetryAfter(error.headers.get("retry-after"))
+
+    @staticmethod
+    def RetryAfter(value: str | None) -> float | None:
+        """Parses a Retry-After header.
+
+        Args:
+            value (str | None): delay in seconds or an HTTP date
+
+        Returns:
+            float | None: seconds to wait, None if missing or invalid
+        """
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryQueue:
+    """Reports waiting for their next attempt, ordered by due time.
+    Waiting reports do not hold a download slot.
+    Not thread safe, guard with a lock when used from callbacks.
+    """
+    def __init__(self):
+        self.heap: list[tuple[float, int, Report]] = []
+        self.counter = itertools.count()
+
+    def Push(self, report: Report, delay: float,
+             now: float | None = None):
+        """Queues a report for a new attempt after delay seconds.
+
+        Args:
+            report (Report): failed report
+            delay (float): seconds to wait
+            now (float | None, optional): monotonic time in seconds
+        """
+        now = time.monotonic() if now is None else now
+        heapq.heappush(self.heap, (now + delay, next(self.counter), report))
+
+    def PopReady(self, now: float | None = None) -> list[Report]:
+        """Removes and returns the reports which are due.
+
+        Args:
+            now (float | None, optional): monotonic time in seconds
+
+        Returns:
+            list[Report]: reports to download again
+        """
+        now = time.monotonic() if now is None else now
+        ready = []
+        while self.heap and self.heap[0][0] <= now:
+            ready.append(heapq.heappop(self.heap)[2])
+        return ready
+
+    def Delay(self, now: float | None = None) -> float | None:
+        """Returns the seconds until the next report is due.
+
+        Args:
+            now (float | None, optional): monotonic time in seconds
+
+        Returns:
+            float | None: None if no reports are waiting
+        """
+        if not self.heap:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.heap[0][0] - now)
+
+    def __len__(self) -> int:
+        """Returns the number of waiting reports.
+        """
+        return len(self.heap)
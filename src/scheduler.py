@@ -0,0 +1,306 @@
+import time
+import urllib.parse
+from collections import deque
+from state import Report
+
+
+class TokenBucket:
+    """Token bucket limiting the request rate to a host.
+    """
+    def __init__(self, rate: float, burst: int = 1,
+                 now: float | None = None):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.stamp = time.monotonic() if now is None else now
+
+    def Refill(self, now: float):
+        """Adds the tokens earned since the last refill.
+
+        Args:
+            now (float): monotonic time in seconds
+        """
+        self.tokens = min(self.burst,
+                          self.tokens
+                          + max(0.0, now - self.stamp) * self.rate)
+        self.stamp = max(self.stamp, now)
+
+    def Delay(self, now: float) -> float:
+        """Returns the seconds until a token is available.
+
+        Args:
+            now (float): monotonic time in seconds
+
+        Returns:
+            float: 0 if a token is available
+        """
+        self.Refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def Take(self):
+        """Takes a token, Delay must have returned 0.
+        """
+        self.tokens -= 1
+
+
+class HostScheduler:
+    """Schedules reports round-robin across hosts, so a run of rows on one
+    host can not take every download slot.
+    Each host is limited to max_per_host downloads in flight and,
+    if rate_per_host is set, to that many requests per second.
+    Not thread safe, guard with a lock when used from callbacks.
+    """
+    def __init__(self, max_per_host: int, rate_per_host: float = 0,
+                 burst: int = 1):
+        self.max_per_host = max_per_host
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.queues: dict[str, deque[Report]] = {}
+        self.ring: deque[str] = deque()
+        self.in_flight: dict[str, int] = {}
+        self.buckets: dict[str, TokenBucket] = {}
+        self.queued = 0
+        # queued reports of hosts at max_per_host
+        self.blocked = 0
+
+    @staticmethod
+    def Host(report: Report) -> str:
+        """Returns the host of the report url.
+
+        Args:
+            report (Report): report to download
+
+        Returns:
+            str: lower case host name, empty if the url has none
+        """
+        try:
+            return urllib.parse.urlsplit(report.url).hostname or ""
+        except ValueError:
+            return ""
+
+    def Add(self, report: Report):
+        """Queues a report for download.
+
+        Args:
+            report (Report): report to download
+        """
+        host = self.Host(report)
+        if host not in self.queues:
+            self.queues[host] = deque()
+            self.ring.append(host)
+        self.queues[host].append(report)
+        self.queued += 1
+        if self.AtCap(host):
+            self.blocked += 1
+
+    def Next(self, now: float | None = None) -> Report | None:
+        """Returns the next report of the next host, in round-robin order,
+        which is below its in-flight cap and has a rate token.
+
+        Args:
+            now (float | None, optional): monotonic time in seconds
+
+        Returns:
+            Report | None: report to download, None if no host is ready
+        """
+        now = time.monotonic() if now is None else now
+        for _ in range(len(self.ring)):
+            host = self.ring[0]
+            self.ring.rotate(-1)
+            if not self.Ready(host, now):
+                continue
+            report = self.queues[host].popleft()
+            if not self.queues[host]:
+                del self.queues[host]
+                self.ring.remove(host)
+            if self.rate_per_host > 0:
+                self.buckets[host].Take()
+            self.in_flight[host] = self.in_flight.get(host, 0) + 1
+            self.queued -= 1
+            if self.AtCap(host):
+                self.blocked += len(self.queues.get(host, ()))
+            return report
+        return None
+
+    def Ready(self, host: str, now: float) -> bool:
+        """Checks whether a download to the host can start.
+
+        Args:
+            host (str): host name
+            now (float): monotonic time in seconds
+
+        Returns:
+            bool: true if below the cap and a rate token is available
+        """
+        if self.AtCap(host):
+            return False
+        if self.rate_per_host > 0:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate_per_host,
+                                                 self.burst, now)
+            bucket = self.buckets[host]
+            return bucket.Delay(now) == 0
+        return True
+
+    def Done(self, report: Report):
+        """Marks a download of the report as finished.
+
+        Args:
+            report (Report): report returned by Next
+        """
+        host = self.Host(report)
+        if self.AtCap(host):
+            self.blocked -= len(self.queues.get(host, ()))
+        self.in_flight[host] -= 1
+        if self.in_flight[host] == 0:
+            del self.in_flight[host]
+
+    def AtCap(self, host: str) -> bool:
+        """Checks whether the host has max_per_host downloads in flight.
+
+        Args:
+            host (str): host name
+
+        Returns:
+            bool: true if no download to the host can start
+        """
+        return self.max_per_host > 0 \
+            and self.in_flight.get(host, 0) >= self.max_per_host
+
+    def Waiting(self) -> int:
+        """Returns the number of queued reports of hosts below their
+        max_per_host limit.
+        """
+        return self.queued - self.blocked
+
+    def Delay(self, now: float | None = None) -> float | None:
+        """Returns the seconds until a host only waiting for a rate token
+        can start a download.
+
+        Args:
+            now (float | None, optional): monotonic time in seconds
+
+        Returns:
+            float | None: None if no host is waiting for a token
+        """
+        if self.rate_per_host <= 0:
+            return None
+        now = time.monotonic() if now is None else now
+        delays = [self.buckets[host].Delay(now) for host in self.ring
+                  if host in self.buckets and not self.AtCap(host)]
+        return min(delays) if delays else None
+
+    def __len__(self) -> int:
+        """Returns the number of queued reports.
+        """
+        return self.queued
+
+
+class ConcurrencyController:
+    """Tunes the number of concurrent downloads during a run, AIMD style.
+    Downloads are counted in windows of interval seconds. After a window
+    in which every slot was in use the limit grows by one if the
+    throughput rose, and steps back by one if it fell after a growth.
+    Timeouts and throttling responses halve the limit right away, once
+    per window. The limit stays within min_tasks and max_tasks.
+    A controller which is not adaptive keeps the limit it starts with.
+    Not thread safe, guard with a lock when used from callbacks.
+    """
+    # relative change of the throughput taken as a rise or fall
+    tolerance: float = 0.05
+
+    def __init__(self, tasks: int, min_tasks: int = 1, max_tasks: int = 0,
+                 interval: float = 2.0, adaptive: bool = True,
+                 now: float | None = None):
+        """Constructs the controller.
+
+        Args:
+            tasks (int): starting limit
+            min_tasks (int, optional): lowest limit. Defaults to 1.
+            max_tasks (int, optional): highest limit, 0 = 4 * tasks.
+            Defaults to 0.
+            interval (float, optional): seconds of a window.
+            Defaults to 2.0.
+            adaptive (bool, optional): false keeps the limit.
+            Defaults to True.
+            now (float | None, optional): monotonic time in seconds
+        """
+        self.adaptive = adaptive
+        self.min_tasks = max(1, min_tasks)
+        self.max_tasks = max(self.min_tasks, max_tasks or 4 * tasks)
+        self.limit = min(max(tasks, self.min_tasks), self.max_tasks) \
+            if adaptive else tasks
+        self.interval = interval
+        self.window_start = time.monotonic() if now is None else now
+        self.window_bytes = 0
+        self.window_files = 0
+        self.saturated = False
+        self.congested = False
+        self.last_throughput: float | None = None
+        self.grew = False
+
+    def Record(self, size: int, in_flight: int, congested: bool = False,
+               now: float | None = None) -> str | None:
+        """Records a finished download and adjusts the limit.
+
+        Args:
+            size (int): bytes downloaded
+            in_flight (int): downloads running when it finished,
+            including itself
+            congested (bool, optional): true for timeouts and throttling
+            responses. Defaults to False.
+            now (float | None, optional): monotonic time in seconds
+
+        Returns:
+            str | None: reason of the adjustment, None if the limit
+            is unchanged
+        """
+        if not self.adaptive:
+            return None
+        now = time.monotonic() if now is None else now
+        self.window_bytes += size
+        self.window_files += 1
+        self.saturated |= in_flight >= self.limit
+        if congested and not self.congested:
+            # the downloads running now started under the old limit
+            self.congested = True
+            self.last_throughput = None
+            self.grew = False
+            return self.Set(self.limit // 2, "timeouts or throttling")
+        if now - self.window_start < self.interval:
+            return None
+        throughput = self.window_bytes / (now - self.window_start)
+        saturated = self.saturated and not self.congested
+        self.window_start = now
+        self.window_bytes = self.window_files = 0
+        self.saturated = self.congested = False
+        if not saturated:
+            # downloads were limited by the input or the hosts
+            return None
+        last, self.last_throughput = self.last_throughput, throughput
+        mb = f"{throughput / 1e6:.2f} MB/s"
+        if last is None or throughput > last * (1 + self.tolerance):
+            self.grew = True
+            return self.Set(self.limit + 1, f"throughput rose to {mb}")
+        if self.grew and throughput < last * (1 - self.tolerance):
+            self.grew = False
+            return self.Set(self.limit - 1, f"throughput fell to {mb}")
+        return None
+
+    def Set(self, limit: int, reason: str) -> str | None:
+        """Sets the limit within the bounds.
+
+        Args:
+            limit (int): new limit
+            reason (str): reason of the change
+
+        Returns:
+            str | None: the reason, None if the limit is unchanged
+        """
+        limit = min(max(limit, self.min_tasks), self.max_tasks)
+        if limit == self.limit:
+            return None
+        self.limit = limit
+        return reason
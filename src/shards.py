@@ -0,0 +1,186 @@
+import csv
+import glob
+import os
+import re
+import zlib
+
+
+def ShardOf(name: object, count: int) -> int:
+    """Returns the shard of an input row, the same in every process and
+    on every machine.
+
+    Args:
+        name (object): BRnum of the row
+        count (int): number of shards
+
+    Returns:
+        int: shard index in [0, count)
+    """
+    return zlib.crc32(str(name).encode("utf-8")) % count
+
+
+def ShardPath(path: str, index: int, count: int) -> str:
+    """Returns the path of a file of one shard,
+    e.g. data/output.csv -> data/output.shard-0-of-4.csv.
+
+    Args:
+        path (str): path of the file of a run without shards
+        index (int): shard index
+        count (int): number of shards
+
+    Returns:
+        str: path of the shard file
+    """
+    return PartPath(path, ShardPart(index, count))
+
+
+def ShardPart(index: int, count: int) -> str:
+    """Returns the part name of the files of a shard.
+
+    Args:
+        index (int): shard index
+        count (int): number of shards
+
+    Returns:
+        str: part name, e.g. shard-0-of-4
+    """
+    return f"shard-{index}-of-{count}"
+
+
+def WorkerPart(worker_id: str) -> str:
+    """Returns the part name of the files of a worker of a work queue.
+
+    Args:
+        worker_id (str): id of the worker
+
+    Returns:
+        str: part name, e.g. worker-host-1234
+    """
+    return "worker-" + re.sub(r"[^\w.-]", "_", worker_id)
+
+
+def PartPath(path: str, part: str) -> str:
+    """Returns the path of a file of one part of a run, a shard or a
+    worker, e.g. data/output.csv -> data/output.worker-host-1234.csv.
+
+    Args:
+        path (str): path of the file of a run in one process
+        part (str): part name
+
+    Returns:
+        str: path of the file of the part
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}.{part}{ext}"
+
+
+def ShardPaths(path: str) -> list[str]:
+    """Finds the shard files of a file.
+
+    Args:
+        path (str): path of the file of a run without shards
+
+    Raises:
+        ValueError: if shards of different counts are found or some
+        shards are missing
+
+    Returns:
+        list[str]: shard files ordered by index, empty if none are found
+    """
+    root, ext = os.path.splitext(path)
+    pattern = re.compile(re.escape(root) + r"\.shard-(\d+)-of-(\d+)"
+                         + re.escape(ext) + "$")
+    shards = {}
+    for shard_path in glob.glob(f"{glob.escape(root)}.shard-*-of-*{ext}"):
+        match = pattern.match(shard_path)
+        if match:
+            shards[(int(match.group(2)), int(match.group(1)))] = shard_path
+    counts = {count for count, _ in shards}
+    if len(counts) > 1:
+        raise ValueError(f"Shards of different runs: {sorted(counts)}")
+    if not shards:
+        return []
+    count = counts.pop()
+    missing = [i for i in range(count) if (count, i) not in shards]
+    if missing:
+        raise ValueError(f"Missing shards {missing} of {count}")
+    return [shards[(count, i)] for i in range(count)]
+
+
+def WorkerPaths(path: str) -> list[str]:
+    """Finds the files of the workers of a work queue run of a file.
+
+    Args:
+        path (str): path of the file of a run in one process
+
+    Returns:
+        list[str]: worker files ordered by name, empty if none are found
+    """
+    root, ext = os.path.splitext(path)
+    return sorted(glob.glob(f"{glob.escape(root)}.worker-*{ext}"))
+
+
+def MergeResults(paths: list[str], out_file: str) -> int:
+    """Merges the output files of the shards or workers of a run into one
+    file, ordered by input row. A row written more than once in a file,
+    by a resumed run, is taken from its last line. A row found in more
+    than one file, of a worker whose lease expired, is taken from the
+    file with the best result.
+
+    Args:
+        paths (list[str]): output files of the shards or workers
+        out_file (str): merged output file
+
+    Raises:
+        ValueError: if the files have different headers
+
+    Returns:
+        int: rows written
+    """
+    header = None
+    rows: dict[str, list[str]] = {}
+    for path in paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            file_header = next(reader, None)
+            if file_header is None:
+                continue
+            if header is None:
+                header = file_header
+            elif file_header != header:
+                raise ValueError(f"Header of \"{path}\" differs")
+            row_col = header.index("Row")
+            status_col = header.index("Status")
+            file_rows = {row[row_col]: row for row in reader if row}
+        for key, row in file_rows.items():
+            if key not in rows or StatusRank(row[status_col]) \
+                    >= StatusRank(rows[key][status_col]):
+                rows[key] = row
+    if header is None:
+        raise ValueError("No rows to merge")
+    dir_path = os.path.dirname(out_file)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+    tmp_path = out_file + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(sorted(rows.values(),
+                                key=lambda row: RowKey(row[row_col])))
+    os.replace(tmp_path, out_file)
+    return len(rows)
+
+
+def StatusRank(status: str) -> int:
+    """Ranks the results of a row, downloaded first.
+    """
+    return {"DOWNLOADED": 2, "NOT_DOWNLOADED": 1}.get(status, 0)
+
+
+def RowKey(value: str) -> tuple[int, int | str]:
+    """Sorts numeric row indexes numerically, before any other value.
+    """
+    try:
+        return 0, int(value)
+    except ValueError:
+        return 1, value
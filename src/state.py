@@ -49,7 +49,8 @@ class ReportState(Enum):
     STAGED = 1,
     DOWNLOADED = 2,
     NOT_DOWNLOADED = 3,
-    DONE = 4
+    DONE = 4,
+    VALIDATING = 5
 
 
 @dataclass
@@ -58,6 +59,9 @@ class Report:
     id: int
     url: str
     status: ReportState
+    attempts: int = 0
+    sha256: str = ""
+    size: int = 0
 
 
 @dataclass
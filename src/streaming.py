@@ -0,0 +1,124 @@
+import asyncio
+import threading
+from collections import deque
+
+
+class FileTooLargeError(Exception):
+    """Raised when a download exceeds the maximum file size.
+    """
+    def __init__(self, url: str, size: int, max_size: int):
+        super().__init__(f"File size {size} exceeds limit {max_size} bytes")
+        self.url = url
+        self.size = size
+        self.max_size = max_size
+
+
+class BufferPool:
+    """Pool of reusable fixed-size chunk buffers shared between
+    downloader tasks, so streaming does not allocate per chunk.
+    """
+    def __init__(self, chunk_size: int, max_buffers: int = 64):
+        self.chunk_size = chunk_size
+        self.max_buffers = max_buffers
+        self.lock = threading.Lock()
+        self.buffers: deque[bytearray] = deque()
+
+    def Take(self) -> bytearray:
+        """Takes a buffer from the pool or allocates a new one.
+
+        Returns:
+            bytearray: buffer of chunk_size bytes
+        """
+        with self.lock:
+            if self.buffers:
+                return self.buffers.pop()
+        return bytearray(self.chunk_size)
+
+    def Give(self, buffer: bytearray):
+        """Returns a buffer to the pool.
+
+        Args:
+            buffer (bytearray): buffer taken from the pool
+        """
+        with self.lock:
+            if len(self.buffers) < self.max_buffers:
+                self.buffers.append(buffer)
+
+
+class ByteBudget:
+    """Global budget of in-flight bytes shared by threaded downloader tasks.
+    A task reserves the size of a chunk before reading it from the network
+    and releases it once the chunk is written to disk.
+    A limit of 0 disables the budget.
+    """
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def Acquire(self, n: int):
+        """Blocks until n bytes are available in the budget.
+
+        Args:
+            n (int): bytes to reserve
+        """
+        if self.limit <= 0:
+            return
+        n = min(n, self.limit)
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.in_flight + n <= self.limit)
+            self.in_flight += n
+
+    def Release(self, n: int):
+        """Releases n bytes to the budget.
+
+        Args:
+            n (int): bytes to release
+        """
+        if self.limit <= 0:
+            return
+        n = min(n, self.limit)
+        with self.condition:
+            self.in_flight -= n
+            self.condition.notify_all()
+
+
+class AsyncByteBudget:
+    """Global budget of in-flight bytes shared by asyncio downloader tasks.
+    Same as ByteBudget, but waits without blocking the event loop.
+    Must only be used from the event loop running the downloads.
+    """
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.condition: asyncio.Condition | None = None
+
+    async def Acquire(self, n: int):
+        """Waits until n bytes are available in the budget.
+
+        Args:
+            n (int): bytes to reserve
+        """
+        if self.limit <= 0:
+            return
+        n = min(n, self.limit)
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        async with self.condition:
+            await self.condition.wait_for(
+                lambda: self.in_flight + n <= self.limit)
+            self.in_flight += n
+
+    async def Release(self, n: int):
+        """Releases n bytes to the budget.
+
+        Args:
+            n (int): bytes to release
+        """
+        if self.limit <= 0:
+            return
+        n = min(n, self.limit)
+        async with self.condition:
+            self.in_flight -= n
+            self.condition.notify_all()
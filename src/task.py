@@ -1,15 +1,31 @@
 from enum import Enum
 from abc import ABC, abstractmethod
-import pandas as pd
-from PyPDF2 import PdfReader
-import urllib.request
-import certifi
-import ssl
+import asyncio
+import openpyxl
 import csv
+import hashlib
+import http.client
 import os
+import queue
+import sys
+import threading
 import time
+from collections import deque
+import json
 from datetime import datetime
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator
 from timer import Timer
+from async_http import AsyncHTTPClient
+from connection_pool import ConnectionPool, HTTPStatusError
+from partial_file import PartialFile
+from http_cache import HTTPCache
+from dir_index import DirectoryIndex
+from shards import ShardOf
+from streaming import BufferPool, ByteBudget, AsyncByteBudget
+from streaming import FileTooLargeError
+from pdf_validator import PDFEnds, PDFValidator, ValidationLevel
+from validation_stage import ValidationStage
 from logger import Logger, LogEntry, LogLevel, bcolors, LogSyncState
 from logger import LogSyncData
 from state import ReportSyncState
@@ -32,6 +48,8 @@ class ITask(ABC):
         self.continious: bool = _continious
         self.name: str = _name
         self.timer: Timer = Timer()
+        # set when the task handler stops the task before it completes
+        self.stopped: bool = False
 
     @abstractmethod
     def Start(self):
@@ -58,55 +76,167 @@ class ITask(ABC):
         pass
 
 
-class FileWriterTask(ITask):
-    ''' File writer task for writing output csv file with download results.
+class IAsyncTask(ITask):
+    ''' Task interface for tasks running as a coroutine on an event loop.
+    '''
+    def Start(self):
+        ''' Runs the task to completion on its own event loop.
+        Allows async tasks to run on handlers without an event loop.
+        '''
+        asyncio.run(self.StartAsync())
+
+    @abstractmethod
+    async def StartAsync(self):
+        ''' Starts the task (coroutine entry point).
+        Virtual function to be overridden.
+        '''
+        pass
+
+
+class ResultWriterTask(ITask):
+    ''' Result writer task appending reports to the output csv file
+    while the downloads run. Rows are taken from a queue and flushed in
+    batches, at most flush_interval seconds after they are queued.
     Implements ITask.
     '''
-    def __init__(self, _reports: list[Report], _file_path: str,
-                 _name: str = "FileWriter"):
-        super().__init__(_name, False)
+    header: list[str] = ["BRnum", "Status", "Row", "URL", "Attempts",
+                         "Hash", "Size"]
+
+    def __init__(self, _file_path: str, _flush_interval: float = 1.0,
+                 _batch_size: int = 256, _name: str = "ResultWriter"):
+        super().__init__(_name, True)
         self.file_path = _file_path
-        self.reports = _reports
+        self.flush_interval = _flush_interval
+        self.batch_size = _batch_size
+        self.rows: queue.SimpleQueue[list | None] = queue.SimpleQueue()
+        self.final_reports: Iterable[Report] | None = None
+        self.rows_written = 0
+
+    def Put(self, report: Report):
+        """Queues a report to be written.
+
+        Args:
+            report (Report): completed report
+        """
+        self.rows.put(self.Row(report))
+
+    def Finish(self, final_reports: Iterable[Report] | None = None):
+        """Ends the task once the queued rows are written.
+
+        Args:
+            final_reports (Iterable[Report] | None, optional): replace
+            the file with these reports in input order when done.
+            Defaults to None.
+        """
+        self.final_reports = final_reports
+        self.rows.put(None)
 
     def Start(self):
-        """Starts the task.
+        """Writes queued rows until Finish or Stop is called.
         """
         self.status = TaskState.RUNNING
         self.timer.Start()
         try:
-            with open(self.file_path, 'a+', encoding="utf-8") as f:
+            dir_path = os.path.dirname(self.file_path)
+            if dir_path:
+                os.makedirs(dir_path, exist_ok=True)
+            with open(self.file_path, 'a', newline="",
+                      encoding="utf-8") as f:
                 f_writer = csv.writer(f)
-                f.seek(0)
-                if not f.read(1):
-                    # file is empty
-                    f_writer.writerow(["BRnum", "Status", "Row", "URL"])
-                    Logger().Trace("Filefile header written")
-
-                for report in self.reports:
-                    row = [report.name,
-                           report.status.name,
-                           report.id,
-                           report.url]
-                    f_writer.writerow(row)
-                    Logger().Trace(("Row written to file:"
-                                    f" \"{self.file_path}\""))
+                if f.tell() == 0:
+                    f_writer.writerow(self.header)
+                self.WriteRows(f, f_writer)
+            if self.final_reports is not None:
+                self.Rewrite(self.final_reports)
+            Logger().Trace("%d rows written to file: \"%s\"",
+                           self.rows_written, self.file_path)
         except Exception as e:
-            Logger().Error(f"Exception: {e}")
+            Logger().Error(f"Exception: {e}, on file write {self.file_path}")
+            self.status = TaskState.ERROR
+
+    def WriteRows(self, f, f_writer):
+        """Writes queued rows to the file until the end of the queue.
+        Buffered rows are flushed when a batch is full or the oldest row
+        has waited flush_interval seconds.
+
+        Args:
+            f (TextIOWrapper): output file
+            f_writer (csv.writer): csv writer of the file
+        """
+        buffered = 0
+        due: float | None = None
+        while True:
+            timeout = None if due is None \
+                else max(0.0, due - time.monotonic())
+            try:
+                row = self.rows.get(timeout=timeout)
+            except queue.Empty:
+                row = []
+            if row:
+                f_writer.writerow(row)
+                self.rows_written += 1
+                buffered += 1
+                if due is None:
+                    due = time.monotonic() + self.flush_interval
+            if row is None or buffered >= self.batch_size or \
+                    (due is not None and time.monotonic() >= due):
+                f.flush()
+                buffered = 0
+                due = None
+            if row is None:
+                return
+
+    def Rewrite(self, reports: Iterable[Report]):
+        """Replaces the file with one row per report.
+        The reports are streamed and the file is replaced atomically.
+
+        Args:
+            reports (Iterable[Report]): reports of the run in input order
+        """
+        tmp_path = self.file_path + ".tmp"
+        rows = 0
+        with open(tmp_path, 'w', newline="", encoding="utf-8") as f:
+            f_writer = csv.writer(f)
+            f_writer.writerow(self.header)
+            for report in reports:
+                f_writer.writerow(self.Row(report))
+                rows += 1
+        os.replace(tmp_path, self.file_path)
+        Logger().Trace("%d rows rewritten to file: \"%s\"",
+                       rows, self.file_path)
 
     def Stop(self):
-        """Stops the task.
+        """Stops the task, queued rows are written first.
         """
+        if self.status == TaskState.RUNNING:
+            self.rows.put(None)
         self.timer.Stop()
         self.status = TaskState.DONE
 
-    def ReadData(self):
-        """Returns the report data.
-        TODO: use a sync object instead
+    def ReadData(self) -> int:
+        """Returns the number of rows written.
+
+        Returns:
+            int: rows written
+        """
+        return self.rows_written
+
+    @staticmethod
+    def Row(report: Report) -> list:
+        """Returns the csv row of a report.
+
+        Args:
+            report (Report): report to write
 
         Returns:
-            list[Report]: reports held
+            list: BRnum, status, row, url, attempts, and the sha256 and
+            size of a downloaded file
         """
-        return self.reports
+        downloaded = report.status == ReportState.DOWNLOADED
+        return [report.name, report.status.name, report.id, report.url,
+                report.attempts,
+                report.sha256 if downloaded else "",
+                report.size if downloaded and report.size else ""]
 
 
 class FileReaderTask(ITask):
@@ -115,7 +245,13 @@ class FileReaderTask(ITask):
 
     def __init__(self, _file_path: str,
                  _pdf_dir: str,
-                 _name: str = "FileReader"):
+                 _name: str = "FileReader",
+                 _refresh: bool = False,
+                 _queue: queue.Queue | None = None,
+                 _on_rows: Callable[[], None] | None = None,
+                 _index: DirectoryIndex | None = None,
+                 _shard_index: int = 0,
+                 _shard_count: int = 1):
         """Contructs FileReader task to run async.
 
         Args:
@@ -123,10 +259,31 @@ class FileReaderTask(ITask):
             _name (str, optional): Name of task. Defaults to "FileReader".
             _continious (bool, optional): Restarts on completion.
             Defaults to False.
+            _refresh (bool, optional): Queue downloaded files to be
+            fetched again if changed. Defaults to False.
+            _queue (queue.Queue | None, optional): bounded queue the
+            reports are put in as they are read, instead of being kept
+            by the task. Defaults to None.
+            _on_rows (Callable[[], None] | None, optional): called when
+            a report is put in the empty queue. Defaults to None.
+            _index (DirectoryIndex | None, optional): index of the pdf
+            directory, built when the task starts and used instead of
+            checking each file. Defaults to None.
+            _shard_index (int, optional): shard of the rows to read.
+            Defaults to 0.
+            _shard_count (int, optional): number of shards the rows are
+            split into by BRnum. Defaults to 1.
         """
         super().__init__(_name, False)
         self.file_path = _file_path
         self.pdf_dir = _pdf_dir
+        self.refresh = _refresh
+        self.queue = _queue
+        self.on_rows = _on_rows
+        self.index = _index
+        self.shard_index = _shard_index
+        self.shard_count = _shard_count
+        self.rows_read = 0
         self.report_state = ReportSyncState()
         self.status = TaskState.IDLE
 
@@ -136,33 +293,114 @@ class FileReaderTask(ITask):
         self.status = TaskState.RUNNING
         self.timer.Start()
         try:
-            df = pd.ExcelFile(self.file_path).parse()
-            for index, row in df.iterrows():
+            if self.index is not None:
+                loaded = self.index.Build()
+                Logger().Info((f"{len(self.index)} files indexed in"
+                               f" \"{self.pdf_dir}\""
+                               + (" from the index file" if loaded
+                                  else "")))
+            # one singleton lookup for all rows
+            log = Logger()
+            for index, name, url in self.ReadRows():
+                if self.shard_count > 1 and \
+                        ShardOf(name, self.shard_count) != self.shard_index:
+                    # row of another shard
+                    continue
 
-                url: str = str(row['Pdf_URL'])
                 status: ReportState = ReportState.INIT
                 # Validate url
                 if not self.ValidateURL(url):
                     url = "None"
                     status = ReportState.NOT_DOWNLOADED
                 # check if file is already downloaded
-                if self.FileExists(f"{self.pdf_dir}/{row['BRnum']}.pdf"):
-                    status = ReportState.DOWNLOADED
-                    Logger().Trace(f"File already downloaded: "
-                                   f"\"{self.pdf_dir}/{row['BRnum']}.pdf\"")
+                if self.FileExists(f"{self.pdf_dir}/{name}.pdf"):
+                    if self.refresh and status == ReportState.INIT:
+                        log.Trace("File to refresh: \"%s/%s.pdf\"",
+                                  self.pdf_dir, name)
+                    else:
+                        status = ReportState.DOWNLOADED
+                        log.Trace("File already downloaded: \"%s/%s.pdf\"",
+                                  self.pdf_dir, name)
 
-                report = Report(name=row['BRnum'], id=index,
+                report = Report(name=name, id=index,
                                 url=url,
                                 status=status)
-                Logger().Trace(f"Read entry:\n {report.name} - {report.url}")
-                self.report_state.Append(report)
-            Logger().Info((f"{self.name} read {self.report_state.Count()}"
+                if status == ReportState.DOWNLOADED and self.index:
+                    report.size = self.index.Size(f"{name}.pdf") or 0
+                log.Trace("Read entry:\n %s - %s", report.name, report.url,
+                          brnum=report.name, url=report.url)
+                if not self.Produce(report):
+                    break
+                self.rows_read += 1
+            Logger().Info((f"{self.name} read {self.rows_read}"
                            f" rows from \"{self.file_path}\""))
             self.Stop()
         except Exception as e:
             Logger().Error(f"Exception: {e}, on file read {self.file_path}")
             self.status = TaskState.ERROR
 
+    def Produce(self, report: Report) -> bool:
+        """Hands a report to the consumer.
+        Blocks while the queue is full, so reading never runs more than
+        the queue size ahead of the downloads.
+
+        Args:
+            report (Report): report read from the file
+
+        Returns:
+            bool: false if the task was stopped while waiting
+        """
+        if self.queue is None:
+            self.report_state.Append(report)
+            return True
+        while True:
+            if self.status != TaskState.RUNNING:
+                return False
+            try:
+                self.queue.put(report, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        # the consumer has taken every queued report, wake it up
+        if self.on_rows and self.queue.qsize() == 1:
+            self.on_rows()
+        return True
+
+    def ReadRows(self) -> Iterator[tuple[int, object, str]]:
+        """Streams the BRnum and Pdf_URL columns of the first sheet.
+        The workbook is read in openpyxl read only mode, so rows are
+        parsed as they are used and the sheet is never held in memory.
+        Empty rows are skipped.
+
+        Raises:
+            KeyError: if the BRnum or Pdf_URL column is missing
+
+        Yields:
+            tuple[int, object, str]: row index below the header,
+            BRnum and url
+        """
+        workbook = openpyxl.load_workbook(self.file_path, read_only=True,
+                                          data_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            # Do not trust the dimensions stored by the writing program
+            sheet.reset_dimensions()
+            rows = sheet.iter_rows(values_only=True)
+            header = list(next(rows, ()))
+            for column in ("BRnum", "Pdf_URL"):
+                if column not in header:
+                    raise KeyError(column)
+            name_col = header.index("BRnum")
+            url_col = header.index("Pdf_URL")
+            for index, row in enumerate(rows):
+                if all(value is None for value in row):
+                    continue
+                name = row[name_col] if name_col < len(row) else None
+                url = row[url_col] if url_col < len(row) else None
+                yield index, name, "" if url is None else str(url)
+        finally:
+            workbook.close()
+
     def Stop(self):
         """Stops the task.
         """
@@ -174,7 +412,8 @@ class FileReaderTask(ITask):
         TODO: let this task hold a syncstate object
 
         Returns:
-            list[Report]: list of documents to download
+            list[Report]: list of documents to download, empty when the
+            reports are put in a queue
         """
         return self.report_state.Read().reports
 
@@ -191,6 +430,7 @@ class FileReaderTask(ITask):
 
     def FileExists(self, path: str) -> bool:
         """Returns true if the specified file exists in the local filesystem .
+        Looked up in the directory index when the task has one.
 
         Args:
             path (str): path to file
@@ -198,18 +438,68 @@ class FileReaderTask(ITask):
         Returns:
             bool: true if exists
         """
+        if self.index is not None:
+            return self.index.Contains(os.path.basename(path))
         return os.path.exists(path)
 
 
+@dataclass
+class DownloadOptions:
+    """Settings shared by all downloader tasks of a run.
+    The buffer pool, byte budget and cache are shared between the tasks
+    holding the same options object.
+    """
+    timeout: float = 10.0
+    chunk_size: int = 64 * 1024
+    max_file_size: int = 0
+    buffer_pool: BufferPool | None = None
+    byte_budget: ByteBudget | AsyncByteBudget | None = None
+    validation: ValidationLevel = ValidationLevel.FULL
+    validation_stage: ValidationStage | None = None
+    resume: bool = True
+    cache: HTTPCache | None = None
+
+    def __post_init__(self):
+        if self.buffer_pool is None:
+            self.buffer_pool = BufferPool(self.chunk_size)
+        self.validator = PDFValidator(self.validation)
+
+    def CheckSize(self, url: str, size: int):
+        """Aborts a download exceeding the maximum file size.
+
+        Args:
+            url (str): url being downloaded
+            size (int): announced or downloaded bytes
+
+        Raises:
+            FileTooLargeError: if size exceeds max_file_size
+        """
+        if self.max_file_size > 0 and size > self.max_file_size:
+            raise FileTooLargeError(url, size, self.max_file_size)
+
+
 class URLDownloaderTask(ITask):
     """Downloader task. Implements ITask
     """
-    def __init__(self, _report: Report, _out_dir: str):
+    def __init__(self, _report: Report, _out_dir: str,
+                 _options: DownloadOptions | None = None):
         super().__init__(f"Download: {_report.name} task")
         self.report_state: ReportSyncState = ReportSyncState()
         self.report_state.Append(_report)
         self.out_dir: str = _out_dir
+        self.options: DownloadOptions = _options if _options \
+            else DownloadOptions()
         self.status: TaskState = TaskState.IDLE
+        self.error: Exception | None = None
+        # the validation stage reports the result of the file
+        self.validating: bool = False
+        # content of the downloaded file
+        self.sha256: str = ""
+        self.size: int = 0
+        # time to the response head of the last request
+        self.ttfb_ms: float | None = None
+        # false if the file was not modified on the server
+        self.written: bool = False
 
     def Start(self):
         """Tries to downloads the pdf and reports the status.
@@ -218,7 +508,6 @@ class URLDownloaderTask(ITask):
         self.timer.Start()
 
         report_data: ReportSyncData = self.report_state.Read()
-        context = ssl.create_default_context(cafile=certifi.where())
 
         pdf_file = f"{self.out_dir}/{report_data.reports[0].name}.pdf"
         dir_path = os.path.dirname(pdf_file)
@@ -226,31 +515,41 @@ class URLDownloaderTask(ITask):
         if dir_path and not os.path.exists(dir_path):
             os.makedirs(dir_path)
 
+        written = False
         try:
             if report_data.reports[0].status == ReportState.STAGED:
-                # Try to download file
-                response = urllib.request.urlopen(
-                    report_data.reports[0].url,
-                    context=context,
-                    timeout=10)
-                with open(pdf_file, "wb") as out_file:
-                    out_file.write(response.read())
-                    # Validate pdf by reading first page
-                    reader = PdfReader(pdf_file)
-                    _ = reader.pages[0].extract_text()
-
-                report_data.reports[0].status = ReportState.DOWNLOADED
-
-            Logger().Trace(f"File \"{report_data.reports[0].url}\" "
-                           "successfully downloaded")
+                # Try to download file on a pooled connection
+                ends = PDFEnds()
+                written = self.Download(report_data.reports[0].url,
+                                        pdf_file, ends)
+                self.written = written
+                report_data.reports[0].sha256 = self.sha256
+                report_data.reports[0].size = self.size
+                if not written:
+                    report_data.reports[0].status = ReportState.DOWNLOADED
+                    self.TraceDone("File \"%s\" not modified",
+                                   report_data.reports[0])
+                elif self.options.validation_stage:
+                    # Hand over to the validation stage
+                    self.options.validation_stage.Submit(
+                        report_data.reports[0], pdf_file, ends)
+                    self.validating = True
+                else:
+                    self.options.validator.Validate(pdf_file, ends)
+                    report_data.reports[0].status = ReportState.DOWNLOADED
+                    self.TraceDone("File \"%s\" successfully downloaded",
+                                   report_data.reports[0])
         except Exception as e:
-            Logger().Warn(f"Exception: {e},"
-                          f" when trying to download: "
-                          f"{report_data.reports[0].url}")
+            Logger().Warn("Exception: %s, when trying to download: %s",
+                          e, report_data.reports[0].url,
+                          brnum=report_data.reports[0].name,
+                          url=report_data.reports[0].url, error=str(e))
 
-            if os.path.exists(pdf_file):
+            # a file kept from an earlier download is left in place
+            if written and os.path.exists(pdf_file):
                 os.remove(os.path.abspath(pdf_file))
             report_data.reports[0].status = ReportState.NOT_DOWNLOADED
+            self.error = e
             self.status = TaskState.ERROR
         finally:
             if report_data.reports[0].status == ReportState.STAGED:
@@ -259,6 +558,363 @@ class URLDownloaderTask(ITask):
                                f"{report_data.reports[0].name}")
         self.report_state.Write(report_data)
 
+    def TraceDone(self, msg: str, report: Report):
+        """Logs a finished download with its structured fields.
+
+        Args:
+            msg (str): message, formatted with the url
+            report (Report): downloaded report
+        """
+        Logger().Trace(msg, report.url, brnum=report.name, url=report.url,
+                       bytes=self.size, ms=round(self.timer.ElapsedMS(), 1))
+
+    def Download(self, url: str, pdf_file: str, ends: PDFEnds) -> bool:
+        """Streams the body of the url to <pdf_file>.part and moves it to
+        pdf_file when complete. A partial file left by an interrupted
+        attempt is resumed if the options allow it, and an existing
+        pdf_file known by the cache is only fetched again if changed.
+
+        Args:
+            url (str): http or https url
+            pdf_file (str): path to pdf file
+            ends (PDFEnds): captures the first and last bytes for validation
+
+        The file is hashed while it streams, the digest and size are
+        kept in sha256 and size.
+
+        Returns:
+            bool: true if written, false if pdf_file was not modified
+        """
+        partial = PartialFile(pdf_file, url)
+        if self.options.resume:
+            partial.Load()
+        cache = self.options.cache
+        conditional = cache.Conditional(url, pdf_file) \
+            if cache and partial.offset == 0 else None
+        digest = hashlib.sha256()
+        try:
+            result = self.Fetch(url, partial, ends, conditional, digest)
+        except Exception as e:
+            if not self.options.resume or isinstance(e, FileTooLargeError):
+                partial.Discard()
+            raise
+        if result is None:
+            entry = cache.Get(url)
+            if entry:
+                self.sha256, self.size = entry.sha256, entry.size
+            return False
+        partial.Finish()
+        self.sha256, self.size = digest.hexdigest(), result[0]
+        if cache:
+            cache.Store(url, result[1], self.size, self.sha256)
+        return True
+
+    def Fetch(self, url: str, partial: PartialFile, ends: PDFEnds,
+              conditional: dict[str, str] | None = None,
+              digest=None) -> tuple[int, dict[str, str]] | None:
+        """Streams the body of the url to the partial file in fixed-size
+        chunks through a pooled buffer.
+
+        Args:
+            url (str): http or https url
+            partial (PartialFile): partial download to write to
+            ends (PDFEnds): captures the first and last bytes for validation
+            conditional (dict[str, str] | None, optional): cache validators
+            digest (hashlib._Hash, optional): hash of the file
+
+        Returns:
+            tuple[int, dict[str, str]] | None: size of the file and the
+            response headers, None if not modified
+        """
+        pool = ConnectionPool()
+        sent = time.monotonic()
+        try:
+            response = pool.Get(url, timeout=self.options.timeout,
+                                headers=partial.Headers() or conditional)
+        except HTTPStatusError as e:
+            if e.status != 416 or partial.offset == 0:
+                raise
+            # Partial file is no longer a prefix of the file
+            partial.Discard()
+            sent = time.monotonic()
+            response = pool.Get(url, timeout=self.options.timeout)
+        self.ttfb_ms = (time.monotonic() - sent) * 1000
+        if response.status == 304:
+            response.Read()
+            response.Release()
+            return None
+        buffer = self.options.buffer_pool.Take()
+        view = memoryview(buffer)
+        budget = self.options.byte_budget
+        try:
+            size = partial.Begin(response.status, response.headers) \
+                if self.options.resume else 0
+            partial.FeedEnds(ends)
+            if digest:
+                partial.FeedHash(digest)
+            expected = size + int(response.headers.get("content-length", 0))
+            self.options.CheckSize(url, expected)
+            with partial.Open() as out_file:
+                while True:
+                    if budget:
+                        budget.Acquire(len(buffer))
+                    try:
+                        n = response.ReadInto(view)
+                        size += n
+                        self.options.CheckSize(url, size)
+                        out_file.write(view[:n])
+                        ends.Feed(view[:n])
+                        if digest:
+                            digest.update(view[:n])
+                    finally:
+                        if budget:
+                            budget.Release(len(buffer))
+                    if n == 0:
+                        break
+            if size < expected:
+                # http.client ends a body cut short without an error
+                raise http.client.IncompleteRead(b"", expected - size)
+        finally:
+            view.release()
+            self.options.buffer_pool.Give(buffer)
+            response.Release()
+        return size, response.headers
+
+    def Stop(self):
+        """Stops the task.
+        """
+        self.timer.Stop()
+        self.status = TaskState.DONE
+
+    def ReadData(self):
+        return self.report_state.Read()
+
+
+class AsyncURLDownloaderTask(IAsyncTask):
+    """Downloader task running on an event loop. Implements IAsyncTask
+    """
+    def __init__(self, _report: Report, _out_dir: str,
+                 _options: DownloadOptions | None = None):
+        super().__init__(f"Download: {_report.name} task")
+        self.report_state: ReportSyncState = ReportSyncState()
+        self.report_state.Append(_report)
+        self.out_dir: str = _out_dir
+        self.options: DownloadOptions = _options if _options \
+            else DownloadOptions()
+        self.status: TaskState = TaskState.IDLE
+        self.error: Exception | None = None
+        # the validation stage reports the result of the file
+        self.validating: bool = False
+        # content of the downloaded file
+        self.sha256: str = ""
+        self.size: int = 0
+        # time to the response head of the last request
+        self.ttfb_ms: float | None = None
+        # false if the file was not modified on the server
+        self.written: bool = False
+
+    async def StartAsync(self):
+        """Tries to downloads the pdf and reports the status.
+        """
+        self.status = TaskState.RUNNING
+        self.timer.Start()
+
+        report_data: ReportSyncData = self.report_state.Read()
+        report = report_data.reports[0]
+        pdf_file = f"{self.out_dir}/{report.name}.pdf"
+        dir_path = os.path.dirname(pdf_file)
+
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+
+        written = False
+        try:
+            if report.status == ReportState.STAGED:
+                ends = PDFEnds()
+                written = await self.Download(report.url, pdf_file, ends)
+                self.written = written
+                report.sha256, report.size = self.sha256, self.size
+                if not written:
+                    report.status = ReportState.DOWNLOADED
+                    self.TraceDone("File \"%s\" not modified", report)
+                elif self.options.validation_stage:
+                    # Hand over to the validation stage
+                    await self.options.validation_stage.SubmitAsync(
+                        report, pdf_file, ends)
+                    self.validating = True
+                else:
+                    await self.ValidateFile(pdf_file, ends)
+                    report.status = ReportState.DOWNLOADED
+                    self.TraceDone("File \"%s\" successfully downloaded",
+                                   report)
+        except asyncio.CancelledError:
+            if written:
+                self.RemoveFile(pdf_file)
+            report.status = ReportState.NOT_DOWNLOADED
+            self.report_state.Write(report_data)
+            raise
+        except Exception as e:
+            Logger().Warn("Exception: %s, when trying to download: %s",
+                          e, report.url, brnum=report.name, url=report.url,
+                          error=str(e))
+            # a file kept from an earlier download is left in place
+            if written:
+                self.RemoveFile(pdf_file)
+            report.status = ReportState.NOT_DOWNLOADED
+            self.error = e
+            self.status = TaskState.ERROR
+        finally:
+            if report.status == ReportState.STAGED:
+                # should not happen
+                Logger().Error(f"Unhandler report {report.name}")
+        self.report_state.Write(report_data)
+
+    def TraceDone(self, msg: str, report: Report):
+        """Logs a finished download with its structured fields.
+
+        Args:
+            msg (str): message, formatted with the url
+            report (Report): downloaded report
+        """
+        Logger().Trace(msg, report.url, brnum=report.name, url=report.url,
+                       bytes=self.size, ms=round(self.timer.ElapsedMS(), 1))
+
+    async def Download(self, url: str, pdf_file: str,
+                       ends: PDFEnds) -> bool:
+        """Streams the body of the url to <pdf_file>.part and moves it to
+        pdf_file when complete. A partial file left by an interrupted
+        attempt is resumed if the options allow it, and an existing
+        pdf_file known by the cache is only fetched again if changed.
+
+        Args:
+            url (str): http or https url
+            pdf_file (str): path to pdf file
+            ends (PDFEnds): captures the first and last bytes for validation
+
+        The file is hashed while it streams, the digest and size are
+        kept in sha256 and size.
+
+        Returns:
+            bool: true if written, false if pdf_file was not modified
+        """
+        partial = PartialFile(pdf_file, url)
+        if self.options.resume:
+            partial.Load()
+        cache = self.options.cache
+        conditional = cache.Conditional(url, pdf_file) \
+            if cache and partial.offset == 0 else None
+        digest = hashlib.sha256()
+        try:
+            result = await self.Fetch(url, partial, ends, conditional,
+                                      digest)
+        except BaseException as e:
+            # cancelled downloads keep their partial file
+            if not self.options.resume or isinstance(e, FileTooLargeError):
+                partial.Discard()
+            raise
+        if result is None:
+            entry = cache.Get(url)
+            if entry:
+                self.sha256, self.size = entry.sha256, entry.size
+            return False
+        partial.Finish()
+        self.sha256, self.size = digest.hexdigest(), result[0]
+        if cache:
+            cache.Store(url, result[1], self.size, self.sha256)
+        return True
+
+    async def Fetch(self, url: str, partial: PartialFile, ends: PDFEnds,
+                    conditional: dict[str, str] | None = None,
+                    digest=None) -> tuple[int, dict[str, str]] | None:
+        """Streams the body of the url to the partial file in fixed-size
+        chunks. The timeout applies to the response head and to each chunk.
+
+        Args:
+            url (str): http or https url
+            partial (PartialFile): partial download to write to
+            ends (PDFEnds): captures the first and last bytes for validation
+            conditional (dict[str, str] | None, optional): cache validators
+            digest (hashlib._Hash, optional): hash of the file
+
+        Returns:
+            tuple[int, dict[str, str]] | None: size of the file and the
+            response headers, None if not modified
+        """
+        timeout = self.options.timeout
+        chunk_size = self.options.chunk_size
+        budget = self.options.byte_budget
+        client = AsyncHTTPClient()
+        sent = time.monotonic()
+        try:
+            response = await asyncio.wait_for(
+                client.Get(url, partial.Headers() or conditional),
+                timeout=timeout)
+        except HTTPStatusError as e:
+            if e.status != 416 or partial.offset == 0:
+                raise
+            # Partial file is no longer a prefix of the file
+            partial.Discard()
+            sent = time.monotonic()
+            response = await asyncio.wait_for(client.Get(url),
+                                              timeout=timeout)
+        self.ttfb_ms = (time.monotonic() - sent) * 1000
+        if response.status == 304:
+            response.Release()
+            return None
+        try:
+            size = partial.Begin(response.status, response.headers) \
+                if self.options.resume else 0
+            partial.FeedEnds(ends)
+            if digest:
+                partial.FeedHash(digest)
+            self.options.CheckSize(
+                url, size + int(response.headers.get("content-length", 0)))
+            with partial.Open() as out_file:
+                while True:
+                    if budget:
+                        await budget.Acquire(chunk_size)
+                    try:
+                        data = await asyncio.wait_for(
+                            response.ReadChunk(chunk_size), timeout=timeout)
+                        size += len(data)
+                        self.options.CheckSize(url, size)
+                        out_file.write(data)
+                        ends.Feed(data)
+                        if digest:
+                            digest.update(data)
+                    finally:
+                        if budget:
+                            await budget.Release(chunk_size)
+                    if not data:
+                        break
+        finally:
+            response.Release()
+        return size, response.headers
+
+    async def ValidateFile(self, pdf_file: str, ends: PDFEnds):
+        """Validates the pdf at the configured level.
+        Levels reading the file are run off the event loop.
+
+        Args:
+            pdf_file (str): path to pdf file
+            ends (PDFEnds): first and last bytes of the file
+        """
+        validator = self.options.validator
+        if validator.level in (ValidationLevel.NONE, ValidationLevel.MAGIC):
+            validator.Validate(pdf_file, ends)
+        else:
+            await asyncio.get_running_loop().run_in_executor(
+                None, validator.Validate, pdf_file, ends)
+
+    def RemoveFile(self, pdf_file: str):
+        """Removes a partially downloaded file.
+
+        Args:
+            pdf_file (str): path to pdf file
+        """
+        if os.path.exists(pdf_file):
+            os.remove(os.path.abspath(pdf_file))
+
     def Stop(self):
         """Stops the task.
         """
@@ -271,36 +927,58 @@ class URLDownloaderTask(ITask):
 
 class LoggerTask(ITask):
     ''' Logger task which writes to std out and log file.
+    Entries are taken from the queue in batches, formatted once and
+    written to one log file kept open for the run.
+    With write_json the entries are also written as json lines, one
+    object per entry holding the time, level, message and the fields
+    passed to the logger.
     Imlpements ITask
     '''
-    def __init__(self, _state: LogSyncState, write_log: bool = True):
+    colors: dict[LogLevel, str] = {
+        LogLevel.TRACE: bcolors.OKBLUE,
+        LogLevel.INFO: bcolors.OKGREEN,
+        LogLevel.WARN: bcolors.WARNING,
+        LogLevel.ERROR: bcolors.FAIL,
+        LogLevel.FATAL: bcolors.FAIL + bcolors.UNDERLINE}
+
+    def __init__(self, _state: LogSyncState, write_log: bool = True,
+                 _flush_interval: float = 1.0, write_json: bool = False):
         super().__init__("Log Task", True)
         self.state: LogSyncState = _state
         now = datetime.now()
-        self.log_file: str = f"logs/log_{now.strftime('%Y%m%d_%H%M%S')}.txt"
+        stamp = now.strftime('%Y%m%d_%H%M%S')
+        self.log_file: str = f"logs/log_{stamp}.txt"
+        self.json_file: str = f"logs/log_{stamp}.jsonl"
         self.log_to_file: bool = write_log
+        self.log_to_json: bool = write_json
+        self.flush_interval = _flush_interval
+        self.file = None
+        self.json = None
+        # keeps batches of the task and of Stop in order
+        self.write_lock = threading.Lock()
 
     def Start(self):
         """Starts the logger task.
+        Sleeps until entries are logged.
         """
         self.status = TaskState.RUNNING
         self.timer.Start()
-        while self.continious:
-            while self.state.Count() > 0:
-                entry = self.state.Pop()
-                self.Print(entry)
-                self.WriteFile(entry)
-            time.sleep(0.1)
+        try:
+            while self.continious:
+                self.state.Wait(self.flush_interval)
+                self.Flush()
+        finally:
+            self.Flush()
+            self.Close()
 
     def Stop(self):
         """Stop the task .
         """
-        # clear queue
-        while self.state.Count() > 0:
-            entry = self.state.Pop()
-            self.Print(entry)
-            self.WriteFile(entry)
         self.continious = False
+        self.state.Wake()
+        # clear queue
+        self.Flush()
+        self.Close()
         self.timer.Stop()
         self.status = TaskState.DONE
 
@@ -312,24 +990,96 @@ class LoggerTask(ITask):
         """
         return self.state.Read()
 
-    def Print(self, entry: LogEntry):
-        prefix: str = ""
-
-        match entry.severity:
-            case LogLevel.TRACE:
-                prefix = bcolors.OKBLUE
-            case LogLevel.INFO:
-                prefix = bcolors.OKGREEN
-            case LogLevel.WARN:
-                prefix = bcolors.WARNING
-            case LogLevel.ERROR:
-                prefix = bcolors.FAIL
-            case LogLevel.FATAL:
-                prefix = bcolors.FAIL + bcolors.UNDERLINE
-        print(f"{prefix}{entry}{bcolors.ENDC}")
-
-    def WriteFile(self, entry: LogEntry):
-        os.makedirs("logs", exist_ok=True)
-        with open(self.log_file, "a+") as file:
-            file.write(f"{entry.__repr__()}\n")
-            file.close()
+    def Flush(self):
+        """Writes all queued entries to std out and the log file.
+        """
+        with self.write_lock:
+            entries = self.state.PopAll()
+            if not entries:
+                return
+            lines = [repr(entry) for entry in entries]
+            self.Print(entries, lines)
+            if self.log_to_file:
+                self.WriteFile(lines)
+            if self.log_to_json:
+                self.WriteJSON(entries)
+
+    def Print(self, entries: deque[LogEntry], lines: list[str]):
+        """Prints formatted entries in their severity colors.
+
+        Args:
+            entries (deque[LogEntry]): logged entries
+            lines (list[str]): formatted entries
+        """
+        sys.stdout.write("".join(
+            f"{self.colors[entry.severity]}{line}{bcolors.ENDC}\n"
+            for entry, line in zip(entries, lines)))
+        sys.stdout.flush()
+
+    def WriteFile(self, lines: list[str]):
+        """Appends formatted entries to the log file.
+        The file is opened on the first write and kept open.
+
+        Args:
+            lines (list[str]): formatted entries
+        """
+        if self.file is None:
+            self.file = self.Open(self.log_file)
+        self.file.write("\n".join(lines) + "\n")
+        self.file.flush()
+
+    def WriteJSON(self, entries: deque[LogEntry]):
+        """Appends entries to the json lines file.
+        The file is opened on the first write and kept open.
+
+        Args:
+            entries (deque[LogEntry]): logged entries
+        """
+        if self.json is None:
+            self.json = self.Open(self.json_file)
+        self.json.write("".join(
+            json.dumps(self.Record(entry), default=str) + "\n"
+            for entry in entries))
+        self.json.flush()
+
+    @staticmethod
+    def Record(entry: LogEntry) -> dict:
+        """Returns the json object of an entry.
+
+        Args:
+            entry (LogEntry): logged entry
+
+        Returns:
+            dict: time, level and message, followed by the fields
+        """
+        record = {"time": entry.stamp.isoformat(timespec="milliseconds"),
+                  "level": entry.severity.name,
+                  "msg": entry.msg}
+        if entry.fields:
+            record.update(entry.fields)
+        return record
+
+    @staticmethod
+    def Open(path: str):
+        """Opens a log file for appending, creating its directory.
+
+        Args:
+            path (str): path to the file
+
+        Returns:
+            TextIOWrapper: opened file
+        """
+        dir_path = os.path.dirname(path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        return open(path, "a", encoding="utf-8")
+
+    def Close(self):
+        """Closes the log files.
+        """
+        with self.write_lock:
+            for file in (self.file, self.json):
+                if file is not None:
+                    file.close()
+            self.file = None
+            self.json = None
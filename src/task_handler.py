@@ -1,19 +1,25 @@
 from abc import ABC, abstractmethod
 from concurrent.futures import ThreadPoolExecutor, Future
 from functools import partial
-import time
-from task import ITask, TaskState
-from logger import Logger
+from typing import Callable
+import asyncio
+import threading
+from task import ITask, IAsyncTask, TaskState, LoggerTask
+from logger import Logger, LogLevel
 
 
 class ITaskHandler(ABC):
     """Interface to track and control ITasks and
     limit how many are running at the same time.
+    Running tasks are tracked in start order, guarded by a condition
+    which is notified when a task ends.
     """
     def __init__(self, n_tasks: int):
-        self.tasks: list[ITask] = []
         self.concurrent_tasks = n_tasks
+        # dict keeps the start order, removal is O(1)
+        self.running_tasks: dict[ITask, None] = {}
         self.active_tasks = 0
+        self.tasks_changed = threading.Condition()
 
     @abstractmethod
     def Start(self, task: ITask, *args, **kvargs) -> bool:
@@ -21,6 +27,8 @@ class ITaskHandler(ABC):
         Virtual function to be overridden.
         Args:
             task (ITask): [description]
+            on_done (Callable[[ITask], None], optional): called from the
+            completing thread when the task is done
 
         Returns:
             bool: true if task is started succesfully
@@ -92,6 +100,68 @@ class ITaskHandler(ABC):
         """
         pass
 
+    def Track(self, task: ITask) -> int:
+        """Adds a started task to the running tasks.
+
+        Args:
+            task (ITask): started task
+
+        Returns:
+            int: running tasks
+        """
+        with self.tasks_changed:
+            self.running_tasks[task] = None
+            self.active_tasks = len(self.running_tasks)
+            return self.active_tasks
+
+    def Untrack(self, task: ITask) -> int:
+        """Removes an ended task from the running tasks and wakes the
+        threads waiting for tasks to end.
+
+        Args:
+            task (ITask): ended task
+
+        Returns:
+            int: running tasks
+        """
+        with self.tasks_changed:
+            self.running_tasks.pop(task, None)
+            self.active_tasks = len(self.running_tasks)
+            self.tasks_changed.notify_all()
+            return self.active_tasks
+
+    def WaitForTasks(self, count: int = 0,
+                     timeout: float | None = None) -> bool:
+        """Blocks until at most count tasks are running.
+
+        Args:
+            count (int, optional): running tasks to wait for, e.g. 1 for
+            all but the logger task. Defaults to 0.
+            timeout (float | None, optional): max seconds to wait, None
+            waits until done. Defaults to None.
+
+        Returns:
+            bool: false if the timeout expired first
+        """
+        with self.tasks_changed:
+            return self.tasks_changed.wait_for(
+                lambda: self.active_tasks <= count, timeout)
+
+    def StopTasks(self):
+        """Signals all tasks to stop and blocks until they have ended.
+        Logger tasks are stopped last, so the other tasks can log
+        until they end.
+        """
+        tasks = self.GetRunningTasks()
+        loggers = [task for task in tasks if isinstance(task, LoggerTask)]
+        for task in tasks:
+            if not isinstance(task, LoggerTask):
+                self.Stop(task)
+        self.WaitForTasks(len(loggers))
+        for task in loggers:
+            self.Stop(task)
+        self.WaitForTasks()
+
 
 class ThreadPoolHandler(ITaskHandler):
     """ThreadPoolHandler class. implementation of ITaskHandler.
@@ -99,18 +169,18 @@ class ThreadPoolHandler(ITaskHandler):
     def __init__(self, n_tasks: int):
         super().__init__(n_tasks)
         self.executor = ThreadPoolExecutor(self.concurrent_tasks)
-        self.running_tasks: list[ITask] = []
 
-    def Start(self, task: ITask) -> bool:
+    def Start(self, task: ITask,
+              on_done: Callable[[ITask], None] | None = None) -> bool:
         """Override of interface
         """
         try:
             task.handle = self.executor.submit(task.Start)
-            task.handle.add_done_callback(partial(self.TaskDoneCB, task))
-            self.running_tasks.append(task)
-            # self.active_tasks = self.active_tasks + 1
-            Logger().Trace((f"Task {task.name} started."
-                            f"{len(self.running_tasks)} running."))
+            running = self.Track(task)
+            task.handle.add_done_callback(
+                partial(self.TaskDoneCB, task, on_done))
+            Logger().Trace("Task %s started.%d running.",
+                           task.name, running)
             return True
         except Exception as e:
             Logger().Error(f"Task {task.name} raised exception: {e}")
@@ -119,6 +189,7 @@ class ThreadPoolHandler(ITaskHandler):
     def Stop(self, task: ITask) -> bool:
         """Override of interface
         """
+        task.stopped = True
         task.Stop()
         return task.handle.cancel()
 
@@ -140,34 +211,179 @@ class ThreadPoolHandler(ITaskHandler):
     def ActiveTaskCount(self) -> int:
         """Override of interface
         """
-        return len(self.running_tasks)
+        return self.active_tasks
 
     def GetRunningTasks(self) -> list[ITask]:
-        """Override of interface
+        """Override of interface.
+        Returns a copy, tasks end while it is used.
         """
-        return self.running_tasks
+        with self.tasks_changed:
+            return list(self.running_tasks)
 
     def StopAllTasks(self):
         """Override of interface.
         Blocking function waiting for all task to finish
         """
-        # Signal to stop
-        for task in self.running_tasks:
-            if not task.name == "Log Task":
-                self.Stop(task)
-        # Wait for tasks to stop
-        while self.ActiveTaskCount() > 1:
-            time.sleep(0.1)
-        # Stop logger task
-        self.Stop(self.running_tasks[0])
-        while self.ActiveTaskCount() > 0:
-            time.sleep(0.1)
-
-    def TaskDoneCB(self, task: ITask, future: Future):
+        self.StopTasks()
+
+    def TaskDoneCB(self, task: ITask,
+                   on_done: Callable[[ITask], None] | None,
+                   future: Future):
+        """Override of interface
+        """
+        task.Stop()
+        running = self.Untrack(task)
+        if Logger().IsEnabled(LogLevel.TRACE):
+            duration = task.timer.DurationMS()
+            Logger().Trace(("Task %s stopped. Duration: %.1f (ms)."
+                            " Running task(s) %d"), task.name, duration,
+                           running, task=task.name,
+                           ms=round(duration, 1))
+        if on_done:
+            on_done(task)
+
+
+class AsyncioHandler(ITaskHandler):
+    """AsyncioHandler class. implementation of ITaskHandler.
+    IAsyncTasks run as coroutines on a single event loop in a background
+    thread, so thousands of downloads can be in flight at once.
+    Blocking tasks (logger, file reader/writer) run in a small
+    thread pool next to the loop.
+    """
+    def __init__(self, n_tasks: int, n_threads: int = 4):
+        super().__init__(n_tasks)
+        self.executor = ThreadPoolExecutor(n_threads)
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(self.executor)
+        self.loop_thread = threading.Thread(target=self.loop.run_forever,
+                                            name="AsyncioHandler",
+                                            daemon=True)
+        self.loop_thread.start()
+        # coroutines of the running tasks, and tasks stopped before their
+        # coroutine started, only used on the loop thread
+        self.loop_tasks: dict[ITask, asyncio.Task] = {}
+        self.cancelled: set[ITask] = set()
+
+    def Start(self, task: ITask,
+              on_done: Callable[[ITask], None] | None = None) -> bool:
+        """Override of interface
+        """
+        try:
+            task.handle = asyncio.run_coroutine_threadsafe(
+                self.RunTask(task), self.loop)
+            running = self.Track(task)
+            task.handle.add_done_callback(
+                partial(self.TaskDoneCB, task, on_done))
+            Logger().Trace("Task %s started.%d running.",
+                           task.name, running)
+            return True
+        except Exception as e:
+            Logger().Error(f"Task {task.name} raised exception: {e}")
+            return False
+
+    async def RunTask(self, task: ITask):
+        """Runs a task on the event loop.
+        Blocking tasks are moved to the thread pool.
+
+        Args:
+            task (ITask): task to run
+        """
+        if task in self.cancelled:
+            self.cancelled.discard(task)
+            raise asyncio.CancelledError()
+        self.loop_tasks[task] = asyncio.current_task()
+        try:
+            if isinstance(task, IAsyncTask):
+                await task.StartAsync()
+            else:
+                await self.loop.run_in_executor(self.executor, task.Start)
+        finally:
+            del self.loop_tasks[task]
+
+    def Stop(self, task: ITask) -> bool:
+        """Override of interface.
+        The coroutine is cancelled on the loop, so the handle is done,
+        and on_done called, once the task has handled the cancellation.
+        """
+        task.stopped = True
+        task.Stop()
+        self.loop.call_soon_threadsafe(self.CancelTask, task)
+        return True
+
+    def CancelTask(self, task: ITask):
+        """Cancels the coroutine of a task, on the loop thread.
+
+        Args:
+            task (ITask): task to cancel
+        """
+        if task.handle.done():
+            return
+        loop_task = self.loop_tasks.get(task)
+        if loop_task is None:
+            # the coroutine has not started yet
+            self.cancelled.add(task)
+        else:
+            loop_task.cancel()
+
+    def IsRunning(self, task: ITask) -> bool:
+        """Override of interface
+        """
+        return task.status == TaskState.RUNNING
+
+    def IsDone(self, task: ITask):
+        """Override of interface
+        """
+        return task.status == TaskState.DONE
+
+    def Exception(self, task: ITask) -> Exception | None:
+        """Override of interface
+        """
+        return task.handle.exception(timeout=0.5)
+
+    def ActiveTaskCount(self) -> int:
+        """Override of interface
+        """
+        return self.active_tasks
+
+    def GetRunningTasks(self) -> list[ITask]:
+        """Override of interface.
+        Returns a copy, tasks end while it is used.
+        """
+        with self.tasks_changed:
+            return list(self.running_tasks)
+
+    def StopAllTasks(self):
+        """Override of interface.
+        Blocking function waiting for all task to finish,
+        then stops the event loop.
+        """
+        self.StopTasks()
+        # the futures of cancelled tasks are done before their coroutines
+        asyncio.run_coroutine_threadsafe(self.PendingDone(),
+                                         self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join()
+        self.executor.shutdown()
+
+    async def PendingDone(self):
+        """Waits for the coroutines still running on the event loop to
+        end.
+        """
+        pending = asyncio.all_tasks() - {asyncio.current_task()}
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def TaskDoneCB(self, task: ITask,
+                   on_done: Callable[[ITask], None] | None,
+                   future: Future):
         """Override of interface
         """
         task.Stop()
-        self.running_tasks.remove(task)
-        Logger().Trace((f"Task {task.name} stopped. Duration: "
-                        f"{task.timer.DurationMS():.1f} (ms)."
-                        f" Running task(s) {len(self.running_tasks)}"))
+        running = self.Untrack(task)
+        if Logger().IsEnabled(LogLevel.TRACE):
+            duration = task.timer.DurationMS()
+            Logger().Trace(("Task %s stopped. Duration: %.1f (ms)."
+                            " Running task(s) %d"), task.name, duration,
+                           running, task=task.name,
+                           ms=round(duration, 1))
+        if on_done:
+            on_done(task)
@@ -27,3 +27,11 @@ class Timer:
             float: miliseconds
         """
         return (self.stop_stamp - self.start_stamp)*1000
+
+    def ElapsedMS(self) -> float:
+        """Returns the miliseconds since the timer was started.
+
+        Returns:
+            float: miliseconds
+        """
+        return (time.time() - self.start_stamp)*1000
@@ -0,0 +1,117 @@
+import os
+import shutil
+import threading
+from urllib.parse import urlsplit, urlunsplit
+from state import Report, ReportState
+
+
+default_ports: dict[str, int] = {"http": 80, "https": 443}
+
+
+def NormalizeURL(url: str) -> str:
+    """Returns the url in a normal form, so spellings of the same url
+    compare equal. The scheme and host are lower cased, default ports
+    and the fragment are removed and an empty path becomes "/".
+
+    Args:
+        url (str): url to normalize
+
+    Returns:
+        str: normalized url, the url itself if it can not be parsed
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if ":" in netloc:
+        netloc = f"[{netloc}]"
+    if port is not None and port != default_ports.get(scheme):
+        netloc += f":{port}"
+    if parts.username is not None:
+        userinfo = parts.username
+        if parts.password is not None:
+            userinfo += f":{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def LinkFile(src: str, dst: str):
+    """Makes dst a hardlink to src, or a copy where hardlinks are not
+    supported. An existing dst is replaced atomically.
+
+    Args:
+        src (str): path to the downloaded file
+        dst (str): path to the duplicate
+
+    Raises:
+        OSError: if neither a link nor a copy can be made
+    """
+    if os.path.normcase(os.path.abspath(src)) \
+            == os.path.normcase(os.path.abspath(dst)):
+        return
+    tmp_path = dst + ".link"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        # other file system or no hardlink support
+        shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+class URLDedup:
+    """Index of normalized urls to the report downloading them.
+    The first report of a url is downloaded, later reports of the url
+    wait for it and get a link to its file.
+    Thread safe.
+    """
+    def __init__(self):
+        self.primaries: dict[str, Report] = {}
+        self.followers: dict[int, list[Report]] = {}
+        self.lock = threading.Lock()
+
+    def Add(self, report: Report) -> Report | None:
+        """Adds a report to the index.
+        A report of a url not seen before becomes its primary, a report
+        of a url being downloaded waits for the primary.
+
+        Args:
+            report (Report): report read from the input file
+
+        Returns:
+            Report | None: the report itself if it is the primary, the
+            finished primary to link from, or None if the report waits
+            for the primary to finish
+        """
+        key = NormalizeURL(report.url)
+        with self.lock:
+            primary = self.primaries.setdefault(key, report)
+            if primary is report:
+                if report.status == ReportState.INIT:
+                    self.followers[report.id] = []
+                return report
+            if primary.id in self.followers:
+                self.followers[primary.id].append(report)
+                return None
+            return primary
+
+    def Followers(self, primary: Report) -> list[Report]:
+        """Takes the reports waiting for a primary, which has finished.
+        Reports of the url added later are linked right away.
+
+        Args:
+            primary (Report): report which finished downloading
+
+        Returns:
+            list[Report]: reports of the same url, each returned once
+        """
+        with self.lock:
+            return self.followers.pop(primary.id, [])
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.primaries)
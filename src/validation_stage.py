@@ -0,0 +1,151 @@
+import asyncio
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, Future
+from functools import partial
+from typing import Callable
+from logger import Logger
+from pdf_validator import PDFEnds, PDFValidator
+from state import Report, ReportState
+
+
+class ValidationStage:
+    """Pipeline stage validating downloaded pdfs in a process pool, so
+    CPU bound parsing does not hold the GIL of the download workers.
+    Downloaders hand over finished files through a bounded queue of
+    queue_size slots and block while it is full.
+    The report is marked DOWNLOADED or NOT_DOWNLOADED once validated,
+    and on_done is called with it before the file stops being pending.
+    """
+    def __init__(self, validator: PDFValidator, n_workers: int,
+                 queue_size: int,
+                 on_done: Callable[[Report], None] | None = None):
+        self.validator = validator
+        self.queue_size = queue_size
+        self.on_done = on_done
+        self.executor = ProcessPoolExecutor(
+            n_workers,
+            initializer=signal.signal,
+            initargs=(signal.SIGINT, signal.SIG_IGN))
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.async_slots: asyncio.Semaphore | None = None
+        self.condition = threading.Condition()
+        self.pending = 0
+
+    def Submit(self, report: Report, pdf_file: str, ends: PDFEnds):
+        """Queues a downloaded file for validation.
+        Blocks while the queue is full.
+
+        Args:
+            report (Report): report of the file
+            pdf_file (str): path to pdf file
+            ends (PDFEnds): first and last bytes of the file
+        """
+        self.slots.acquire()
+        self.Dispatch(report, pdf_file, ends, self.slots.release)
+
+    async def SubmitAsync(self, report: Report, pdf_file: str,
+                          ends: PDFEnds):
+        """Queues a downloaded file for validation from the event loop.
+        Waits while the queue is full without blocking the loop.
+
+        Args:
+            report (Report): report of the file
+            pdf_file (str): path to pdf file
+            ends (PDFEnds): first and last bytes of the file
+        """
+        if self.async_slots is None:
+            self.async_slots = asyncio.Semaphore(self.queue_size)
+        await self.async_slots.acquire()
+        loop = asyncio.get_running_loop()
+        self.Dispatch(report, pdf_file, ends,
+                      partial(loop.call_soon_threadsafe,
+                              self.async_slots.release))
+
+    def Dispatch(self, report: Report, pdf_file: str, ends: PDFEnds,
+                 release: Callable):
+        """Submits the validation to the process pool.
+
+        Args:
+            report (Report): report of the file
+            pdf_file (str): path to pdf file
+            ends (PDFEnds): first and last bytes of the file
+            release (Callable): frees the queue slot when done
+        """
+        report.status = ReportState.VALIDATING
+        with self.condition:
+            self.pending += 1
+        try:
+            future = self.executor.submit(self.validator.Validate,
+                                          pdf_file, ends)
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+        future.add_done_callback(
+            partial(self.ValidationDoneCB, report, pdf_file, release))
+
+    def ValidationDoneCB(self, report: Report, pdf_file: str,
+                         release: Callable, future: Future):
+        """Updates the report when the validation is done.
+
+        Args:
+            report (Report): report of the file
+            pdf_file (str): path to pdf file
+            release (Callable): frees the queue slot
+            future (Future): validation result
+        """
+        try:
+            try:
+                error = future.exception() if not future.cancelled() \
+                    else Exception("Validation cancelled")
+                if error:
+                    Logger().Warn(f"Exception: {error},"
+                                  f" when trying to validate: {report.url}")
+                    if os.path.exists(pdf_file):
+                        os.remove(os.path.abspath(pdf_file))
+                    report.status = ReportState.NOT_DOWNLOADED
+                else:
+                    report.status = ReportState.DOWNLOADED
+                    Logger().Trace("File \"%s\" successfully downloaded",
+                                   report.url, brnum=report.name,
+                                   url=report.url)
+            finally:
+                # the file stays pending until the result is handled,
+                # so waiters never see a report before on_done ran
+                if self.on_done:
+                    self.on_done(report)
+        finally:
+            with self.condition:
+                self.pending -= 1
+                self.condition.notify_all()
+            release()
+
+    def Pending(self) -> int:
+        """Returns the number of files queued or being validated.
+
+        Returns:
+            int: pending validations
+        """
+        with self.condition:
+            return self.pending
+
+    def WaitIdle(self, timeout: float | None = None) -> bool:
+        """Blocks until all queued files are validated.
+
+        Args:
+            timeout (float | None, optional): max seconds to wait
+
+        Returns:
+            bool: true if no validations are pending
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: self.pending == 0,
+                                           timeout)
+
+    def Stop(self):
+        """Cancels queued validations, waits for running ones
+        and shuts down the process pool.
+        Reports of cancelled validations are marked NOT_DOWNLOADED.
+        """
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,392 @@
+import os
+import sqlite3
+import threading
+import time
+from enum import Enum
+from typing import Iterable, Iterator
+from state import Report, ReportState
+
+
+class ItemState(Enum):
+    ''' State of a row in the work queue
+    '''
+    PENDING = 0,
+    LEASED = 1,
+    DONE = 2
+
+
+class WorkQueue:
+    """Rows of a run shared by several worker processes through a SQLite
+    database, without a coordinator.
+    One worker loads the input file into the queue. Workers claim batches
+    of rows with a lease of lease_s seconds, renew the leases while the
+    rows are downloading and mark the rows done with their results when
+    finished, so the queue holds the results of the whole run. Rows of a
+    lease which has expired, because its worker crashed, are claimed by
+    the other workers. The load is leased the same way, so another
+    worker continues loading if the loading worker crashes.
+    The database uses the rollback journal, as WAL mode does not work on
+    network file systems.
+    Thread safe.
+    """
+    schema: str = """
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            url TEXT NOT NULL,
+            state TEXT NOT NULL,
+            worker TEXT NOT NULL DEFAULT '',
+            lease_until REAL NOT NULL DEFAULT 0,
+            claims INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT '',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            sha256 TEXT NOT NULL DEFAULT '',
+            size INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS items_state ON items (state, id);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: str, worker_id: str, lease_s: float = 60.0,
+                 busy_timeout: float = 30.0):
+        """Constructs the queue, the database is opened by Open.
+
+        Args:
+            path (str): path to the database file on shared storage
+            worker_id (str): name of this worker, unique among workers
+            lease_s (float, optional): seconds a claim is valid without
+            renewal. Defaults to 60.0.
+            busy_timeout (float, optional): max seconds to wait for the
+            database lock. Defaults to 30.0.
+        """
+        self.path = path
+        self.worker_id = worker_id
+        self.lease_s = lease_s
+        self.busy_timeout = busy_timeout
+        self.conn: sqlite3.Connection | None = None
+        self.lock = threading.Lock()
+        # results of the rows finished since the last write
+        self.done: dict[int, tuple[str, int, str, int]] = {}
+        self.loading = False
+        self.loaded = False
+
+    def Open(self):
+        """Opens or creates the database.
+        """
+        dir_path = os.path.dirname(self.path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        with self.lock:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False,
+                                        isolation_level=None,
+                                        timeout=self.busy_timeout)
+            self.conn.executescript(self.schema)
+
+    def Close(self):
+        """Writes finished rows and closes the database.
+        """
+        self.Flush()
+        with self.lock:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
+
+    def Join(self, in_file: str) -> bool:
+        """Joins the run of an input file, starting it if the queue is
+        new.
+
+        Args:
+            in_file (str): path to the input file of the run
+
+        Raises:
+            ValueError: if the queue holds the run of another input file
+
+        Returns:
+            bool: true if this worker loads the input file
+        """
+        signature = self.Signature(in_file)
+        with self.lock:
+            with self.Transaction():
+                meta = self.Meta()
+                if "signature" not in meta:
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                        [("signature", signature), ("loaded", "0"),
+                         ("loader", ""), ("loader_until", "0")])
+                elif meta["signature"] != signature:
+                    raise ValueError(
+                        f"Work queue \"{self.path}\" belongs to the run"
+                        f" of another input file ({meta['signature']})")
+        return self.TakeLoad()
+
+    def TakeLoad(self) -> bool:
+        """Takes over loading the input file if it is not loaded and the
+        lease of the loading worker has expired.
+
+        Returns:
+            bool: true if this worker loads the input file
+        """
+        now = time.time()
+        with self.lock:
+            if self.loading or self.loaded:
+                return False
+            with self.Transaction():
+                meta = self.Meta()
+                if meta.get("loaded") == "1":
+                    self.loaded = True
+                    return False
+                if float(meta.get("loader_until", 0)) >= now \
+                        and meta.get("loader") != self.worker_id:
+                    return False
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                    [("loader", self.worker_id),
+                     ("loader_until", str(now + self.lease_s))])
+                self.loading = True
+                return True
+
+    def Add(self, reports: Iterable[Report]):
+        """Adds rows read from the input file. Rows already in the queue,
+        added by a loader which crashed, are kept.
+        Rows which need no download are added as done.
+
+        Args:
+            reports (Iterable[Report]): reports read from the input file
+        """
+        rows = [(int(report.id), str(report.name), str(report.url),
+                 (ItemState.PENDING if report.status == ReportState.INIT
+                  else ItemState.DONE).name)
+                + (("", 0, "", 0) if report.status == ReportState.INIT
+                   else self.Result(report))
+                for report in reports]
+        with self.lock:
+            with self.Transaction():
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO items (id, name, url, state,"
+                    " status, attempts, sha256, size)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def LoadDone(self):
+        """Marks the input file as loaded.
+        """
+        with self.lock:
+            with self.Transaction():
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('loaded', '1')")
+            self.loading = False
+            self.loaded = True
+
+    def LoadFailed(self):
+        """Gives up loading the input file, another worker takes it over.
+        """
+        with self.lock:
+            with self.Transaction():
+                self.conn.execute("INSERT OR REPLACE INTO meta"
+                                  " VALUES ('loader_until', '0')")
+            self.loading = False
+
+    def Loaded(self) -> bool:
+        """Checks whether every row of the input file is in the queue.
+
+        Returns:
+            bool: true if loaded
+        """
+        with self.lock:
+            if not self.loaded:
+                self.loaded = self.conn.execute(
+                    "SELECT value FROM meta WHERE key = 'loaded'"
+                ).fetchone() == ("1",)
+            return self.loaded
+
+    def Claim(self, n: int) -> list[Report]:
+        """Leases up to n pending rows, or rows of expired leases.
+        The database is only locked for writing if rows are available.
+
+        Args:
+            n (int): max rows to claim
+
+        Returns:
+            list[Report]: reports to download, ordered by row
+        """
+        select = ("SELECT id, name, url FROM items WHERE state = ?"
+                  " OR (state = ? AND lease_until < ?) ORDER BY id LIMIT ?")
+        with self.lock:
+            self.WriteDone()
+            now = time.time()
+            params = (ItemState.PENDING.name, ItemState.LEASED.name, now, n)
+            if not self.conn.execute(select, params).fetchone():
+                return []
+            with self.Transaction():
+                rows = self.conn.execute(select, params).fetchall()
+                self.conn.executemany(
+                    "UPDATE items SET state = ?, worker = ?,"
+                    " lease_until = ?, claims = claims + 1 WHERE id = ?",
+                    [(ItemState.LEASED.name, self.worker_id,
+                      now + self.lease_s, row[0]) for row in rows])
+        return [Report(name, id, url, ReportState.INIT)
+                for id, name, url in rows]
+
+    def Complete(self, report: Report):
+        """Marks a claimed row as done with the result of the report.
+        Written with the next claim, renewal or flush.
+
+        Args:
+            report (Report): finished report
+        """
+        with self.lock:
+            self.done[int(report.id)] = self.Result(report)
+
+    def Renew(self):
+        """Extends the leases of the rows of this worker, and of the load
+        while it is loading. Finished rows are written first.
+        """
+        with self.lock:
+            with self.Transaction():
+                self.WriteDone()
+                until = time.time() + self.lease_s
+                self.conn.execute(
+                    "UPDATE items SET lease_until = ?"
+                    " WHERE worker = ? AND state = ?",
+                    (until, self.worker_id, ItemState.LEASED.name))
+                if self.loading:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO meta"
+                        " VALUES ('loader_until', ?)", (str(until),))
+
+    def Release(self):
+        """Returns the unfinished rows of this worker to the queue, and
+        gives up the load, so other workers take them over right away.
+        """
+        with self.lock:
+            with self.Transaction():
+                self.WriteDone()
+                self.conn.execute(
+                    "UPDATE items SET state = ?, worker = '',"
+                    " lease_until = 0 WHERE worker = ? AND state = ?",
+                    (ItemState.PENDING.name, self.worker_id,
+                     ItemState.LEASED.name))
+                if self.loading:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO meta"
+                        " VALUES ('loader_until', '0')")
+            self.loading = False
+
+    def Flush(self):
+        """Writes the finished rows.
+        """
+        with self.lock:
+            if self.done and self.conn:
+                with self.Transaction():
+                    self.WriteDone()
+
+    def Finished(self) -> bool:
+        """Checks whether every row of the run is done.
+
+        Returns:
+            bool: true if loaded and no rows are pending or leased
+        """
+        if not self.Loaded():
+            return False
+        self.Flush()
+        with self.lock:
+            return self.conn.execute(
+                "SELECT 1 FROM items WHERE state != ? LIMIT 1",
+                (ItemState.DONE.name,)).fetchone() is None
+
+    def Results(self, batch_size: int = 1024) -> Iterator[Report]:
+        """Returns the finished rows with their results, ordered by row.
+        Rows are fetched in batches.
+
+        Args:
+            batch_size (int, optional): rows per query. Defaults to 1024.
+
+        Yields:
+            Iterator[Report]: reports of the finished rows
+        """
+        last_id = -1
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT id, name, url, status, attempts, sha256, size"
+                    " FROM items WHERE state = ? AND id > ? ORDER BY id"
+                    " LIMIT ?",
+                    (ItemState.DONE.name, last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            for id, name, url, status, attempts, sha256, size in rows:
+                yield Report(name, id, url, ReportState[status], attempts,
+                             sha256, size)
+            last_id = rows[-1][0]
+
+    def Counts(self) -> dict[str, int]:
+        """Returns the number of rows in each state.
+
+        Returns:
+            dict[str, int]: state name to rows
+        """
+        with self.lock:
+            return dict(self.conn.execute(
+                "SELECT state, COUNT(*) FROM items GROUP BY state"))
+
+    def WriteDone(self):
+        """Writes the finished rows, in the running transaction if any.
+        Rows claimed by another worker after the lease expired are
+        marked done as well, the first result is kept.
+        The lock must be held.
+        """
+        if not self.done:
+            return
+        self.conn.executemany(
+            "UPDATE items SET state = ?, status = ?, attempts = ?,"
+            " sha256 = ?, size = ? WHERE id = ? AND state != ?",
+            [(ItemState.DONE.name, *result, id, ItemState.DONE.name)
+             for id, result in self.done.items()])
+        self.done.clear()
+
+    def Meta(self) -> dict[str, str]:
+        """Returns the meta table.
+        The lock must be held.
+        """
+        return dict(self.conn.execute("SELECT key, value FROM meta"))
+
+    def Transaction(self) -> sqlite3.Connection:
+        """Returns a context manager running a write transaction.
+        The database is locked for writing when the transaction starts,
+        so two workers never claim the same rows.
+        The lock must be held.
+
+        Returns:
+            sqlite3.Connection: commits on exit, rolls back on errors
+        """
+        if self.conn.in_transaction:
+            return self.conn
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    @staticmethod
+    def Result(report: Report) -> tuple[str, int, str, int]:
+        """Returns the result columns of a finished report.
+        """
+        return (report.status.name, report.attempts, report.sha256 or "",
+                report.size or 0)
+
+    @staticmethod
+    def Signature(in_file: str) -> str:
+        """Returns the name and size of the input file. The modification
+        time is left out, copies of the file on other machines have
+        their own.
+
+        Args:
+            in_file (str): path to the input file
+
+        Returns:
+            str: signature
+        """
+        try:
+            size = os.path.getsize(in_file)
+        except OSError:
+            size = -1
+        return f"{os.path.basename(in_file)}:{size}"